@@ -0,0 +1,46 @@
+"""Benchmark the expression engine on the expressions of a schema.
+
+Times every numerical `create_column` expression of the schema against
+`DataFrame.eval(engine="python")`, the way pipelines evaluated them
+before the engine existed.
+
+Usage::
+
+    python benchmarks/expression_engine.py [SCHEMA_PATH] [--rows N]
+
+"""
+import argparse
+from pathlib import Path
+
+import yaml
+
+from bssir.utils.expression_utils import benchmark_expressions, collect_expressions
+
+DEFAULT_SCHEMA_PATH = (
+    Path(__file__).parents[1].joinpath("src", "bssir", "metadata", "schema.yaml")
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "schema_path", nargs="?", type=Path, default=DEFAULT_SCHEMA_PATH
+    )
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with open(args.schema_path, encoding="utf-8") as file:
+        schema = yaml.safe_load(file) or {}
+    expressions = collect_expressions(schema)
+    if not expressions:
+        print(f"No numerical expressions found in {args.schema_path}")
+        return
+    results = benchmark_expressions(expressions, n_rows=args.rows, repeat=args.repeat)
+    print(results.to_string(index=False))
+    print(f"\n{len(results)} of {len(expressions)} expressions compiled")
+    print(f"Median speedup: {results['speedup'].median():.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,17 @@ import logging
 from typing import Any, Callable, Literal, Iterable
 from types import ModuleType
 import importlib
+from pathlib import Path
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 
 from .metadata_reader import Defaults, Metadata, _Years, LoadTableSettings
 from . import data_cleaner, external_data, data_engine, decoder
+from . import utils
+from .cache_catalog import CacheCatalog
+from .lazy_table import LazyTable
 from .utils import Utils
 
 _DataSource = Literal["SCI", "CBI"]
@@ -108,15 +114,33 @@ class API:
             with open(dst, mode="w", encoding="utf-8") as file:
                 file.write(setup_text)
 
-    def load_table(self, table_name: str, years: _Years, **kwargs) -> pd.DataFrame:
-        """Load a table for the given table name and year(s)."""
+    def load_table(
+        self, table_name: str, years: _Years, **kwargs
+    ) -> pd.DataFrame | pa.Table:
+        """Load a table for the given table name and year(s).
+
+        Passing `columns` returns only those columns. Only the columns
+        they depend on are read from the stored files.
+
+        Passing `filters`, one or more conditions as accepted by
+        `DataFrame.query`, keeps only the rows that meet them. Simple
+        comparisons are also applied while reading, so row groups that
+        cannot match are skipped.
+
+        Passing `backend="pyarrow"` returns a DataFrame whose columns
+        keep the Arrow data read from the stored files, and
+        `backend="arrow"` returns a `pyarrow.Table`. Tables are then
+        built on the Arrow-backed columns as well.
+        """
         settings = self.defaults.functions.load_table
         settings = settings.model_copy(update=kwargs)
         years = self.utils.parse_years(years, table_name=table_name, form=settings.form)
         if settings.form == "raw":
             table = self._load_raw_table(table_name, years)
+            table = data_engine.filter_table(table, settings.filters or [])
         elif settings.form == "cleaned":
             table = self._load_cleaned_table(table_name, years, settings)
+            table = data_engine.filter_table(table, settings.filters or [])
         elif settings.form == "normalized":
             table = data_engine.create_normalized_table(
                 table_name=table_name,
@@ -127,10 +151,135 @@ class API:
             )
         else:
             raise ValueError
-        return table
+        if settings.columns is not None:
+            table = table.loc[:, settings.columns]
+        return data_engine.convert_backend(table, settings.backend)
+
+    def scan_table(self, table_name: str, years: _Years, **kwargs) -> LazyTable:
+        """Start a lazy query on a table.
+
+        Takes the same arguments as `load_table`, except `columns` and
+        `filters`, and returns a `LazyTable`. Operations chained on it,
+        `select`, `filter`, `add_attribute`, `add_weight` and `join`,
+        only run when `collect` is called, which loads only the rows
+        and columns the whole chain needs.
+        """
+        if ("columns" in kwargs) or ("filters" in kwargs):
+            raise ValueError("Use select and filter on the lazy table instead.")
+        settings = self.defaults.functions.load_table.model_copy(update=kwargs)
+        years = self.utils.parse_years(years, table_name=table_name, form=settings.form)
+        return LazyTable(self, table_name, years, load_kwargs=kwargs)
+
+    def lookup_households(
+        self,
+        ids: int | Iterable[int],
+        table_names: str | Iterable[str] = "all",
+        years: _Years = "all",
+        **kwargs,
+    ) -> dict[str, pd.DataFrame]:
+        """Load every record of some households from the cleaned tables.
+
+        Cleaned files are sorted by household ID and indexed by row
+        group, so only the parts of each file that hold the households
+        are read. Takes the keyword arguments of `load_table` that
+        control how missing files are handled.
+
+        Returns the records of each table, for all of the years and
+        with a year column, keyed by table name.
+        """
+        ids = [ids] if isinstance(ids, (int, np.integer)) else list(ids)
+        settings = self.defaults.functions.load_table.model_copy(update=kwargs)
+        year_column = self.defaults.columns.year
+        id_column = self.defaults.columns.id
+        id_filter = [(id_column, "in", tuple(ids))]
+        tables: dict[str, list[pd.DataFrame]] = {}
+        for table_name, year in self.utils.create_table_year_pairs(table_names, years):
+            table = data_engine.TableHandler(
+                [table_name],
+                year,
+                lib_defaults=self.defaults,
+                lib_metadata=self.metadata,
+                settings=settings,
+                filters={table_name: id_filter},
+            )[table_name]
+            table = table.loc[table[id_column].isin(ids)]
+            if year_column not in table.columns:
+                year_values = np.full(len(table), year, dtype=data_engine.YEAR_DTYPE)
+                table = table.assign(**{year_column: year_values})
+                table = table[[year_column, *table.columns[:-1]]]
+            tables.setdefault(table_name, []).append(table)
+        return {
+            table_name: utils.concat_tables(table_list, ignore_index=True)
+            for table_name, table_list in tables.items()
+        }
+
+    def explain_table(self, table_name: str, years: _Years, **kwargs) -> str:
+        """Describe how a normalized table would be built.
+
+        Takes the same arguments as `load_table` and returns the build
+        plan: the tables needed for every year, in the order they are
+        built, with the columns and filters used to read them. Nothing
+        is built.
+        """
+        settings = self.defaults.functions.load_table
+        settings = settings.model_copy(update=kwargs)
+        years = self.utils.parse_years(years, table_name=table_name, form="normalized")
+        plan = data_engine.BuildPlan(
+            table_name,
+            years,
+            lib_defaults=self.defaults,
+            lib_metadata=self.metadata,
+            settings=settings,
+        )
+        return plan.explain()
+
+    def flush(self) -> None:
+        """Wait until tables saved in the background are written to disk.
+
+        Tables created or downloaded by `load_table` are saved on a
+        background thread, unless `write_behind` is turned off. Pending
+        writes are also finished when the interpreter exits.
+        """
+        utils.flush()
+
+    def cache_report(self) -> pd.DataFrame:
+        """Report the space used by the cached tables, per table."""
+        return CacheCatalog(self.defaults.dir.cached).report()
+
+    def evict_cache(
+        self,
+        max_size: int | str | None = None,
+        policy: Literal["lru", "cost"] | None = None,
+    ) -> list[tuple[str, int]]:
+        """Remove cached tables until the cache fits in a size limit.
+
+        Uses the maximum size and eviction policy of the cache settings
+        unless they are given. Returns the removed tables and years.
+        """
+        max_size = self.defaults.cache.max_size if max_size is None else max_size
+        if max_size is None:
+            raise ValueError("Maximum cache size is not specified.")
+        policy = self.defaults.cache.eviction if policy is None else policy
+        return CacheCatalog(self.defaults.dir.cached).evict(max_size, policy)
+
+    def sweep_cache(self) -> list[Path]:
+        """Remove cached files that no cached table refers to."""
+        return CacheCatalog(self.defaults.dir.cached).sweep()
+
+    def migrate_cleaned_files(
+        self, layout: Literal["flat", "partitioned"] | None = None
+    ) -> list[Path]:
+        """Move cleaned files to another layout of the cleaned directory.
+
+        Moves the files to the configured `cleaned_layout` unless a
+        layout is given, and returns their new paths. Files are moved
+        as they are, so nothing is recreated or downloaded.
+        """
+        self.flush()
+        return utils.migrate_cleaned_files(self.defaults, layout)
 
     def _load_raw_table(self, table_name: str, years: list[int]) -> pd.DataFrame:
-        table = pd.concat(
+        table = utils.concat_tables(
             [
                 data_cleaner.load_raw_table(
                     table_name=table_name,
@@ -150,7 +299,29 @@ class API:
         years: list[int],
         settings: LoadTableSettings | None = None,
     ):
-        table = pd.concat(
+        if settings is None:
+            columns = None
+        else:
+            columns = utils.required_columns(
+                [{"apply_filter": settings.filters}], settings.columns
+            )
+        table = None
+        if (
+            (self.defaults.cleaned_layout == "partitioned")
+            and (settings is not None)
+            and not (settings.recreate or settings.redownload)
+        ):
+            table = data_engine.read_partitioned_table(
+                table_name,
+                years,
+                lib_defaults=self.defaults,
+                columns=None if columns is None else list(columns),
+                filters=self._parse_filters(settings),
+                backend=settings.backend,
+            )
+        if table is not None:
+            return table
+        table = utils.concat_tables(
             [
                 data_engine.TableHandler(
                     [table_name],
@@ -158,6 +329,8 @@ class API:
                     lib_defaults=self.defaults,
                     lib_metadata=self.metadata,
                     settings=settings,
+                    columns={table_name: columns},
+                    filters={table_name: self._parse_filters(settings)},
                 )[table_name]
                 for year in years
             ],
@@ -165,6 +338,18 @@ class API:
         )
         return table
 
+    @staticmethod
+    def _parse_filters(settings: LoadTableSettings | None) -> list[tuple]:
+        if (settings is None) or (settings.filters is None):
+            return []
+        conditions = settings.filters
+        conditions = [conditions] if isinstance(conditions, str) else conditions
+        return [
+            table_filter
+            for condition in conditions
+            for table_filter in utils.parse_filter(condition)
+        ]
+
     def _create_cleaned_files(
         self, years: list[int], table_names: str | Iterable[str] | None = None
     ) -> None:
@@ -181,9 +366,10 @@ class API:
         table = data_cleaner.clean_table(
             table, table_name=table_name, year=year, lib_metadata=self.metadata
         )
-        file_name = f"{year}_{table_name}.parquet"
-        self.defaults.dir.cleaned.mkdir(exist_ok=True, parents=True)
-        table.to_parquet(self.defaults.dir.cleaned.joinpath(file_name))
+        table = utils.sort_by_household(table)
+        file_path = utils.get_cleaned_path(table_name, year, self.defaults)
+        with utils.FileLock(file_path):
+            utils.write_parquet(table, file_path, row_group_size=utils.ROW_GROUP_SIZE)
 
     def load_external_table(
         self,
@@ -243,8 +429,8 @@ class API:
             decoder.extract_column(table, self.defaults.columns.year).unique().tolist()
         )
         _index = [self.defaults.columns.year, self.defaults.columns.id]
-        weights = self.load_table("Weight", years).set_index(_index)
-        return table.join(weights, how="left", on=_index)
+        weights = self.load_table("Weight", years)
+        return utils.join_on_keys(table, weights, on=_index, how="left")
 
     def _is_potential_target(self, column_name) -> bool:
         for keywords in [
@@ -0,0 +1,416 @@
+"""Catalog of the tables stored in the cache directory.
+
+The catalog is a single SQLite database in the cache directory with one
+row per cached table and year. Each row records the cache key of the
+inputs the table was built from, its dependencies, the size of the
+stored file, and how often and how recently it was read. Checking a
+cached table is one indexed lookup, and listing, statistics and pruning
+work on the whole cache at once.
+
+Every change is made in its own transaction, so concurrent threads and
+processes see either the old or the new state of an entry.
+
+The catalog also keeps the cache within a size limit, by evicting the
+least recently read tables or the ones cheapest to rebuild per byte,
+and sweeps files that no entry refers to. Objects cached in the
+subdirectories of the cache directory, such as remote file blocks,
+have no entries; sweeping and eviction keep only the last used version
+of each of them. See `bssir.cache_cli` for the command line interface.
+
+"""
+import json
+import re
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Iterable, Literal
+
+import pandas as pd
+
+from .utils.io_utils import LOCK_SUFFIX, TEMP_SUFFIX, remove_stale_versions
+
+CATALOG_FILE_NAME = "catalog.sqlite3"
+
+_EvictionPolicy = Literal["lru", "cost"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    table_name TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    cache_key TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    dependencies TEXT NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    build_seconds REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (table_name, year)
+)
+"""
+
+# Temporary files older than this are left over by interrupted writes
+_TEMP_FILE_MAX_AGE = 24 * 60 * 60
+
+_SIZE_UNITS = {"": 1, "K": 2**10, "M": 2**20, "G": 2**30, "T": 2**40}
+
+_COLUMNS = [
+    "table_name",
+    "year",
+    "cache_key",
+    "file_name",
+    "size",
+    "dependencies",
+    "created",
+    "last_access",
+    "hits",
+    "build_seconds",
+]
+
+
+class CacheCatalog:
+    """Index of the cached tables of a cache directory.
+
+    Parameters
+    ----------
+    cache_dir : Path
+        Directory the cached tables are stored in
+
+    Attributes
+    ----------
+    path : Path
+        Path of the catalog database
+
+    """
+
+    def __init__(self, cache_dir: Path) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.path = self.cache_dir.joinpath(CATALOG_FILE_NAME)
+
+    def _connect(self) -> sqlite3.Connection:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=60)
+        connection.row_factory = sqlite3.Row
+        connection.execute(_SCHEMA)
+        return connection
+
+    def lookup(self, table_name: str, year: int) -> dict[str, Any] | None:
+        """Find the entry of a cached table.
+
+        Parameters
+        ----------
+        table_name : str
+            Name of the table
+        year : int
+            Year of the table
+
+        Returns
+        -------
+        entry : dict or None
+            Recorded entry, None if the table is not cached
+
+        """
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT * FROM entries WHERE table_name = ? AND year = ?",
+                (table_name, year),
+            ).fetchone()
+        return None if row is None else _row_to_entry(row)
+
+    def record(
+        self,
+        table_name: str,
+        year: int,
+        *,
+        cache_key: str,
+        file_name: str,
+        size: int,
+        dependencies: Iterable[str] = (),
+        build_seconds: float = 0,
+    ) -> None:
+        """Add or replace the entry of a cached table.
+
+        Parameters
+        ----------
+        table_name : str
+            Name of the table
+        year : int
+            Year of the table
+        cache_key : str
+            Key of the inputs the table was built from
+        file_name : str
+            Name of the stored file in the cache directory
+        size : int
+            Size of the stored file in bytes
+        dependencies : iterable of str
+            Tables the table was built from
+        build_seconds : float, optional
+            Time it took to build the table
+
+        """
+        now = time.time()
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(table_name, year, cache_key, file_name, size, dependencies, "
+                "created, last_access, hits, build_seconds) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0, ?)",
+                (
+                    table_name,
+                    year,
+                    cache_key,
+                    file_name,
+                    size,
+                    json.dumps(list(dependencies)),
+                    now,
+                    now,
+                    build_seconds,
+                ),
+            )
+
+    def touch(self, table_name: str, year: int) -> None:
+        """Count a read of a cached table.
+
+        Parameters
+        ----------
+        table_name : str
+            Name of the table
+        year : int
+            Year of the table
+
+        """
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "UPDATE entries SET hits = hits + 1, last_access = ? "
+                "WHERE table_name = ? AND year = ?",
+                (time.time(), table_name, year),
+            )
+
+    def remove(self, table_name: str, year: int) -> None:
+        """Remove the entry of a cached table.
+
+        The stored file is left in place.
+
+        Parameters
+        ----------
+        table_name : str
+            Name of the table
+        year : int
+            Year of the table
+
+        """
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "DELETE FROM entries WHERE table_name = ? AND year = ?",
+                (table_name, year),
+            )
+
+    def entries(self) -> pd.DataFrame:
+        """List the cached tables.
+
+        Returns
+        -------
+        entries : DataFrame
+            One row per cached table and year, most recently read first
+
+        """
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT * FROM entries ORDER BY last_access DESC"
+            ).fetchall()
+        table = pd.DataFrame([_row_to_entry(row) for row in rows], columns=_COLUMNS)
+        for column in ["created", "last_access"]:
+            table[column] = pd.to_datetime(table[column], unit="s")
+        return table
+
+    def stats(self) -> dict[str, int]:
+        """Summarize the cache.
+
+        Returns
+        -------
+        stats : dict
+            Number of entries, their total size in bytes and the total
+            number of reads
+
+        """
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(hits), 0) "
+                "FROM entries"
+            ).fetchone()
+        return {"entries": row[0], "size": row[1], "hits": row[2]}
+
+    def prune(self) -> list[tuple[str, int]]:
+        """Remove the entries whose stored file is missing.
+
+        Returns
+        -------
+        removed : list of tuples
+            `(table_name, year)` of the removed entries
+
+        """
+        removed = []
+        with closing(self._connect()) as connection, connection:
+            rows = connection.execute(
+                "SELECT table_name, year, file_name FROM entries"
+            ).fetchall()
+            for row in rows:
+                if self.cache_dir.joinpath(row["file_name"]).exists():
+                    continue
+                connection.execute(
+                    "DELETE FROM entries WHERE table_name = ? AND year = ?",
+                    (row["table_name"], row["year"]),
+                )
+                removed.append((row["table_name"], row["year"]))
+        return removed
+
+    def report(self) -> pd.DataFrame:
+        """Summarize the space used by each table.
+
+        Returns
+        -------
+        report : DataFrame
+            Number of cached years, total size in bytes, total reads and
+            last read of each table, largest tables first
+
+        """
+        entries = self.entries()
+        report = (
+            entries.groupby("table_name")
+            .agg(
+                years=("year", "count"),
+                size=("size", "sum"),
+                hits=("hits", "sum"),
+                build_seconds=("build_seconds", "sum"),
+                last_access=("last_access", "max"),
+            )
+            .sort_values("size", ascending=False)
+        )
+        return report
+
+    def evict(
+        self, max_size: int | str, policy: _EvictionPolicy = "lru"
+    ) -> list[tuple[str, int]]:
+        """Remove cached tables until the cache fits in a size limit.
+
+        With the "lru" policy, the tables read least recently are removed
+        first. With the "cost" policy, the tables that save the least
+        build time per byte are removed first, where the time saved by a
+        table is its build time times the number of times it was read,
+        plus one.
+
+        Earlier versions of the objects cached in subdirectories are
+        removed first, and are not counted in the limit.
+
+        Parameters
+        ----------
+        max_size : int or str
+            Size limit in bytes, or a string such as "500MB" or "5 GB"
+        policy : {"lru", "cost"}, optional
+            Order tables are removed in
+
+        Returns
+        -------
+        removed : list of tuples
+            `(table_name, year)` of the removed tables
+
+        """
+        max_size = parse_size(max_size)
+        self._remove_stale_versions()
+        entries = self.entries()
+        total_size = entries["size"].sum()
+        if total_size <= max_size:
+            return []
+        if policy == "lru":
+            entries = entries.sort_values("last_access")
+        elif policy == "cost":
+            saved_seconds = entries["build_seconds"] * (entries["hits"] + 1)
+            entries = entries.assign(
+                _value=saved_seconds / entries["size"].clip(lower=1)
+            ).sort_values(["_value", "last_access"])
+        else:
+            raise ValueError(f"Eviction policy {policy} is not valid")
+        removed = []
+        for entry in entries.itertuples():
+            if total_size <= max_size:
+                break
+            self.remove(entry.table_name, entry.year)
+            self.cache_dir.joinpath(entry.file_name).unlink(missing_ok=True)
+            total_size -= entry.size
+            removed.append((entry.table_name, entry.year))
+        return removed
+
+    def sweep(self) -> list[Path]:
+        """Remove files and entries that do not belong to each other.
+
+        Removes the files of the cache directory that no entry refers
+        to, such as tables of removed schemas or metadata files of
+        earlier versions, and the entries whose file is missing. Lock
+        files, and temporary files of writes that may still be running,
+        are kept. In the subdirectories, all but the last used version
+        of each cached object are removed.
+
+        Returns
+        -------
+        removed : list of Path
+            Removed files and directories
+
+        """
+        self.prune()
+        known_files = set(self.entries()["file_name"])
+        known_files.add(self.path.name)
+        removed = self._remove_stale_versions()
+        for path in self.cache_dir.iterdir():
+            if not path.is_file() or path.name in known_files:
+                continue
+            if path.name.startswith(self.path.name):
+                # Journal files of the catalog database
+                continue
+            if path.name.endswith(LOCK_SUFFIX):
+                continue
+            if path.name.endswith(TEMP_SUFFIX):
+                if time.time() - path.stat().st_mtime < _TEMP_FILE_MAX_AGE:
+                    continue
+            path.unlink(missing_ok=True)
+            removed.append(path)
+        return removed
+
+    def _remove_stale_versions(self) -> list[Path]:
+        if not self.cache_dir.exists():
+            return []
+        removed = []
+        for path in self.cache_dir.iterdir():
+            if path.is_dir():
+                removed.extend(remove_stale_versions(path))
+        return removed
+
+
+def parse_size(size: int | str) -> int:
+    """Convert a size such as "500MB" or "5 GB" to bytes.
+
+    Parameters
+    ----------
+    size : int or str
+        Size in bytes, or a number followed by a unit (B, KB, MB, GB or TB)
+
+    Returns
+    -------
+    size : int
+        Size in bytes
+
+    """
+    if isinstance(size, (int, float)):
+        return int(size)
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMGT]?)I?B?\s*", size.upper())
+    if match is None:
+        raise ValueError(f"Size {size} is not valid")
+    number, unit = match.groups()
+    return int(float(number) * _SIZE_UNITS[unit])
+
+
+def _row_to_entry(row: sqlite3.Row) -> dict[str, Any]:
+    entry = dict(row)
+    entry["dependencies"] = json.loads(entry["dependencies"])
+    return entry
+
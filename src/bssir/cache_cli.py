@@ -0,0 +1,54 @@
+"""Command line interface of the cache catalog.
+
+Reports, limits and cleans the tables cached in a cache directory:
+
+    python -m bssir.cache_cli report
+    python -m bssir.cache_cli evict --max-size 5GB --policy cost
+    python -m bssir.cache_cli sweep
+
+"""
+import argparse
+from pathlib import Path
+
+from .cache_catalog import CacheCatalog
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Manage a cache directory from the command line."""
+    parser = argparse.ArgumentParser(
+        prog="python -m bssir.cache_cli",
+        description="Report, limit and clean the cached tables.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=None,
+        help="cache directory, the one of the bssir settings by default",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("report", help="show the space used by each table")
+    evict_parser = commands.add_parser("evict", help="fit the cache in a size")
+    evict_parser.add_argument("--max-size", required=True, help='e.g. "5GB"')
+    evict_parser.add_argument("--policy", choices=["lru", "cost"], default="lru")
+    commands.add_parser("sweep", help="remove files no table refers to")
+    args = parser.parse_args(argv)
+
+    if args.cache_dir is None:
+        from .metadata_reader import defaults
+
+        args.cache_dir = defaults.dir.cached
+    catalog = CacheCatalog(args.cache_dir)
+    if args.command == "report":
+        print(catalog.report().to_string())
+        stats = catalog.stats()
+        print(f"\n{stats['entries']} tables, {stats['size']:,} bytes")
+    elif args.command == "evict":
+        for table_name, year in catalog.evict(args.max_size, args.policy):
+            print(f"Removed {table_name} {year}")
+    elif args.command == "sweep":
+        for path in catalog.sweep():
+            print(f"Removed {path.name}")
+
+
+if __name__ == "__main__":
+    main()
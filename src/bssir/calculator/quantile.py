@@ -4,6 +4,7 @@ import pandas as pd
 from pydantic import BaseModel, ConfigDict
 
 
+from .. import utils
 from ..api import API
 
 
@@ -178,5 +179,7 @@ class Quantiler:
     def _align_with_table(self, quantile: pd.DataFrame) -> pd.DataFrame:
         if self.table is None:
             return quantile
-        quantile = self.original_index.join(quantile, on=["Year", "ID"])
+        quantile = utils.join_on_keys(
+            self.original_index, quantile, on=["Year", "ID"]
+        )
         return quantile
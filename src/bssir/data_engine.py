@@ -7,12 +7,17 @@ derivative tables for analysis.
 Key functions:
 
 - extract_dependencies - Get dependencies for building a table 
+- BuildContext - Memoizes tables built while serving one request
+- BuildPlan - Plans and runs the tables needed for a request as a graph
 - TableHandler - Loads multiple dependency tables
 - Pipeline - Applies a sequence of transform steps to a table
 - TableFactory - Loads and builds tables from different sources
 - create_table - Constructs a table by loading multiple years  
 - load_weights - Loads sample weights for a given year
 - add_weights - Adds weights to a table
+- table_name_dtype - Shared categorical type of the Table_Name column
+- convert_backend - Converts a loaded table to the requested backend
+- read_partitioned_table - Reads a cleaned table for many years in one scan
 
 The module focuses on ETL (Extract, Transform, Load) functions to go 
 from raw provided data tables to cleaned analytic tables.
@@ -20,20 +25,113 @@ from raw provided data tables to cleaned analytic tables.
 Relies on metadata schema and configuration for how to process tables.
 
 """
+from collections import ChainMap, Counter
 from pathlib import Path
-from typing import Iterable
+from typing import Any, BinaryIO, Callable, Hashable, Iterable
 from types import ModuleType
+import functools
 import importlib
-from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
 
+import numpy as np
 import pandas as pd
-import yaml
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs
+import pyarrow.parquet as pq
 
 from . import decoder
+from .cache_catalog import CacheCatalog
 
 from . import utils, data_cleaner
 from .metadata_reader import Defaults, Metadata, LoadTableSettings
 
+# Four bytes keep arithmetic on years, e.g. `Year * 100 + Month`, from
+# wrapping around
+YEAR_DTYPE = "int32"
+
+
+class BuildContext:
+    """Memoizes tables built while serving a single request.
+
+    A request such as one `load_table` call can need the same table
+    several times, for example when two joined tables both join the
+    weights. The context keeps every table built for the request,
+    keyed by kind, name and year, so each one is built only once.
+
+    A stored table is reused when it was built with every column and
+    at most the filters of the new request, since pushed-down filters
+    only remove rows that dependents drop themselves. Builds of the
+    same key are serialized, so concurrent workers wait for each other
+    instead of building a table twice.
+
+    Attributes
+    ----------
+    build_counts : Counter
+        Number of times each key was built
+
+    """
+
+    def __init__(self) -> None:
+        self.build_counts: Counter = Counter()
+        self._entries: dict[Hashable, tuple] = {}
+        self._key_locks: dict[Hashable, threading.RLock] = {}
+        self._lock = threading.Lock()
+
+    def get_table(
+        self,
+        key: Hashable,
+        build: Callable[[], pd.DataFrame],
+        *,
+        columns: Iterable[str] | None = None,
+        filters: Iterable[tuple] = (),
+    ) -> pd.DataFrame:
+        """Return the table stored for a key, building it if needed.
+
+        Parameters
+        ----------
+        key : hashable
+            Identifier of the table, e.g. `("normalized", "Weight", 1400)`
+        build : callable
+            Function that builds the table
+        columns : iterable of str, optional
+            Columns the table must contain, all columns if not specified
+        filters : iterable of tuple, optional
+            Filters the table may have been built with
+
+        Returns
+        -------
+        table : DataFrame
+            The stored or newly built table
+
+        """
+        columns = None if columns is None else frozenset(columns)
+        filters = frozenset(filters)
+        with self._get_key_lock(key):
+            entry = self._entries.get(key)
+            if (entry is not None) and self._covers(entry, columns, filters):
+                return entry[2]
+            table = build()
+            self._entries[key] = (columns, filters, table)
+            self.build_counts[key] += 1
+        return table
+
+    def _get_key_lock(self, key: Hashable) -> threading.RLock:
+        with self._lock:
+            if key not in self._key_locks:
+                self._key_locks[key] = threading.RLock()
+            return self._key_locks[key]
+
+    @staticmethod
+    def _covers(entry: tuple, columns: frozenset | None, filters: frozenset) -> bool:
+        stored_columns, stored_filters, _ = entry
+        if stored_columns is not None:
+            if (columns is None) or not columns.issubset(stored_columns):
+                return False
+        return stored_filters.issubset(filters)
+
 
 class TableHandler:
     """Handles loading multiple tables from parquet.
@@ -49,6 +147,14 @@ class TableHandler:
         Year for tables
     settings : LoadTable
         Settings for how to load the tables
+    columns : dict of sets
+        Columns to read for each table, keyed by table name. Tables
+        missing from the dictionary are read in full.
+    filters : dict of lists
+        Parquet filters, in `(column, op, value)` form, used to skip
+        rows while reading local files, keyed by table name.
+    context : BuildContext, optional
+        Context shared by the request, used to read each table once.
     tables : dict of DataFrames
         Loaded tables keyed by table name
 
@@ -61,6 +167,9 @@ class TableHandler:
         lib_defaults: Defaults,
         lib_metadata: Metadata,
         settings: LoadTableSettings | None = None,
+        columns: dict[str, Iterable[str] | None] | None = None,
+        filters: dict[str, list[tuple[str, str, Any]]] | None = None,
+        context: BuildContext | None = None,
     ) -> None:
         self.table_list = table_list
         self.year = year
@@ -69,6 +178,9 @@ class TableHandler:
         self.settings = default_settings if settings is None else settings
         self.lib_defaults = lib_defaults
         self.lib_metadata = lib_metadata
+        self.columns = {} if columns is None else columns
+        self.filters = {} if filters is None else filters
+        self.context = context
 
         self.tables: dict[str, pd.DataFrame] = self.setup()
 
@@ -108,8 +220,8 @@ class TableHandler:
     def setup(self) -> dict[str, pd.DataFrame]:
         """Set up the handler by loading all tables.
 
-        Loads all of the configured tables in parallel using a
-        ThreadPoolExecutor.
+        Loads all of the configured tables in parallel on the I/O pool
+        of the shared executor service.
 
         Returns
         -------
@@ -117,10 +229,8 @@ class TableHandler:
             Dictionary of the loaded tables by name.
 
         """
-        with ThreadPoolExecutor(max_workers=6) as executer:
-            tables = zip(
-                self.table_list, executer.map(self.read_table, self.table_list)
-            )
+        service = _get_executor_service(self.lib_defaults)
+        tables = zip(self.table_list, service.map("io", self.read_table, self.table_list))
         return dict(tables)
 
     def read_table(self, table_name: str) -> pd.DataFrame:
@@ -137,17 +247,27 @@ class TableHandler:
             Loaded table data
 
         """
+        if self.context is None:
+            return self._read_table(table_name)
+        return self.context.get_table(
+            ("cleaned", table_name, self.year),
+            functools.partial(self._read_table, table_name),
+            columns=self.columns.get(table_name),
+            filters=self.filters.get(table_name, []),
+        )
 
+    def _read_table(self, table_name: str) -> pd.DataFrame:
+        pending_table = utils.get_pending_table(self.get_local_path(table_name))
         if self.settings.recreate:
             table = self._create_table(table_name)
         elif self.settings.redownload:
             table = self._download_table(table_name)
+        elif pending_table is not None:
+            table = self._select_columns(pending_table, table_name)
         elif self.get_local_path(table_name).exists():
             table = self._load_table(table_name)
-        elif self.settings.on_missing == "create":
-            table = self._create_table(table_name)
-        elif self.settings.on_missing == "download":
-            table = self._download_table(table_name)
+        elif self.settings.on_missing in ("create", "download"):
+            table = self._read_missing_table(table_name)
         else:
             raise FileNotFoundError
 
@@ -155,38 +275,172 @@ class TableHandler:
         table.attrs["year"] = self.year
         return table
 
+    def _read_missing_table(self, table_name: str) -> pd.DataFrame:
+        # Only one process creates or downloads a missing table, the
+        # others wait for the lock and read what it saved
+        local_path = self.get_local_path(table_name)
+        lock = utils.FileLock(local_path)
+        lock.acquire()
+        try:
+            pending_table = utils.get_pending_table(local_path)
+            if pending_table is not None:
+                table = self._select_columns(pending_table, table_name)
+            elif local_path.exists():
+                table = self._load_table(table_name)
+            else:
+                table = None
+        except BaseException:
+            lock.release()
+            raise
+        if table is not None:
+            lock.release()
+        elif self.settings.on_missing == "create":
+            table = self._create_table(table_name, lock=lock)
+        else:
+            table = self._download_table(table_name, lock=lock)
+        return table
+
     def get_local_path(self, table_name) -> Path:
-        file_name = f"{self.year}_{table_name}.parquet"
-        self.lib_defaults.dir.cleaned.mkdir(exist_ok=True, parents=True)
-        local_path = self.lib_defaults.dir.cleaned.joinpath(file_name)
+        local_path = utils.get_cleaned_path(table_name, self.year, self.lib_defaults)
+        local_path.parent.mkdir(exist_ok=True, parents=True)
         return local_path
 
-    def _create_table(self, table_name: str) -> pd.DataFrame:
-        table = data_cleaner.load_raw_table(
-            table_name,
-            self.year,
-            lib_defaults=self.lib_defaults,
-            lib_metadata=self.lib_metadata,
-        )
-        table = data_cleaner.clean_table(
-            table, table_name=table_name, year=self.year, lib_metadata=self.lib_metadata
-        )
-        if self.settings.save_created:
-            table.to_parquet(self.get_local_path(table_name))
-        return table
-
-    def _download_table(self, table_name: str) -> pd.DataFrame:
-        table = pd.read_parquet(
+    def _create_table(
+        self, table_name: str, lock: utils.FileLock | None = None
+    ) -> pd.DataFrame:
+        try:
+            table = data_cleaner.load_raw_table(
+                table_name,
+                self.year,
+                lib_defaults=self.lib_defaults,
+                lib_metadata=self.lib_metadata,
+            )
+            table = data_cleaner.clean_table(
+                table,
+                table_name=table_name,
+                year=self.year,
+                lib_metadata=self.lib_metadata,
+            )
+            table = utils.sort_by_household(table)
+        except BaseException:
+            if lock is not None:
+                lock.release()
+            raise
+        self._save_table(table, table_name, self.settings.save_created, lock)
+        return self._select_columns(table, table_name)
+
+    def _download_table(
+        self, table_name: str, lock: utils.FileLock | None = None
+    ) -> pd.DataFrame:
+        url = (
             f"{self.lib_defaults.get_mirror().bucket_address}/"
             f"{self.lib_defaults.get_online_dir().cleaned}/"
-            f"{self.year}_{table_name}.parquet"
+            f"{utils.get_mirror_file_name(table_name, self.year)}"
         )
-        if self.settings.save_downloaded:
-            table.to_parquet(self.get_local_path(table_name))
-        return table
+        try:
+            if self.settings.save_downloaded:
+                table = pd.read_parquet(url)
+            else:
+                # Tables that are not saved only need the selected parts
+                table = self._read_remote_table(table_name, url)
+            table = utils.sort_by_household(table)
+        except BaseException:
+            if lock is not None:
+                lock.release()
+            raise
+        self._save_table(table, table_name, self.settings.save_downloaded, lock)
+        return self._select_columns(table, table_name)
+
+    def _save_table(
+        self,
+        table: pd.DataFrame,
+        table_name: str,
+        save: bool,
+        lock: utils.FileLock | None,
+    ) -> None:
+        """Save a table if requested, releasing the lock once it is written."""
+        if not save:
+            if lock is not None:
+                lock.release()
+        elif self.settings.write_behind:
+            # The returned table may be changed while the file is written.
+            # Without copy-on-write this takes a deep copy, which still
+            # keeps the encoding and writing off the calling thread.
+            utils.write_parquet_behind(
+                _isolated_copy(table),
+                self.get_local_path(table_name),
+                lock=lock,
+                row_group_size=utils.ROW_GROUP_SIZE,
+            )
+        else:
+            try:
+                utils.write_parquet(
+                    table,
+                    self.get_local_path(table_name),
+                    row_group_size=utils.ROW_GROUP_SIZE,
+                )
+            finally:
+                if lock is not None:
+                    lock.release()
+
+    def _read_remote_table(self, table_name: str, url: str) -> pd.DataFrame:
+        cache_dir = self.lib_defaults.dir.cached.joinpath(utils.BLOCK_CACHE_FOLDER)
+        with utils.RemoteFile(url, cache_dir) as file:
+            available_columns = pq.read_schema(file).names
+            return read_parquet(
+                file,
+                columns=self._find_read_columns(table_name, available_columns),
+                filters=self._find_read_filters(table_name, available_columns),
+                backend=self.settings.backend,
+            )
 
     def _load_table(self, table_name: str) -> pd.DataFrame:
-        return pd.read_parquet(self.get_local_path(table_name))
+        local_path = self.get_local_path(table_name)
+        available_columns = pq.read_schema(local_path).names
+        columns = self._find_read_columns(table_name, available_columns)
+        filters = self._find_read_filters(table_name, available_columns)
+        ids = utils.filter_ids(filters)
+        if ids is not None:
+            table = utils.read_households(
+                local_path,
+                ids,
+                columns=columns,
+                types_mapper=(
+                    None if self.settings.backend == "numpy" else _map_arrow_type
+                ),
+            )
+            if table is not None:
+                return table
+        return read_parquet(
+            local_path, columns=columns, filters=filters, backend=self.settings.backend
+        )
+
+    def _find_read_columns(
+        self, table_name: str, available_columns: list[str]
+    ) -> list[str] | None:
+        needed = self.columns.get(table_name)
+        if needed is None:
+            return None
+        columns = [column for column in available_columns if column in needed]
+        if len(columns) == 0:
+            # Keep one column so that the number of rows is preserved
+            columns = available_columns[:1]
+        return columns
+
+    def _find_read_filters(
+        self, table_name: str, available_columns: list[str]
+    ) -> list[tuple]:
+        return [
+            table_filter
+            for table_filter in self.filters.get(table_name, [])
+            if table_filter[0] in available_columns
+        ]
+
+    def _select_columns(self, table: pd.DataFrame, table_name: str) -> pd.DataFrame:
+        columns = self._find_read_columns(table_name, table.columns.to_list())
+        if columns is None:
+            return table
+        return table.loc[:, columns]
 
 
 class Pipeline:
@@ -197,6 +451,12 @@ class Pipeline:
     a table of data. The steps are configured by passing a list of
     operations which are applied in sequence.
 
+    The steps are compiled once per version of the instructions (see
+    `utils.compile_steps`), which validates them before any is run and
+    fuses runs of `create_column` and `apply_filter` steps. The input
+    table is not copied; steps replace columns instead of writing into
+    them, so tables shared with other pipelines are never modified.
+
     Attributes
     ----------
     table : DataFrame
@@ -205,6 +465,10 @@ class Pipeline:
         The sequence of step functions to apply
     properties : dict
         Additional properties passed to steps
+    columns : set of str, optional
+        Columns needed from the output. When given, the input table
+        only contains the columns these depend on, and steps that
+        select columns keep only the ones available.
 
     """
 
@@ -215,12 +479,16 @@ class Pipeline:
         steps: list,
         pipeline_params: dict,
         settings: LoadTableSettings,
+        columns: set[str] | None = None,
     ) -> None:
-        self.table = table.copy()
+        # Steps replace columns instead of writing into them, so a shallow
+        # copy keeps the input table unchanged
+        self.table = table.copy(deep=False)
         self.steps = steps
         self.pipeline_params = pipeline_params
         self.settings = settings
-        self.modules: dict[str, ModuleType] = {}
+        self.columns = columns
+        self._step_index = 0
 
     def run(self) -> pd.DataFrame:
         """Run the pipeline on the table.
@@ -233,49 +501,50 @@ class Pipeline:
         table : DataFrame
             The transformed table after applying all steps.
         """
-        for step in self.steps:
-            if step is None:
-                continue
-            method_name, method_input = self._extract_method_name(step)
-            if method_input is None:
-                getattr(self, f"_{method_name}")()
+        for step in utils.compile_steps(self.steps):
+            self._step_index = step.index
+            if step.method_input is None:
+                getattr(self, f"_{step.name}")()
             else:
-                getattr(self, f"_{method_name}")(method_input)
+                getattr(self, f"_{step.name}")(step.method_input)
         return self.table
 
-    def _extract_method_name(self, instruction):
-        if isinstance(instruction, str):
-            method_name = instruction
-            method_input = None
-        elif isinstance(instruction, dict):
-            method_name, method_input = list(instruction.items())[0]
-        else:
-            raise TypeError
-        return method_name, method_input
-
     def _add_year(self) -> None:
-        self.table["Year"] = self.pipeline_params["year"]
+        self.table["Year"] = np.full(
+            len(self.table), self.pipeline_params["year"], dtype=YEAR_DTYPE
+        )
 
     def _filter_year(self) -> None:
         filt = self.table["Year"] == self.pipeline_params["year"]
         self.table = self.table.loc[filt]
 
     def _add_table_name(self) -> None:
-        self.table["Table_Name"] = self.pipeline_params["table_name"]
+        table_name = self.pipeline_params["table_name"]
+        dtype = table_name_dtype(self.pipeline_params["lib_metadata"], table_name)
+        codes = np.full(
+            len(self.table), dtype.categories.get_loc(table_name), dtype="int32"
+        )
+        self.table["Table_Name"] = pd.Categorical.from_codes(codes, dtype=dtype)
 
     def _add_classification(self, method_input: dict | None = None) -> None:
         if method_input is None:
             return
-        method_input["lib_defaults"] = self.pipeline_params["lib_defaults"]
-        method_input["lib_metadata"] = self.pipeline_params["lib_metadata"]
+        method_input = {
+            **method_input,
+            "lib_defaults": self.pipeline_params["lib_defaults"],
+            "lib_metadata": self.pipeline_params["lib_metadata"],
+        }
         settings = decoder.DecoderSettings(**method_input)
         self.table = decoder.Decoder(self.table, settings).add_classification()
 
     def _add_attribute(self, method_input: dict | None = None) -> None:
         if method_input is None:
             return
-        method_input["lib_defaults"] = self.pipeline_params["lib_defaults"]
-        method_input["lib_metadata"] = self.pipeline_params["lib_metadata"]
+        method_input = {
+            **method_input,
+            "lib_defaults": self.pipeline_params["lib_defaults"],
+            "lib_metadata": self.pipeline_params["lib_metadata"],
+        }
         settings = decoder.IDDecoderSettings(**method_input)
         self.table = decoder.IDDecoder(self.table, settings).add_attribute()
 
@@ -289,121 +558,135 @@ class Pipeline:
             for column in method_input
             if isinstance(column, dict)
         }
+        if self.columns is not None:
+            new_order = [
+                column for column in new_order if column in self.table.columns
+            ]
+            types = {
+                column: dtype for column, dtype in types.items() if column in new_order
+            }
 
         self.table = self.table[list(new_order)].astype(types)
 
     def _rename(self, method_input: dict | None = None) -> None:
         if method_input is None:
             return
-        self.table = self.table.rename(columns=method_input)
+        table = self.table.copy(deep=False)
+        table.columns = [method_input.get(column, column) for column in table.columns]
+        self.table = table
 
-    def _create_column(self, method_input: dict | None = None) -> None:
-        if method_input is None:
-            return
-        column_name = method_input["name"]
-        if method_input["type"] == "numerical":
-            expression = method_input["expression"]
-            self.__apply_numerical_instruction(column_name, expression)
-        elif method_input["type"] == "categorical":
-            categories = method_input["categories"]
-            self.__apply_categorical_instruction(column_name, categories)
-
-    def __apply_numerical_instruction(self, column_name, expression: int | str) -> None:
-        if isinstance(expression, int):
-            self.table.loc[:, column_name] = expression
-        else:
-            table = self.table.copy()
-            for column in self.table.columns:
-                for dtype in ["Float64", "Float32", "Int64", "Int32"]:
-                    if (column in expression) and (table[column].dtype == dtype):
-                        table[column] = table[column].astype(dtype.lower()) # type: ignore
-            self.table[column_name] = table.eval(expression, engine="python")
+    def _create_columns(self, instructions: list[dict]) -> None:
+        new_columns: dict[str, pd.Series] = {}
+        for instruction in instructions:
+            column_name = instruction["name"]
+            if instruction["type"] == "numerical":
+                column = self.__apply_numerical_instruction(
+                    instruction["expression"], new_columns
+                )
+            else:
+                column = self.__apply_categorical_instruction(
+                    column_name, instruction["categories"], new_columns
+                )
+            new_columns[column_name] = column
+        # Unlike `assign`, this does not copy the table without copy-on-write
+        table = self.table.copy(deep=False)
+        for column_name, column in new_columns.items():
+            table[column_name] = column
+        self.table = table
+
+    def __get_column(self, column_name: str, new_columns: dict) -> pd.Series:
+        if column_name in new_columns:
+            return new_columns[column_name]
+        return self.table[column_name]
+
+    def __apply_numerical_instruction(
+        self, expression: int | float | str, new_columns: dict
+    ) -> pd.Series:
+        if not isinstance(expression, str):
+            return pd.Series(expression, index=self.table.index)
+        available = set(self.table.columns) | set(new_columns)
+        compiled_expression = utils.compile_expression(expression)
+        if (compiled_expression is not None) and (
+            compiled_expression.columns <= available
+        ):
+            return compiled_expression.evaluate(
+                ChainMap(new_columns, self.table), self.table.index
+            )
+        table = pd.DataFrame(
+            {
+                name: self.__get_column(name, new_columns)
+                for name in utils.extract_identifiers(expression) & available
+            },
+            index=self.table.index,
+            copy=False,
+        )
+        for column in table.columns:
+            if table[column].dtype in ["Float64", "Float32", "Int64", "Int32"]:
+                table[column] = table[column].astype(str(table[column].dtype).lower())
+        return table.eval(expression, engine="python")
 
     def __apply_categorical_instruction(
-        self, column_name: str, categories: dict
-    ) -> None:
-        dtype = pd.CategoricalDtype(list(categories.keys()))
-        categorical_column = pd.Series(index=self.table.index, dtype=dtype)
-
-        for category, condition in categories.items():
-            filt = self.__construct_filter(column_name, condition)
-            categorical_column.loc[filt] = category
-
-        if column_name in self.table.columns:
-            self.table[column_name] = self.table[column_name].astype(dtype)
-        self.table.loc[:, column_name] = categorical_column
-
-    def __construct_filter(self, column_name, condition) -> pd.Series:
-        if condition is None:
-            filt = self.table.index.to_series()
-        elif isinstance(condition, str):
-            filt = self.table[column_name] == condition
-        elif isinstance(condition, list):
-            filt = self.table[column_name].isin(condition)
-        elif isinstance(condition, dict):
-            filts = []
-            for other_column, value in condition.items():
-                if isinstance(value, (bool, str)):
-                    filts.append(self.table[other_column] == value)
-                elif isinstance(value, list):
-                    filts.append(self.table[other_column].isin(value))
-                else:
-                    raise KeyError
-            filt_sum = pd.concat(filts, axis="columns").sum(axis="columns")
-            filt = filt_sum == len(condition)
-        else:
-            raise KeyError
-        return filt
+        self, column_name: str, categories: dict, new_columns: dict
+    ) -> pd.Series:
+        definition = utils.compile_categories(column_name, categories)
+        return definition.evaluate(ChainMap(new_columns, self.table), self.table.index)
 
-    def _apply_filter(self, conditions: str | list[str] | None = None) -> None:
-        if conditions is None:
-            return
-        conditions = [conditions] if isinstance(conditions, str) else conditions
+    def _apply_filters(self, conditions: list[str]) -> None:
+        mask = None
         for condition in conditions:
-            self.table = self.table.query(condition)
+            condition_mask = self.table.eval(condition)
+            mask = condition_mask if mask is None else mask & condition_mask
+        self.table = self.table.loc[mask]
 
     def _apply_pandas_function(self, method_input: str | None = None) -> None:
         if method_input is None:
             return
-        method_input = "self.table" + method_input.replace("\n", "")
-        table = pd.eval(method_input, target=self.table, engine="python")
+        # Functions may write into the table they are given
+        table = utils.compile_pandas_function(method_input)(
+            _isolated_copy(self.table)
+        )
         assert isinstance(table, pd.DataFrame)
         self.table = table
 
     def _apply_function(self, method_input: str | None = None) -> None:
         if method_input is None:
             return
-        module_name, func_name = method_input.rsplit(".", 1)
-        self.__load_module(module_name)
-        func = getattr(self.modules[module_name], func_name)
-        self.table = func(self.table)
-
-    def __load_module(self, module_name: str) -> None:
-        if module_name not in self.modules:
-            self.modules[module_name] = importlib.import_module(module_name)
+        self.table = utils.load_function(method_input)(_isolated_copy(self.table))
 
     def _join(self, method_input: dict | str | None = None):
         if method_input is None:
             return
-        if isinstance(method_input, str):
-            table_name = method_input
-            columns = ["Year", "ID"]
-            years = None
-        elif isinstance(method_input, dict):
-            table_name = method_input["table_name"]
-            columns = method_input["columns"]
-            years = method_input.get("year", None)
-        else:
-            raise TypeError
-        years = list(self.table["Year"].unique())
+        table_name, columns = _parse_join_input(method_input)
+        years = [int(year) for year in self.table["Year"].unique()]
+        lib_defaults = self.pipeline_params["lib_defaults"]
+        lib_metadata = self.pipeline_params["lib_metadata"]
+        table_columns = utils.union_columns(
+            *[
+                _find_table_columns(table_name, year, lib_defaults, lib_metadata)
+                for year in years
+            ]
+        )
         other_table = create_normalized_table(
             table_name,
             years,
-            lib_defaults=self.pipeline_params["lib_defaults"],
-            lib_metadata=self.pipeline_params["lib_metadata"],
-            settings=self.settings,
+            lib_defaults=lib_defaults,
+            lib_metadata=lib_metadata,
+            settings=_create_join_settings(
+                self.settings,
+                self.steps,
+                self._step_index,
+                self.columns,
+                columns,
+                table_columns,
+            ),
+            context=self.pipeline_params.get("context"),
         )
-        self.table = self.table.merge(other_table, on=columns)
+        if set(self.table.columns) & set(other_table.columns) - set(columns):
+            self.table = self.table.merge(other_table, on=columns)
+        else:
+            self.table = utils.join_on_keys(
+                self.table, other_table, on=columns, how="inner"
+            ).reset_index(drop=True)
 
     def _dropna(self, method_input: str | list | None = None) -> None:
         if method_input is None:
@@ -429,6 +712,10 @@ class TableFactory:
     source parquet files, by querying cached results, or by dynamically
     constructing the table from other tables based on a schema.
 
+    When a `BuildContext` is given, every table built on the way is
+    stored in it, and tables already built for the same request are
+    reused instead of being built again.
+
     """
 
     def __init__(
@@ -439,12 +726,15 @@ class TableFactory:
         lib_defaults: Defaults,
         lib_metadata: Metadata,
         settings: LoadTableSettings,
+        context: BuildContext | None = None,
     ):
         self.table_name = table_name
         self.year = year
         self.lib_defaults = lib_defaults
         self.lib_metadata = lib_metadata
         self.settings = settings
+        self.context = context
+        self.cache_catalog = CacheCatalog(lib_defaults.dir.cached)
 
         schema = utils.resolve_metadata(lib_metadata.schema, year)
         if isinstance(schema, dict):
@@ -459,20 +749,132 @@ class TableFactory:
         else:
             self.table_schema = {}
 
-        dependencies = self.extract_dependencies(table_name, year)
+        self.column_plan: dict[str, set[str] | None] = {}
+        self._plan_columns(
+            table_name,
+            utils.required_columns(
+                [{"apply_filter": settings.filters}], settings.columns
+            ),
+        )
+        self.filter_plan: dict[str, set[tuple]] = {}
+        self._plan_filters(
+            table_name,
+            {
+                table_filter
+                for condition in _as_condition_list(settings.filters)
+                for table_filter in utils.parse_filter(condition)
+            },
+        )
+
+    @functools.cached_property
+    def table_handler(self) -> TableHandler:
+        """Handler of the original tables the table depends on.
+
+        Created on first use, so that tables served from the build
+        context or the cache do not read their dependencies.
+        """
+        dependencies = self.extract_dependencies(self.table_name, self.year)
         original_table_list = [
             table
             for table, props in dependencies.items()
             if ("size" in props) and ("external." not in table)
         ]
-        self.table_handler = TableHandler(
+        return TableHandler(
             original_table_list,
-            year,
+            self.year,
             lib_defaults=self.lib_defaults,
             lib_metadata=self.lib_metadata,
             settings=self.settings,
+            columns={
+                table: self._find_input_columns(table) for table in original_table_list
+            },
+            filters={
+                table: self._find_input_filters(table) for table in original_table_list
+            },
+            context=self.context,
+        )
+
+    def _plan_columns(self, table_name: str, columns: Iterable[str] | None) -> None:
+        """Propagate the needed columns of a table to its upstream tables.
+
+        The columns needed from each table are collected in `column_plan`.
+        A table reached from several dependents is planned with the union
+        of their needs, and None stands for every column.
+        """
+        if table_name in self.column_plan:
+            current = self.column_plan[table_name]
+            columns = utils.union_columns(current, columns)
+            if columns == current:
+                return
+        self.column_plan[table_name] = None if columns is None else set(columns)
+        table_schema = self.schema.get(table_name, {})
+        if "table_list" not in table_schema:
+            return
+        upstream_columns = utils.union_columns(
+            self._find_input_columns(table_name),
+            self._find_concat_keys(table_schema.get("concat_options", {})),
+        )
+        upstream_tables = table_schema["table_list"]
+        if isinstance(upstream_tables, str):
+            upstream_tables = [upstream_tables]
+        for upstream_table in upstream_tables:
+            if upstream_table.split(".", 1)[0] == "external":
+                continue
+            self._plan_columns(upstream_table, upstream_columns)
+
+    def _find_input_columns(self, table_name: str) -> set[str] | None:
+        table_schema = self.schema.get(table_name, {})
+        if table_schema.get("cache_result", False):
+            return None
+        return utils.required_columns(
+            table_schema.get("instructions"), self.column_plan.get(table_name)
+        )
+
+    def _plan_filters(self, table_name: str, filters: set[tuple]) -> None:
+        """Propagate filters on a table to its upstream tables.
+
+        Filters that hold for every row used from each table are collected
+        in `filter_plan`. A table reached from several dependents keeps only
+        the filters they have in common.
+        """
+        if table_name in self.filter_plan:
+            current = self.filter_plan[table_name]
+            filters = current & filters
+            if filters == current:
+                return
+        self.filter_plan[table_name] = filters
+        table_schema = self.schema.get(table_name, {})
+        if "table_list" not in table_schema:
+            return
+        if len(table_schema.get("concat_options", {})) > 0:
+            # Rows of merged tables do not map to rows of the result
+            upstream_filters = set()
+        else:
+            upstream_filters = set(self._find_input_filters(table_name))
+        upstream_tables = table_schema["table_list"]
+        if isinstance(upstream_tables, str):
+            upstream_tables = [upstream_tables]
+        for upstream_table in upstream_tables:
+            if upstream_table.split(".", 1)[0] == "external":
+                continue
+            self._plan_filters(upstream_table, upstream_filters)
+
+    def _find_input_filters(self, table_name: str) -> list[tuple]:
+        table_schema = self.schema.get(table_name, {})
+        if table_schema.get("cache_result", False):
+            return []
+        return utils.pushdown_filters(
+            table_schema.get("instructions"), self.filter_plan.get(table_name, set())
         )
 
+    @staticmethod
+    def _find_concat_keys(concat_options: dict) -> set[str]:
+        keys = set()
+        for option in ["on_columns", "merge_on", "left_on", "right_on"]:
+            value = concat_options.get(option, [])
+            keys.update([value] if isinstance(value, str) else value)
+        return keys
+
     def load(self, table_name: str | None = None) -> pd.DataFrame:
         """Load the table.
 
@@ -492,7 +894,22 @@ class TableFactory:
 
         """
         table_name = self.table_name if table_name is None else table_name
+        table = self._get_table(table_name)
+        if (table_name == self.table_name) and (self.settings.filters is not None):
+            table = filter_table(table, self.settings.filters)
+        return table
+
+    def _get_table(self, table_name: str) -> pd.DataFrame:
+        if self.context is None:
+            return self._build(table_name)
+        return self.context.get_table(
+            ("normalized", table_name, self.year),
+            functools.partial(self._build, table_name),
+            columns=self.column_plan.get(table_name),
+            filters=self.filter_plan.get(table_name, set()),
+        )
 
+    def _build(self, table_name: str) -> pd.DataFrame:
         if all(
             [
                 table_name not in self.lib_metadata.tables["table_availability"],
@@ -504,8 +921,7 @@ class TableFactory:
             try:
                 table = self.read_cached_table(table_name)
             except FileNotFoundError:
-                table = self._construct_schema_based_table(table_name)
-                self.save_cache(table, table_name)
+                table = self._build_cached_table(table_name)
         elif "table_list" in self.schema.get(table_name, {}):
             table = self._construct_schema_based_table(table_name)
         elif table_name in self.lib_metadata.tables["table_availability"]:
@@ -516,6 +932,23 @@ class TableFactory:
             raise ValueError
         return table
 
+    def _build_cached_table(self, table_name: str) -> pd.DataFrame:
+        # Only one process builds a missing cached table, the others wait
+        # for the lock and read what it saved
+        file_path = self.lib_defaults.dir.cached.joinpath(
+            f"{table_name}_{self.year}.parquet"
+        )
+        with utils.FileLock(file_path):
+            try:
+                return self.read_cached_table(table_name)
+            except FileNotFoundError:
+                pass
+            start_time = time.perf_counter()
+            table = self._construct_schema_based_table(table_name)
+            build_seconds = time.perf_counter() - start_time
+            self.save_cache(table, table_name, build_seconds=build_seconds)
+        return table
+
     def extract_dependencies(
         self,
         table_name: str,
@@ -528,6 +961,7 @@ class TableFactory:
 
         Recursively extracts dependencies of dependencies until only base tables
         remain. Base tables have their file size stored instead of further dependencies.
+        Tables joined by an instruction are dependencies as well.
 
         Parameters
         ----------
@@ -544,10 +978,17 @@ class TableFactory:
             {table_name: {"dependencies": {dep1: {}, dep2: {}}},
             table_name2: {"size": 1024}}
         """
+        schema = (
+            self.schema
+            if year == self.year
+            else utils.resolve_metadata(self.lib_metadata.schema, year)
+        )
         table_list = [table_name]
         dependencies: dict[str, dict] = {}
         while len(table_list) > 0:
             table = table_list.pop(0)
+            if table in dependencies:
+                continue
             if table.split(".", 1)[0] == "external":
                 file_name = f"{table.split('.', 1)[1]}.parquet"
                 local_path = self.lib_defaults.dir.external.joinpath(file_name)
@@ -563,12 +1004,12 @@ class TableFactory:
                 assert isinstance(upstream_tables, list)
                 table_list.extend(upstream_tables)
             elif table in self.lib_metadata.tables["table_availability"]:
-                file_name = f"{year}_{table}.parquet"
-                local_path = self.lib_defaults.dir.cleaned.joinpath(file_name)
+                local_path = utils.get_cleaned_path(table, year, self.lib_defaults)
                 size = local_path.stat().st_size if local_path.exists() else None
                 dependencies[table] = {"size": size}
             else:
                 raise ValueError
+            table_list.extend(_find_join_tables(schema.get(table, {})))
         return dependencies
 
     def read_cached_table(
@@ -598,18 +1039,53 @@ class TableFactory:
             If cached dependencies are out of date
 
         """
-        if not self.check_table_dependencies(table_name):
+        if not self.has_valid_cache(table_name):
             raise FileNotFoundError
         file_name = f"{table_name}_{self.year}.parquet"
         file_path = self.lib_defaults.dir.cached.joinpath(file_name)
-        table = pd.read_parquet(file_path)
-        return table
+        needed = self.column_plan.get(table_name)
+        if needed is None:
+            columns = None
+        else:
+            available_columns = pq.read_schema(file_path).names
+            columns = [column for column in available_columns if column in needed]
+        filters = list(self.filter_plan.get(table_name, set()))
+        table = read_parquet(
+            file_path,
+            columns=columns or None,
+            filters=filters,
+            backend=self.settings.backend,
+        )
+        self.cache_catalog.touch(table_name, self.year)
+        return _compact_common_columns(table, self.lib_metadata)
+
+    def has_valid_cache(self, table_name: str) -> bool:
+        """Check if an up to date cached version of the table exists.
+
+        Parameters
+        ----------
+        table_name : str
+            Table name to check the cache for
+
+        Returns
+        -------
+        valid : bool
+            True if the table can be read from the cache
+
+        """
+        file_name = f"{table_name}_{self.year}.parquet"
+        if not self.lib_defaults.dir.cached.joinpath(file_name).exists():
+            return False
+        try:
+            return self.check_table_dependencies(table_name)
+        except FileNotFoundError:
+            return False
 
     def check_table_dependencies(self, table_name: str) -> bool:
-        """Check if cached dependencies match current dependencies.
+        """Check if the cached table was built from the current inputs.
 
-        Compares the dependencies recorded in the cache metadata file
-        to the currently extracted dependencies for the table.
+        Compares the cache key recorded in the cache catalog to the key
+        of the current inputs of the table.
 
         Parameters
         ----------
@@ -622,23 +1098,75 @@ class TableFactory:
             True if dependencies match, False otherwise
 
         """
-        file_name = f"{table_name}_{self.year}_metadata.yaml"
-        cach_metadata_path = self.lib_defaults.dir.cached.joinpath(file_name)
-        with open(cach_metadata_path, encoding="utf-8") as file:
-            cach_metadata = yaml.safe_load(file)
-        file_dependencies = cach_metadata["dependencies"]
-        current_dependencies = self.extract_dependencies(table_name, self.year)
-        return file_dependencies == current_dependencies
+        entry = self.cache_catalog.lookup(table_name, self.year)
+        if entry is None:
+            return False
+        return entry["cache_key"] == self.compute_cache_key(table_name)
+
+    def compute_cache_key(self, table_name: str) -> str:
+        """Compute the key identifying the inputs of a table.
+
+        The key is a hash of the fingerprints of the files the table is
+        built from (see `utils.file_fingerprint`), the resolved schema
+        entries of the table and of every table it depends on, and the
+        versions of the packages that build it. A change to any of them
+        gives a new key.
+
+        Parameters
+        ----------
+        table_name : str
+            Name of the table
+
+        Returns
+        -------
+        key : str
+            Hex digest of the inputs of the table
+
+        """
+        dependencies = self.extract_dependencies(table_name, self.year)
+        paths = {
+            table: self._find_source_path(table)
+            for table, props in dependencies.items()
+            if "size" in props
+        }
+        if any(utils.get_pending_table(path) is not None for path in paths.values()):
+            utils.flush()
+        method = self.settings.cache_validation
+        files = {
+            table: utils.file_fingerprint(path, method) for table, path in paths.items()
+        }
+        schema = {
+            table: self.schema[table] for table in dependencies if table in self.schema
+        }
+        package_names = {"bssir", self.lib_defaults.package_name.lower()}
+        inputs = {
+            "table_name": table_name,
+            "year": self.year,
+            "files": files,
+            "schema": schema,
+            "packages": utils.package_versions(*sorted(package_names)),
+        }
+        if self.settings.backend != "numpy":
+            # Arrow-backed tables are stored with their Arrow types
+            inputs["backend"] = "pyarrow"
+        return utils.create_cache_key(inputs)
+
+    def _find_source_path(self, table_name: str) -> Path:
+        if table_name.split(".", 1)[0] == "external":
+            file_name = f"{table_name.split('.', 1)[1]}.parquet"
+            return self.lib_defaults.dir.external.joinpath(file_name)
+        return utils.get_cleaned_path(table_name, self.year, self.lib_defaults)
 
     def save_cache(
         self,
         table: pd.DataFrame,
         table_name: str,
+        build_seconds: float = 0,
     ) -> None:
-        """Save table to cache along with metadata.
+        """Save table to cache and record it in the cache catalog.
 
-        Saves the table to a parquet file and saves metadata about
-        dependencies to a yaml file.
+        If the cache settings set a maximum size, tables are evicted
+        afterwards until the cache fits in it.
 
         Parameters
         ----------
@@ -646,19 +1174,31 @@ class TableFactory:
             Table data to cache
         table_name : str
             Name of table being cached
+        build_seconds : float, optional
+            Time it took to build the table, used by cost-aware eviction
 
         """
         self.lib_defaults.dir.cached.mkdir(exist_ok=True, parents=True)
         file_name = f"{table_name}_{self.year}.parquet"
         file_path = self.lib_defaults.dir.cached.joinpath(file_name)
-        file_name = f"{table_name}_{self.year}_metadata.yaml"
-        cache_metadata_path = self.lib_defaults.dir.cached.joinpath(file_name)
-        file_metadata = {
-            "dependencies": self.extract_dependencies(table_name, self.year)
-        }
-        with open(cache_metadata_path, mode="w", encoding="utf-8") as file:
-            yaml.safe_dump(file_metadata, file)
-        table.to_parquet(file_path, index=False)
+        utils.write_parquet(table, file_path, index=False)
+        self.cache_catalog.record(
+            table_name,
+            self.year,
+            cache_key=self.compute_cache_key(table_name),
+            file_name=file_name,
+            size=file_path.stat().st_size,
+            dependencies=self.extract_dependencies(table_name, self.year),
+            build_seconds=build_seconds,
+        )
+        # Metadata files of earlier versions are replaced by the catalog
+        legacy_metadata_path = self.lib_defaults.dir.cached.joinpath(
+            f"{table_name}_{self.year}_metadata.yaml"
+        )
+        legacy_metadata_path.unlink(missing_ok=True)
+        cache_settings = self.lib_defaults.cache
+        if cache_settings.max_size is not None:
+            self.cache_catalog.evict(cache_settings.max_size, cache_settings.eviction)
 
     def _apply_schema(
         self,
@@ -675,15 +1215,23 @@ class TableFactory:
             "year": self.year,
             "lib_defaults": self.lib_defaults,
             "lib_metadata": self.lib_metadata,
+            "context": self.context,
         }
         table = Pipeline(
             table=table,
             steps=steps,
             pipeline_params=pipeline_params,
             settings=self.settings,
+            columns=self._find_output_columns(table_name),
         ).run()
         return table
 
+    def _find_output_columns(self, table_name: str) -> set[str] | None:
+        # Cached tables are stored in full, whatever this request needs
+        if self.schema.get(table_name, {}).get("cache_result", False):
+            return None
+        return self.column_plan.get(table_name)
+
     def _construct_schema_based_table(self, table_name: str) -> pd.DataFrame:
         if table_name not in self.schema:
             raise KeyError(f"Table name {table_name} is not available in schema")
@@ -710,8 +1258,11 @@ class TableFactory:
             concat_options["right_on"] = concat_options["merge_on"]
             del concat_options["merge_on"]
 
+        table_list = [
+            _compact_common_columns(table, self.lib_metadata) for table in table_list
+        ]
         if len(concat_options) == 0:
-            table = pd.concat(table_list)
+            table = utils.concat_tables(table_list)
         elif "on_columns" in concat_options:
             concat_options["axis"] = "columns"
             table_list = [table.set_index(concat_options["on_columns"]) for table in table_list]
@@ -728,20 +1279,637 @@ class TableFactory:
     def _collect_schema_tables(
         self, table_names: str | list[str]
     ) -> list[pd.DataFrame]:
-        api_file: ModuleType = importlib.import_module(
-            f"{self.lib_defaults.package_name.lower()}.api"
-        )
-        api = getattr(api_file, "api")
         table_names = [table_names] if isinstance(table_names, str) else table_names
         table_list = [
             self.load(name)
             if name.split(".", 1)[0] != "external"
-            else api.load_external_table(name.split(".", 1)[1])
+            else self._load_external_table(name.split(".", 1)[1])
             for name in table_names
         ]
         table_list = [table for table in table_list if not table.empty]
         return table_list
 
+    def _load_external_table(self, table_name: str) -> pd.DataFrame:
+        def load_external_table() -> pd.DataFrame:
+            api_file: ModuleType = importlib.import_module(
+                f"{self.lib_defaults.package_name.lower()}.api"
+            )
+            api = getattr(api_file, "api")
+            return api.load_external_table(table_name)
+
+        if self.context is None:
+            return load_external_table()
+        return self.context.get_table(("external", table_name), load_external_table)
+
+
+class PlanNode:
+    """A table of a build plan, for one year.
+
+    Attributes
+    ----------
+    table_name : str
+        Name of the table, `external.<name>` for external tables
+    year : int or None
+        Year of the table, None for external tables
+    factories : list of TableFactory
+        Factories the table is built with, one for each distinct
+        request that needs it
+    dependencies : set of tuples
+        Keys of the nodes the table is built from
+    dependents : set of tuples
+        Keys of the nodes built from the table
+
+    """
+
+    def __init__(self, table_name: str, year: int | None) -> None:
+        self.table_name = table_name
+        self.year = year
+        self.factories: list[TableFactory] = []
+        self.dependencies: set[tuple[str, int | None]] = set()
+        self.dependents: set[tuple[str, int | None]] = set()
+
+    @property
+    def key(self) -> tuple[str, int | None]:
+        return (self.table_name, self.year)
+
+    def __repr__(self) -> str:
+        return f"PlanNode({self.table_name!r}, {self.year!r})"
+
+
+class BuildPlan:
+    """Plans and runs the construction of a table over several years.
+
+    The plan is a graph with one node for each table and year needed
+    to build the requested table, across all requested years. Tables
+    reached along several paths, such as the weights joined by many
+    tables, appear once. Tables with an up to date cache are not
+    expanded, since they are read from the cache.
+
+    Running the plan builds the nodes in a thread pool, starting each
+    one as soon as the nodes it depends on are finished. Built tables
+    are stored in the build context, where the factories find them
+    when the requested table is loaded.
+
+    Parameters
+    ----------
+    table_name : str
+        Name of the requested table
+    years : list of int
+        Years of the requested table
+    settings : LoadTableSettings
+        Settings of the request
+    context : BuildContext, optional
+        Context to store built tables in, a new one if not specified
+
+    Attributes
+    ----------
+    factories : dict of TableFactory
+        Factory of the requested table, keyed by year
+    nodes : dict of PlanNode
+        Nodes of the plan, keyed by `(table_name, year)`
+
+    """
+
+    def __init__(
+        self,
+        table_name: str,
+        years: Iterable[int],
+        *,
+        lib_defaults: Defaults,
+        lib_metadata: Metadata,
+        settings: LoadTableSettings,
+        context: BuildContext | None = None,
+    ) -> None:
+        self.table_name = table_name
+        self.years = list(years)
+        self.lib_defaults = lib_defaults
+        self.lib_metadata = lib_metadata
+        self.settings = settings
+        self.context = BuildContext() if context is None else context
+        self.nodes: dict[tuple[str, int | None], PlanNode] = {}
+        self._join_factories: dict[tuple, TableFactory] = {}
+        self.factories = {
+            year: self._create_factory(table_name, year, settings)
+            for year in self.years
+        }
+        for factory in self.factories.values():
+            self._add_node(factory, table_name)
+
+    def _create_factory(
+        self, table_name: str, year: int, settings: LoadTableSettings
+    ) -> TableFactory:
+        return TableFactory(
+            table_name,
+            year,
+            lib_defaults=self.lib_defaults,
+            lib_metadata=self.lib_metadata,
+            settings=settings,
+            context=self.context,
+        )
+
+    def _add_node(self, factory: TableFactory, table_name: str) -> tuple:
+        is_external = table_name.split(".", 1)[0] == "external"
+        key = (table_name, None if is_external else factory.year)
+        if key not in self.nodes:
+            self.nodes[key] = PlanNode(*key)
+        node = self.nodes[key]
+        if is_external:
+            if len(node.factories) == 0:
+                node.factories.append(factory)
+            return key
+        if factory in node.factories:
+            return key
+        node.factories.append(factory)
+        for dependency in self._find_dependencies(factory, table_name):
+            node.dependencies.add(dependency)
+            self.nodes[dependency].dependents.add(key)
+        return key
+
+    def _find_dependencies(self, factory: TableFactory, table_name: str) -> list:
+        table_schema = factory.schema.get(table_name, {})
+        if table_schema.get("cache_result", False) and factory.has_valid_cache(
+            table_name
+        ):
+            return []
+        dependencies = []
+        upstream_tables = table_schema.get("table_list", [])
+        if isinstance(upstream_tables, str):
+            upstream_tables = [upstream_tables]
+        for upstream_table in upstream_tables:
+            dependencies.append(self._add_node(factory, upstream_table))
+        steps = table_schema.get("instructions") or []
+        for step_index, step in enumerate(steps):
+            if not isinstance(step, dict) or ("join" not in step):
+                continue
+            if step["join"] is None:
+                continue
+            join_table, on_columns = _parse_join_input(step["join"])
+            join_settings = _create_join_settings(
+                factory.settings,
+                steps,
+                step_index,
+                factory._find_output_columns(table_name),
+                on_columns,
+                _find_table_columns(
+                    join_table, factory.year, self.lib_defaults, self.lib_metadata
+                ),
+            )
+            join_factory = self._get_join_factory(join_table, factory.year, join_settings)
+            dependencies.append(self._add_node(join_factory, join_table))
+        return dependencies
+
+    def _get_join_factory(
+        self, table_name: str, year: int, settings: LoadTableSettings
+    ) -> TableFactory:
+        key = (table_name, year, settings.model_dump_json())
+        if key not in self._join_factories:
+            self._join_factories[key] = self._create_factory(table_name, year, settings)
+        return self._join_factories[key]
+
+    def stages(self) -> list[list[PlanNode]]:
+        """Group the nodes by the order they can be built in.
+
+        Returns
+        -------
+        stages : list of lists of PlanNode
+            Nodes of each stage depend only on nodes of earlier stages
+
+        """
+        depth: dict[tuple, int] = {}
+
+        def find_depth(key: tuple) -> int:
+            if key not in depth:
+                dependencies = self.nodes[key].dependencies
+                depth[key] = 1 + max(map(find_depth, dependencies), default=-1)
+            return depth[key]
+
+        stages: list[list[PlanNode]] = []
+        for key, node in self.nodes.items():
+            stage = find_depth(key)
+            while len(stages) <= stage:
+                stages.append([])
+            stages[stage].append(node)
+        return stages
+
+    def explain(self) -> str:
+        """Describe the plan.
+
+        Lists the tables to build, stage by stage, with the tables each
+        one is built from and the columns and filters used when reading.
+
+        Returns
+        -------
+        description : str
+            Text description of the plan
+
+        """
+        stages = self.stages()
+        years = ", ".join(str(year) for year in self.years)
+        lines = [
+            f"Build plan for {self.table_name} ({years}): "
+            f"{len(self.nodes)} tables in {len(stages)} stages"
+        ]
+        for stage_number, stage in enumerate(stages, start=1):
+            lines.append(f"Stage {stage_number}")
+            for node in sorted(stage, key=_node_sort_key):
+                lines.append(f"  {_describe_node(node.key)}")
+                if node.dependencies:
+                    dependencies = sorted(node.dependencies, key=_key_sort_key)
+                    dependencies_text = ", ".join(map(_describe_node, dependencies))
+                    lines.append(f"    from: {dependencies_text}")
+                for factory in node.factories:
+                    lines.extend(_describe_request(factory, node.table_name))
+        return "\n".join(lines)
+
+    def run(self, max_workers: int | None = None) -> None:
+        """Build every node of the plan.
+
+        Nodes are built on the CPU pool of the shared executor service.
+        Each node is started as soon as all of its dependencies are
+        built. If a node fails, no new nodes are started, and the error
+        is raised once the running nodes are finished.
+
+        Parameters
+        ----------
+        max_workers : int, optional
+            Number of nodes built at the same time, only bounded by the
+            pool if not specified
+
+        """
+        service = _get_executor_service(self.lib_defaults)
+        waiting = {key: set(node.dependencies) for key, node in self.nodes.items()}
+        ready = [key for key, dependencies in waiting.items() if not dependencies]
+        running: dict[Future, tuple] = {}
+        try:
+            while ready or running:
+                while ready and ((max_workers is None) or (len(running) < max_workers)):
+                    key = ready.pop(0)
+                    running[service.submit("cpu", self._build_node, key)] = key
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    key = running.pop(future)
+                    future.result()
+                    for dependent in self.nodes[key].dependents:
+                        waiting[dependent].discard(key)
+                        if not waiting[dependent]:
+                            ready.append(dependent)
+        except BaseException:
+            wait(running)
+            raise
+
+    def _build_node(self, key: tuple) -> None:
+        node = self.nodes[key]
+        for factory in node.factories:
+            if node.year is None:
+                factory._load_external_table(node.table_name.split(".", 1)[1])
+            else:
+                factory._get_table(node.table_name)
+
+    def load(self) -> list[pd.DataFrame]:
+        """Load the requested table for each year from the built nodes.
+
+        Returns
+        -------
+        tables : list of DataFrame
+            Requested table for each year, in the order of `years`
+
+        """
+        return [self.factories[year].load() for year in self.years]
+
+
+def _node_sort_key(node: PlanNode) -> tuple:
+    return _key_sort_key(node.key)
+
+
+def _key_sort_key(key: tuple) -> tuple:
+    table_name, year = key
+    return (table_name, -1 if year is None else year)
+
+
+def _describe_node(key: tuple) -> str:
+    table_name, year = key
+    return table_name if year is None else f"{table_name} {year}"
+
+
+def _describe_request(factory: TableFactory, table_name: str) -> list[str]:
+    if table_name.split(".", 1)[0] == "external":
+        return []
+    lines = []
+    if factory.schema.get(table_name, {}).get("cache_result", False):
+        cached = factory.has_valid_cache(table_name)
+        lines.append(f"    cache: {'read' if cached else 'build and save'}")
+    columns = factory.column_plan.get(table_name)
+    columns_text = "all" if columns is None else ", ".join(sorted(columns))
+    lines.append(f"    columns: {columns_text}")
+    filters = factory.filter_plan.get(table_name, set())
+    if filters:
+        filters_text = " & ".join(
+            f"{column} {operator} {value!r}"
+            for column, operator, value in sorted(filters, key=str)
+        )
+        lines.append(f"    filters: {filters_text}")
+    return lines
+
+
+def _find_join_tables(table_schema: dict) -> list[str]:
+    join_tables = []
+    for step in table_schema.get("instructions") or []:
+        if isinstance(step, dict) and (step.get("join") is not None):
+            join_tables.append(_parse_join_input(step["join"])[0])
+    return join_tables
+
+
+def _isolated_copy(table: pd.DataFrame) -> pd.DataFrame:
+    # Without copy-on-write, writes into a shallow copy reach the original,
+    # so a deep copy is needed
+    copy_on_write = (int(pd.__version__.split(".")[0]) >= 3) or (
+        pd.get_option("mode.copy_on_write") is True
+    )
+    return table.copy(deep=not copy_on_write)
+
+
+def _parse_join_input(method_input: dict | str) -> tuple[str, str | list[str]]:
+    if isinstance(method_input, str):
+        return method_input, ["Year", "ID"]
+    if isinstance(method_input, dict):
+        return method_input["table_name"], method_input["columns"]
+    raise TypeError
+
+
+def _create_join_settings(
+    settings: LoadTableSettings,
+    steps: list,
+    step_index: int,
+    columns: set[str] | None,
+    on_columns: str | list[str],
+    table_columns: set[str] | None = None,
+) -> LoadTableSettings:
+    on_columns = [on_columns] if isinstance(on_columns, str) else on_columns
+    needed = utils.required_columns(steps[step_index + 1 :], columns)
+    if (needed is not None) and (table_columns is not None):
+        # Columns of the left table are not read from the joined table
+        needed = needed & table_columns
+    needed = utils.union_columns(needed, on_columns)
+    join_columns = None if needed is None else sorted(needed)
+    return settings.model_copy(update={"columns": join_columns, "filters": None})
+
+
+def _find_table_columns(
+    table_name: str, year: int, lib_defaults: Defaults, lib_metadata: Metadata
+) -> set[str] | None:
+    """Columns of a table, or None if they are not known before building it.
+
+    Original tables give the columns saved in their cleaned files, and
+    the instructions of the schema are followed from there.
+    """
+    if table_name.split(".", 1)[0] == "external":
+        return None
+    schema = utils.resolve_metadata(lib_metadata.schema, year)
+    table_schema = schema.get(table_name, {}) if isinstance(schema, dict) else {}
+    if "table_list" in table_schema:
+        if len(table_schema.get("concat_options", {})) > 0:
+            return None
+        upstream_tables = table_schema["table_list"]
+        if isinstance(upstream_tables, str):
+            upstream_tables = [upstream_tables]
+        columns = utils.union_columns(
+            *[
+                _find_table_columns(upstream_table, year, lib_defaults, lib_metadata)
+                for upstream_table in upstream_tables
+            ]
+        )
+    else:
+        path = utils.get_cleaned_path(table_name, year, lib_defaults)
+        pending_table = utils.get_pending_table(path)
+        if pending_table is not None:
+            columns = set(pending_table.columns)
+        elif path.exists():
+            columns = set(pq.read_schema(path).names)
+        else:
+            return None
+    return utils.output_columns(table_schema.get("instructions"), columns)
+
+
+def read_parquet(
+    path: Path | BinaryIO,
+    columns: list[str] | None = None,
+    filters: list[tuple[str, str, Any]] | None = None,
+    backend: str = "numpy",
+) -> pd.DataFrame:
+    """Read a parquet file, skipping rows that fail the given filters.
+
+    Filters are passed to the pyarrow reader, which uses row group
+    statistics to skip parts of the file that cannot match. If the
+    filter values do not match the column types, the file is read
+    without filters.
+
+    Files on disk are memory-mapped, and open files, such as
+    `utils.RemoteFile`, are read through their own methods. With the
+    "pyarrow" and "arrow" backends, columns keep the Arrow buffers read
+    from the file instead of being converted to NumPy arrays, except
+    dictionary-encoded columns, which become categorical.
+
+    Parameters
+    ----------
+    path : Path or file-like object
+        Path of the parquet file, or the open file
+    columns : list of str, optional
+        Columns to read, all columns if not specified
+    filters : list of tuple, optional
+        Filters in `(column, op, value)` form, combined with AND
+    backend : {"numpy", "pyarrow", "arrow"}, optional
+        Backend of the columns of the table
+
+    Returns
+    -------
+    table : DataFrame
+        Table read from the file
+
+    """
+    filters = [
+        (column, operator, list(value) if isinstance(value, tuple) else value)
+        for column, operator, value in (filters or [])
+    ]
+    if len(filters) > 0:
+        try:
+            return _read_parquet(path, columns, filters, backend)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError, TypeError):
+            pass
+    return _read_parquet(path, columns, None, backend)
+
+
+def _read_parquet(
+    path: Path | BinaryIO,
+    columns: list[str] | None,
+    filters: list[tuple[str, str, Any]] | None,
+    backend: str,
+) -> pd.DataFrame:
+    if backend == "numpy":
+        return pd.read_parquet(
+            path, columns=columns, filters=filters or None, memory_map=True
+        )
+    table = pq.read_table(
+        path, columns=columns, filters=filters or None, memory_map=True
+    )
+    return table.to_pandas(types_mapper=_map_arrow_type)
+
+
+def _map_arrow_type(arrow_type: pa.DataType) -> pd.ArrowDtype | None:
+    if pa.types.is_dictionary(arrow_type):
+        return None
+    return pd.ArrowDtype(arrow_type)
+
+
+def convert_backend(
+    table: pd.DataFrame, backend: str = "numpy"
+) -> pd.DataFrame | pa.Table:
+    """Convert a loaded table to the requested backend.
+
+    Tables are built as DataFrames. With the "pyarrow" backend, columns
+    that are not backed by Arrow yet are converted to `pd.ArrowDtype`,
+    except categorical columns. With the "arrow" backend, the table is
+    returned as a `pyarrow.Table`, which reuses the buffers of the
+    Arrow-backed columns.
+
+    Parameters
+    ----------
+    table : DataFrame
+        Loaded table
+    backend : {"numpy", "pyarrow", "arrow"}, optional
+        Requested backend
+
+    Returns
+    -------
+    DataFrame or pyarrow.Table
+        Table in the requested backend
+
+    """
+    if backend == "numpy":
+        return table
+    if backend not in ("pyarrow", "arrow"):
+        raise ValueError(f"Backend {backend} is not valid")
+    updates = {}
+    for column_name, column in table.items():
+        if isinstance(column.dtype, (pd.ArrowDtype, pd.CategoricalDtype)):
+            continue
+        try:
+            array = pa.array(column, from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            continue
+        updates[column_name] = pd.Series(
+            pd.arrays.ArrowExtensionArray(array), index=table.index, copy=False
+        )
+    if updates:
+        table = table.assign(**updates)
+    if backend == "arrow":
+        return pa.Table.from_pandas(table)
+    return table
+
+
+def read_partitioned_table(
+    table_name: str,
+    years: list[int],
+    lib_defaults: Defaults,
+    columns: list[str] | None = None,
+    filters: list[tuple[str, str, Any]] | None = None,
+    backend: str = "numpy",
+) -> pd.DataFrame | None:
+    """Read a cleaned table for several years in one dataset scan.
+
+    Only the partitions of the requested years are opened, and their
+    files are read together by one multi-threaded scan, instead of one
+    read and a concatenation per year. Rows keep the order of the years.
+
+    Parameters
+    ----------
+    table_name : str
+        Name of the table
+    years : list of int
+        Years to read
+    lib_defaults : Defaults
+        Package defaults, with the cleaned directory and layout
+    columns : list of str, optional
+        Columns to read, all columns if not specified
+    filters : list of tuple, optional
+        Filters in `(column, op, value)` form, combined with AND
+    backend : {"numpy", "pyarrow", "arrow"}, optional
+        Backend of the columns of the table
+
+    Returns
+    -------
+    DataFrame or None
+        Table of all the years, or None if a year is not saved yet or
+        the schemas of the years do not match, in which case the years
+        should be read one by one
+
+    """
+    paths = [
+        utils.get_cleaned_path(table_name, year, lib_defaults, "partitioned")
+        for year in years
+    ]
+    for path in paths:
+        if (not path.exists()) or (utils.get_pending_table(path) is not None):
+            return None
+    try:
+        schema = pa.unify_schemas([pq.read_schema(path) for path in paths])
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return None
+    dataset = ds.dataset(
+        [str(path) for path in paths],
+        schema=schema,
+        format="parquet",
+        filesystem=pa.fs.LocalFileSystem(use_mmap=True),
+    )
+    if columns is not None:
+        columns = [column for column in schema.names if column in columns]
+        # Keep one column so that the number of rows is preserved
+        columns = columns or schema.names[:1]
+    filters = [
+        (column, operator, list(value) if isinstance(value, tuple) else value)
+        for column, operator, value in (filters or [])
+        if column in schema.names
+    ]
+    table = None
+    if len(filters) > 0:
+        try:
+            table = dataset.to_table(
+                columns=columns, filter=pq.filters_to_expression(filters)
+            )
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError, TypeError):
+            pass
+    if table is None:
+        table = dataset.to_table(columns=columns)
+    if backend == "numpy":
+        return table.to_pandas()
+    return table.to_pandas(types_mapper=_map_arrow_type)
+
+
+def filter_table(table: pd.DataFrame, conditions: str | list[str]) -> pd.DataFrame:
+    """Apply query conditions to a table one after another.
+
+    Parameters
+    ----------
+    table : DataFrame
+        Table to filter
+    conditions : str or list of str
+        Conditions as accepted by `DataFrame.query`
+
+    Returns
+    -------
+    table : DataFrame
+        Rows of the table that meet every condition
+
+    """
+    for condition in _as_condition_list(conditions):
+        table = table.query(condition)
+    return table
+
+
+def _as_condition_list(conditions: str | list[str] | None) -> list[str]:
+    if conditions is None:
+        return []
+    return [conditions] if isinstance(conditions, str) else list(conditions)
+
 
 def create_normalized_table(
     table_name: str,
@@ -749,6 +1917,7 @@ def create_normalized_table(
     lib_defaults: Defaults,
     lib_metadata: Metadata,
     settings: LoadTableSettings,
+    context: BuildContext | None = None,
 ) -> pd.DataFrame:
     """Construct a table by loading it for multiple years.
 
@@ -756,6 +1925,18 @@ def create_normalized_table(
     range of years. Concatenates the individual tables into
     one table indexed by year.
 
+    With the thread executor, the tables needed for all years are
+    planned as one graph (see `BuildPlan`) and built by at most
+    `settings.max_workers` threads, each table as soon as its inputs
+    are ready. Otherwise, years are built independently of each other,
+    one after another or in a process pool with at most
+    `settings.max_workers` years in progress at once. The result keeps
+    the order of `years` either way.
+
+    Tables built on the way are shared through `context`, so a table
+    needed several times, e.g. weights joined by two dependencies, is
+    built once. Process workers keep a context of their own.
+
     Parameters
     ----------
     table_name : str
@@ -764,6 +1945,8 @@ def create_normalized_table(
         Years to load table for
     settings : LoadTable, optional
         Settings for how to load each table
+    context : BuildContext, optional
+        Tables already built for the request, a new one if not specified
 
     Returns
     -------
@@ -771,15 +1954,141 @@ def create_normalized_table(
         Table concatenated across specified years
 
     """
-    table_list = []
-    for year in years:
-        table = TableFactory(
+    if (settings.executor == "thread") and (context is None):
+        plan = BuildPlan(
             table_name,
-            year,
+            years,
             lib_defaults=lib_defaults,
             lib_metadata=lib_metadata,
             settings=settings,
-        ).load()
-        table_list.append(table)
-    table = pd.concat(table_list, ignore_index=True)
+        )
+        plan.run(max_workers=settings.max_workers)
+        return _concat_annual_tables(plan.load(), lib_metadata)
+
+    executor_type = settings.executor
+    if context is not None and executor_type == "process":
+        # Nested builds share the context of the worker they run in
+        executor_type = "thread"
+    elif context is None and executor_type != "process":
+        context = BuildContext()
+    load_annual_table = functools.partial(
+        _load_annual_table,
+        table_name,
+        lib_defaults=lib_defaults,
+        lib_metadata=lib_metadata,
+        settings=settings,
+        context=context,
+    )
+    if (executor_type == "serial") or (len(years) <= 1):
+        table_list = [load_annual_table(year) for year in years]
+    elif executor_type == "thread":
+        service = _get_executor_service(lib_defaults)
+        table_list = service.map("cpu", load_annual_table, years)
+    elif executor_type == "process":
+        with ProcessPoolExecutor(max_workers=settings.max_workers) as executor:
+            table_list = list(executor.map(load_annual_table, years))
+    else:
+        raise ValueError(f"Executor {executor_type} is not valid")
+    table = _concat_annual_tables(table_list, lib_metadata)
     return table
+
+
+def _load_annual_table(
+    table_name: str,
+    year: int,
+    *,
+    lib_defaults: Defaults,
+    lib_metadata: Metadata,
+    settings: LoadTableSettings,
+    context: BuildContext | None = None,
+) -> pd.DataFrame:
+    if context is None:
+        context = BuildContext()
+    return TableFactory(
+        table_name,
+        year,
+        lib_defaults=lib_defaults,
+        lib_metadata=lib_metadata,
+        settings=settings,
+        context=context,
+    ).load()
+
+
+def _get_executor_service(lib_defaults: Defaults) -> utils.ExecutorService:
+    return utils.get_executor_service(**lib_defaults.executor_service.model_dump())
+
+
+def _concat_annual_tables(
+    table_list: list[pd.DataFrame], lib_metadata: Metadata
+) -> pd.DataFrame:
+    # Empty years are left out so that they do not change column types
+    non_empty_tables = [
+        _compact_common_columns(table, lib_metadata)
+        for table in table_list
+        if not table.empty
+    ]
+    return utils.concat_tables(non_empty_tables or table_list, ignore_index=True)
+
+
+def table_name_dtype(
+    lib_metadata: Metadata, table_name: str | None = None
+) -> pd.CategoricalDtype:
+    """Type of the `Table_Name` column.
+
+    The categories are the names of all tables in the metadata, so
+    tables of different years and names share the same type and stay
+    categorical when they are concatenated.
+
+    Parameters
+    ----------
+    lib_metadata : Metadata
+        Metadata of the tables
+    table_name : str, optional
+        Name that must be a category, added if the metadata lacks it
+
+    Returns
+    -------
+    CategoricalDtype
+        Shared type of the column
+
+    """
+    table_names = set(lib_metadata.tables.get("table_availability", {}))
+    table_names.update(lib_metadata.schema)
+    if table_name is not None:
+        table_names.add(table_name)
+    return _create_table_name_dtype(tuple(sorted(map(str, table_names))))
+
+
+@functools.lru_cache(maxsize=16)
+def _create_table_name_dtype(table_names: tuple[str, ...]) -> pd.CategoricalDtype:
+    return pd.CategoricalDtype(list(table_names))
+
+
+def _compact_common_columns(
+    table: pd.DataFrame, lib_metadata: Metadata
+) -> pd.DataFrame:
+    # Year and Table_Name are repeated on every row; read back from files
+    # or built elsewhere, they are converted to the compact shared types
+    updates = {}
+    if "Year" in table.columns:
+        year = table["Year"]
+        if (
+            (year.dtype != YEAR_DTYPE)
+            and pd.api.types.is_integer_dtype(year.dtype)
+            and not year.hasnans
+            and year.between(np.iinfo(YEAR_DTYPE).min, np.iinfo(YEAR_DTYPE).max).all()
+        ):
+            updates["Year"] = year.astype(YEAR_DTYPE)
+    if "Table_Name" in table.columns:
+        table_names = table["Table_Name"]
+        dtype = table_name_dtype(lib_metadata)
+        if table_names.dtype != dtype:
+            new_names = set(table_names.dropna().unique()) - set(dtype.categories)
+            if new_names:
+                dtype = _create_table_name_dtype(
+                    tuple(sorted([*dtype.categories, *map(str, new_names)]))
+                )
+            updates["Table_Name"] = table_names.astype(dtype)
+    if not updates:
+        return table
+    return table.assign(**updates)
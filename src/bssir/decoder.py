@@ -14,18 +14,35 @@ Functions
 --------- 
 read_classification_info - Reads classified metadata by name.
 create_classification_table - Creates table from classified metadata.
+compile_code_ranges - Compiles code ranges into sorted interval arrays.
+match_codes - Matches codes to the intervals that contain them.
 
 The decoders resolve metadata versions, map codes to attributes, 
 and add decoded columns to the input tables.
 
+Compiled classifications, the items of a year and the interval arrays
+of their code ranges, are stored in the `classifications` folder of
+the cache directory, keyed by a hash of the metadata files they are
+resolved from, and memory-mapped when loaded again. Only the last used
+version of each classification and year is kept by
+`CacheCatalog.sweep`, and only the last few loaded ones are kept in
+memory.
+
 The functions provide helpers for resolving metadata and reading
 classification info from the raw metadata.
 
 """
+from collections import OrderedDict
 from itertools import product
+from pathlib import Path
 from typing import Callable, Iterable, Literal, Annotated, Any, Optional
+import os
+import threading
+import uuid
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 from pydantic import BaseModel, ConfigDict, BeforeValidator, Field
 
 from .metadata_reader import Defaults, Metadata
@@ -99,6 +116,160 @@ def extract_column(table: pd.DataFrame, column_name: str) -> pd.Series:
     return column
 
 
+def compile_code_ranges(code_ranges: Iterable[utils.Argham]) -> np.ndarray:
+    """Compiles code ranges into sorted interval arrays.
+
+    Every range of every Argham becomes one interval, a row of
+    `(start, stop, step, item)`, where `item` is the position of the
+    Argham in `code_ranges`. Intervals are sorted by start.
+
+    Parameters
+    ----------
+    code_ranges : Iterable[Argham]
+        Code ranges of the classification items.
+
+    Returns
+    -------
+    ndarray
+        Int64 array with one row per interval and four columns.
+
+    Examples
+    --------
+    >>> compile_code_ranges([utils.Argham([1, {"start": 5, "end": 9}])])
+    array([[1, 2, 1, 0],
+           [5, 9, 1, 0]])
+    """
+    intervals = []
+    for item, code_range in enumerate(code_ranges):
+        for number_range in code_range.range_set:
+            if number_range.step < 0:
+                number_range = number_range[::-1]
+            if len(number_range) > 0:
+                intervals.append(
+                    (number_range.start, number_range.stop, number_range.step, item)
+                )
+    intervals = np.array(intervals, dtype="int64").reshape(-1, 4)
+    return intervals[np.lexsort((intervals[:, 3], intervals[:, 0]))]
+
+
+def match_codes(
+    codes: np.ndarray, intervals: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """Matches codes to the intervals that contain them.
+
+    The codes are sorted once, and the codes inside each interval are
+    found with a binary search of its bounds, so the cost grows with the
+    number of matches instead of the number of codes times intervals.
+
+    Parameters
+    ----------
+    codes : ndarray
+        Integer codes.
+    intervals : ndarray
+        Intervals, as compiled by `compile_code_ranges`.
+
+    Returns
+    -------
+    tuple[ndarray, ndarray]
+        Position of the code and item of the interval of every match.
+
+    Examples
+    --------
+    >>> intervals = compile_code_ranges([utils.Argham({"start": 1, "end": 5})])
+    >>> match_codes(np.array([7, 3, 1]), intervals)
+    (array([2, 1]), array([0, 0]))
+    """
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+    starts, stops, steps, items = intervals.T
+    low = np.searchsorted(sorted_codes, starts, side="left")
+    counts = np.searchsorted(sorted_codes, stops, side="left") - low
+    interval_ids = np.repeat(np.arange(len(intervals)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    positions = low[interval_ids] + offsets
+    matched = (sorted_codes[positions] - starts[interval_ids]) % steps[interval_ids]
+    matched = matched == 0
+    code_positions = order[positions[matched]]
+    code_items = items[interval_ids[matched]]
+    if len(np.unique(items)) < len(items):
+        # Overlapping ranges of one item match a code only once
+        pairs = np.unique(np.stack([code_positions, code_items]), axis=1)
+        code_positions, code_items = pairs
+    return code_positions, code_items
+
+
+def _to_integer_codes(codes: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    # Integer value of the codes that have one, and their positions;
+    # other values are not in any range
+    if pd.api.types.is_numeric_dtype(codes.dtype):
+        values = codes.to_numpy(dtype="float64", na_value=np.nan)
+    else:
+        values = np.array(
+            [
+                value if isinstance(value, (int, float, np.number)) else np.nan
+                for value in codes
+            ],
+            dtype="float64",
+        )
+    valid = np.isfinite(values) & (values == np.floor(values))
+    positions = np.flatnonzero(valid)
+    return values[positions].astype("int64"), positions
+
+
+COMPILED_FOLDER = "classifications"
+_COMPILED_FORMAT = 1
+_METADATA_FILES = {
+    "commodity": "commodities",
+    "industry": "industries",
+    "occupation": "occupations",
+}
+
+_Compiled = tuple[pd.DataFrame, np.ndarray]
+
+_COMPILED_MEMO_SIZE = 16
+
+_compiled: OrderedDict[str, _Compiled] = OrderedDict()
+_compiled_lock = threading.Lock()
+
+
+def _read_compiled(path: Path) -> _Compiled | None:
+    try:
+        intervals = np.load(path.with_suffix(".npy"), mmap_mode="r")
+        source = pa.memory_map(str(path.with_suffix(".arrow")))
+        items = pa.ipc.open_file(source).read_all().to_pandas()
+    except (OSError, ValueError):
+        return None
+    return items, intervals
+
+
+def _write_compiled(path: Path, items: pd.DataFrame, intervals: np.ndarray) -> None:
+    try:
+        table = pa.Table.from_pandas(items, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+        # Items with mixed-type attributes are compiled on every call
+        return
+    # The items file is written last, so a compiled classification is
+    # only read once both files are complete
+    for suffix in (".npy", ".arrow"):
+        target = path.with_suffix(suffix)
+        temp_path = target.with_name(f"{target.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if suffix == ".npy":
+                with open(temp_path, mode="wb") as file:
+                    np.save(file, intervals)
+            else:
+                with pa.OSFile(str(temp_path), "wb") as sink:
+                    with pa.ipc.new_file(sink, table.schema) as writer:
+                        writer.write_table(table)
+            os.replace(temp_path, target)
+        except OSError:
+            # The compiled files are only an optimization
+            return
+        finally:
+            temp_path.unlink(missing_ok=True)
+
+
 _Aspects = Annotated[tuple[str, ...], BeforeValidator(maybe_to_tuple)]
 _Levels = Annotated[tuple[int, ...], BeforeValidator(maybe_to_tuple)]
 _ColumnNames = Annotated[tuple[str, ...], BeforeValidator(maybe_to_tuple)]
@@ -258,7 +429,10 @@ class Decoder:
     Attributes
     ----------
     classification_table : DataFrame
-        Resolved classification metadata.
+        Resolved classification items of every year.
+
+    intervals : dict[int, ndarray]
+        Compiled code ranges of the items of each year.
 
     year_code_pairs : DataFrame
         Unique year and code combinations.
@@ -282,11 +456,88 @@ class Decoder:
         self.settings = settings
         self.code_column = extract_column(table, settings.target)
         self.year_column = extract_column(table, settings.year_col)
-        self.classification_table = self.create_classification_table(
+        self.classification_table, self.intervals = self._load_classification(
             years=self.year_column.drop_duplicates().to_list(),
         )
         self.year_code_pairs = self._create_year_code_pairs()
 
+    def _load_classification(
+        self, years: Iterable[int]
+    ) -> tuple[pd.DataFrame, dict[int, np.ndarray]]:
+        table_list, intervals = [], {}
+        for year in years:
+            items, intervals[year] = self.load_compiled_classification(year)
+            table_list.append(items.assign(**{self.settings.year_col: year}))
+        return pd.concat(table_list, ignore_index=True), intervals
+
+    def load_compiled_classification(self, year: int) -> _Compiled:
+        """Loads the classification items and code intervals of a year.
+
+        The compiled classification is read, memory-mapped, from the
+        cache directory. If it is missing, it is built from the metadata
+        with `create_classification_table` and `compile_code_ranges`,
+        and saved for later calls. Compiled classifications are keyed by
+        the contents of the metadata files, so editing a file builds
+        them again; changes made to the loaded metadata in memory are
+        not detected.
+
+        Parameters
+        ----------
+        year : int
+            Year of the classification.
+
+        Returns
+        -------
+        tuple[DataFrame, ndarray]
+            Items of the classification, without code ranges, and the
+            intervals of their code ranges.
+
+        """
+        slot_key, key = self._compiled_keys(year)
+        with _compiled_lock:
+            if key in _compiled:
+                _compiled.move_to_end(key)
+                return _compiled[key]
+        lib_defaults = self.settings.lib_defaults
+        path = utils.get_version_dir(
+            lib_defaults.dir.cached.joinpath(COMPILED_FOLDER), slot_key, key
+        ).joinpath("compiled")
+        compiled = _read_compiled(path)
+        if compiled is None:
+            table = self.create_classification_table([year])
+            items = table.drop(columns=["code_range", "Year"])
+            intervals = compile_code_ranges(table["code_range"])
+            _write_compiled(path, items, intervals)
+            # Read back, so that later calls get the same dtypes
+            compiled = _read_compiled(path) or (items, intervals)
+        with _compiled_lock:
+            _compiled[key] = compiled
+            if len(_compiled) > _COMPILED_MEMO_SIZE:
+                _compiled.popitem(last=False)
+        return compiled
+
+    def _compiled_keys(self, year: int) -> tuple[str, str]:
+        lib_defaults = self.settings.lib_defaults
+        file_name = _METADATA_FILES[self.settings.classification_type]  # type: ignore
+        paths = [
+            lib_defaults.base_package_metadata[file_name],
+            lib_defaults.package_metadata[file_name],
+            lib_defaults.local_metadata[file_name],
+        ]
+        package_names = {"bssir", lib_defaults.package_name.lower()}
+        slot = {
+            "classification": [self.settings.classification_type, self.settings.name],
+            "year": int(year),
+        }
+        inputs = {
+            **slot,
+            "files": [utils.file_fingerprint(path, "content") for path in paths],
+            "code_bounds": [lib_defaults.years[0], lib_defaults.years[-1] + 1],
+            "packages": utils.package_versions(*sorted(package_names)),
+            "format": _COMPILED_FORMAT,
+        }
+        return utils.create_cache_key(slot), utils.create_cache_key(inputs)
+
     def create_classification_table(
         self,
         years: Iterable[int],
@@ -343,32 +594,28 @@ class Decoder:
             yc_pair_list.append(yc_pair)
         return pd.concat(yc_pair_list, ignore_index=True)
 
-    def _build_year_code_table(
-        self, year_code_pairs: pd.DataFrame, row: pd.Series
-    ) -> pd.DataFrame:
-        filt = (
-            year_code_pairs[self.settings.target]
-            .apply(lambda x: x in row["code_range"])
-        )
-        filt = filt & (
-            year_code_pairs[self.settings.year_col] == row[self.settings.year_col]
-        )
-        matched_codes = year_code_pairs.loc[filt].set_index(
-            [self.settings.year_col, self.settings.target]
-        )
-        columns = row.drop(["code_range", self.settings.year_col]).index
-        code_table = pd.DataFrame(
-            data=[row.loc[columns]] * len(matched_codes.index),
-            index=matched_codes.index,
-            columns=columns,
+    def _match_year_codes(self, year: int) -> tuple[np.ndarray, np.ndarray]:
+        """Matches the codes of a year to classification rows.
+
+        Returns the positions in `year_code_pairs` and in
+        `classification_table` of every matching pair.
+        """
+        year_col = self.settings.year_col
+        rows = np.flatnonzero(self.classification_table[year_col] == year)
+        pairs = np.flatnonzero(self.year_code_pairs[year_col] == year)
+        intervals = self.intervals[year]
+        codes, code_positions = _to_integer_codes(
+            self.year_code_pairs[self.settings.target].iloc[pairs]
         )
-        return code_table
+        matched_codes, matched_items = match_codes(codes, intervals)
+        return pairs[code_positions[matched_codes]], rows[matched_items]
 
     def create_mapping_table(self) -> pd.DataFrame:
         """Creates code mapping table from metadata.
 
-        Loops through classification table and builds a mapping
-        table linking codes to metadata based on year.
+        Compiles the code ranges of each year into interval arrays and
+        matches the codes of that year to them, building a mapping table
+        linking codes to metadata based on year.
 
         Multi-index columns are renamed using the settings.
         Table is validated before returning.
@@ -380,17 +627,26 @@ class Decoder:
 
         See Also
         --------
-        _build_year_code_table : Builds table for a single row.
+        _match_year_codes : Matches the codes of a single year.
 
         _validate_mapping_table : Validates mapping integrity.
 
         """
-        code_table_list = []
-        for _, row in self.classification_table.iterrows():
-            code_table = self._build_year_code_table(self.year_code_pairs, row)
-            if not code_table.empty:
-                code_table_list.append(code_table)
-        mapping_table = pd.concat(code_table_list)
+        pair_list, row_list = [], []
+        for year in self.year_code_pairs[self.settings.year_col].drop_duplicates():
+            pairs, rows = self._match_year_codes(year)
+            pair_list.append(pairs)
+            row_list.append(rows)
+        pairs = np.concatenate(pair_list).astype("int64")
+        rows = np.concatenate(row_list).astype("int64")
+        mapping_table = self.classification_table.drop(
+            columns=self.settings.year_col
+        ).iloc[rows]
+        mapping_table.index = pd.MultiIndex.from_frame(
+            self.year_code_pairs.iloc[pairs].loc[
+                :, [self.settings.year_col, self.settings.target]
+            ]
+        )
         mapping_table = mapping_table.set_index("level", append=True)
         self._validate_mapping_table(mapping_table)
         mapping_table = mapping_table.unstack(-1)
@@ -666,6 +922,6 @@ class IDDecoder:
         """
         mapping_table = self.construct_mapping_table()
         year_and_id = [self.settings.year_col, self.settings.id_col]
-        self.table = self.table.join(mapping_table, year_and_id)
+        self.table = utils.join_on_keys(self.table, mapping_table, year_and_id)
         return self.table
  
\ No newline at end of file
@@ -204,10 +204,9 @@ class ExternalDataCleaner:
             return None
 
     def save_table(self, table: pd.DataFrame) -> None:
-        self.lib_defaults.dir.external.mkdir(exist_ok=True, parents=True)
-        table.to_parquet(
-            self.lib_defaults.dir.external.joinpath(f"{self.name}.parquet")
-        )
+        file_path = self.lib_defaults.dir.external.joinpath(f"{self.name}.parquet")
+        with utils.FileLock(file_path):
+            utils.write_parquet(table, file_path)
 
     def _download_table(self) -> pd.DataFrame:
         url = (
@@ -215,7 +214,10 @@ class ExternalDataCleaner:
             f"{self.lib_defaults.get_online_dir(self.source).external}/"
             f"{self.name}.parquet"
         )
-        table = pd.read_parquet(url)
         if self.settings.save_downloaded:
+            table = pd.read_parquet(url)
             self.save_table(table)
+        else:
+            cache_dir = self.lib_defaults.dir.cached.joinpath(utils.BLOCK_CACHE_FOLDER)
+            table = utils.read_remote_table(url, cache_dir).to_pandas()
         return table
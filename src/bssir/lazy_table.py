@@ -0,0 +1,348 @@
+"""Lazy queries over loaded tables.
+
+`API.scan_table` returns a `LazyTable`, which records the operations
+chained on it instead of running them. When the result is collected,
+the whole chain is planned at once:
+
+- filters that only use columns of the scanned table are pushed into
+  the load, where they skip row groups while reading,
+- only the columns that later operations and the final selection use
+  are loaded,
+- tables scanned several times in the chain, including the weights,
+  are loaded once.
+
+Loading goes through `API.load_table`, so tables are built by the
+usual `TableFactory` and `Pipeline` machinery.
+
+Classes
+-------
+LazyTable - Chain of operations on a table, run when collected.
+
+"""
+import ast
+from typing import TYPE_CHECKING, Any, Iterable, Literal
+
+import pandas as pd
+
+from . import data_engine, decoder, utils
+
+if TYPE_CHECKING:
+    from .api import API
+
+_Operation = tuple[str, Any]
+# Table name, years, settings of `API.load_table` and filters
+_Scan = tuple[str, tuple[int, ...], dict, tuple[str, ...]]
+
+WEIGHT_TABLE = "Weight"
+
+_LITERAL_NAMES = {"True", "False", "None"}
+
+
+class LazyTable:
+    """Chain of operations on a table, run when collected.
+
+    Every method returns a new lazy table with one more operation, so
+    a lazy table can be reused as the start of several chains.
+
+    Parameters
+    ----------
+    api : API
+        API used to load the tables
+    table_name : str
+        Name of the scanned table
+    years : list of int
+        Years of the scanned table
+    load_kwargs : dict, optional
+        Settings passed to `API.load_table`
+    operations : tuple, optional
+        Operations chained so far
+
+    Examples
+    --------
+    >>> query = (
+    ...     api.scan_table("Expenditures", [1400, 1401])
+    ...     .filter("Gross_Expenditure > 0")
+    ...     .add_weight()
+    ...     .select(["Year", "ID", "Gross_Expenditure", "Weight"])
+    ... )  # doctest: +SKIP
+    >>> table = query.collect()  # doctest: +SKIP
+    """
+
+    def __init__(
+        self,
+        api: "API",
+        table_name: str,
+        years: Iterable[int],
+        load_kwargs: dict | None = None,
+        operations: Iterable[_Operation] = (),
+    ) -> None:
+        self.api = api
+        self.table_name = table_name
+        self.years = list(years)
+        self.load_kwargs = {} if load_kwargs is None else dict(load_kwargs)
+        self.operations = tuple(operations)
+
+    def select(self, columns: str | Iterable[str]) -> "LazyTable":
+        """Keep only some columns, in the given order."""
+        columns = [columns] if isinstance(columns, str) else list(columns)
+        return self._chain("select", columns)
+
+    def filter(self, conditions: str | Iterable[str]) -> "LazyTable":
+        """Keep the rows that meet conditions, as accepted by `DataFrame.query`."""
+        conditions = [conditions] if isinstance(conditions, str) else conditions
+        table = self
+        for condition in conditions:
+            table = table._chain("filter", condition)
+        return table
+
+    def add_attribute(self, name: str, **kwargs) -> "LazyTable":
+        """Add a household attribute, as `API.add_attribute` does."""
+        return self._chain("add_attribute", {"name": name, **kwargs})
+
+    def add_weight(self) -> "LazyTable":
+        """Add the sampling weight column, as `API.add_weight` does."""
+        return self._chain("add_weight", None)
+
+    def join(
+        self,
+        other: "LazyTable | pd.DataFrame",
+        on: str | Iterable[str] | None = None,
+        how: Literal["left", "inner"] = "left",
+    ) -> "LazyTable":
+        """Join the columns of another table on key columns.
+
+        The other table must not have other columns in common with this
+        one. Keys default to the year and household ID columns.
+        """
+        if on is None:
+            on = [self._columns.year, self._columns.id]
+        on = [on] if isinstance(on, str) else list(on)
+        return self._chain("join", (other, on, how))
+
+    def collect(self) -> pd.DataFrame:
+        """Plan the chain of operations, run it and return the result."""
+        session = _Session(self.api)
+        for scan, columns in self._scans():
+            session.register(scan, columns)
+        backend = self.load_kwargs.get(
+            "backend", self.api.defaults.functions.load_table.backend
+        )
+        return data_engine.convert_backend(self._run(session), backend)
+
+    def explain(self) -> str:
+        """Describe the plan that `collect` would run."""
+        return "\n".join(self._explain_lines())
+
+    @property
+    def _columns(self):
+        return self.api.defaults.columns
+
+    def _chain(self, name: str, argument: Any) -> "LazyTable":
+        return LazyTable(
+            self.api,
+            self.table_name,
+            self.years,
+            self.load_kwargs,
+            self.operations + ((name, argument),),
+        )
+
+    def _scan(self, filters: list[str]) -> _Scan:
+        return (self.table_name, tuple(self.years), self.load_kwargs, tuple(filters))
+
+    def _weight_scan(self) -> _Scan:
+        # Weights are loaded in their own form, with the other settings
+        load_kwargs = {
+            key: value for key, value in self.load_kwargs.items() if key != "form"
+        }
+        return (WEIGHT_TABLE, tuple(self.years), load_kwargs, ())
+
+    def _plan(self) -> tuple[list[str] | None, list[str], list[_Operation]]:
+        """Split the chain into the load and the operations after it.
+
+        Returns the columns and filters to load the scanned table with,
+        and the operations left to apply to it.
+        """
+        produced: set[str] | None = set()
+        filters, operations = [], []
+        for name, argument in self.operations:
+            if name == "filter":
+                used = _condition_columns(argument)
+                if (produced is not None) and (used is not None):
+                    if not used & produced:
+                        filters.append(argument)
+                        continue
+            operations.append((name, argument))
+            added = self._added_columns(name, argument)
+            produced = utils.union_columns(produced, added)
+
+        needed: set[str] | None = None
+        for name, argument in reversed(operations):
+            if name == "select":
+                selected = set(argument)
+                needed = selected if needed is None else needed & selected
+            elif needed is None:
+                continue
+            elif name == "filter":
+                needed = utils.union_columns(needed, _condition_columns(argument))
+            elif name == "join":
+                added = self._added_columns(name, argument)
+                if added is None:
+                    needed = None
+                else:
+                    needed = (needed - added) | set(argument[1])
+            else:
+                added = self._added_columns(name, argument)
+                needed = (needed - added) | {self._columns.year, self._columns.id}
+        columns = None if needed is None else sorted(needed)
+        return columns, filters, operations
+
+    def _added_columns(self, name: str, argument: Any) -> set[str] | None:
+        if name == "add_attribute":
+            return set(self._attribute_columns(argument))
+        if name == "add_weight":
+            return {self._columns.weight}
+        if name == "join":
+            other, on, _ = argument
+            return _output_columns(other, set(on))
+        return set()
+
+    def _attribute_columns(self, argument: dict) -> tuple[str, ...]:
+        settings = decoder.IDDecoderSettings(
+            **argument,
+            lib_defaults=self.api.defaults,
+            lib_metadata=self.api.metadata,
+        )
+        return settings.column_names
+
+    def _scans(self) -> Iterable[tuple[_Scan, list[str] | None]]:
+        columns, filters, operations = self._plan()
+        yield self._scan(filters), columns
+        for name, argument in operations:
+            if name == "add_weight":
+                yield self._weight_scan(), self._weight_columns()
+            elif (name == "join") and isinstance(argument[0], LazyTable):
+                yield from argument[0]._scans()
+
+    def _weight_columns(self) -> list[str]:
+        return [self._columns.year, self._columns.id, self._columns.weight]
+
+    def _run(self, session: "_Session") -> pd.DataFrame:
+        columns, filters, operations = self._plan()
+        table = session.load(self._scan(filters), columns)
+        for name, argument in operations:
+            if name == "select":
+                table = table.loc[:, argument]
+            elif name == "filter":
+                table = table.query(argument)
+            elif name == "add_attribute":
+                table = self.api.add_attribute(table, **argument)
+            elif name == "add_weight":
+                weights = session.load(self._weight_scan(), self._weight_columns())
+                keys = [self._columns.year, self._columns.id]
+                table = utils.join_on_keys(table, weights, on=keys)
+            elif name == "join":
+                other, on, how = argument
+                if isinstance(other, LazyTable):
+                    other = other._run(session)
+                table = utils.join_on_keys(table, other, on=on, how=how)
+        return table
+
+    def _explain_lines(self) -> list[str]:
+        columns, filters, operations = self._plan()
+        years = ", ".join(str(year) for year in self.years)
+        lines = [f"scan {self.table_name} ({years})"]
+        lines.append(f"    columns: {'all' if columns is None else ', '.join(columns)}")
+        if filters:
+            lines.append(f"    filters: {' & '.join(filters)}")
+        for name, argument in operations:
+            if name == "select":
+                lines.append(f"select {', '.join(argument)}")
+            elif name == "filter":
+                lines.append(f"filter {argument}")
+            elif name == "add_attribute":
+                lines.append(f"add_attribute {argument['name']}")
+            elif name == "add_weight":
+                lines.append("add_weight")
+            elif name == "join":
+                other, on, how = argument
+                lines.append(f"join {how} on {', '.join(on)}")
+                if isinstance(other, LazyTable):
+                    lines.extend(f"    {line}" for line in other._explain_lines())
+                else:
+                    lines.append("    table")
+        return lines
+
+
+class _Session:
+    """Tables loaded while collecting a lazy table, each loaded once."""
+
+    def __init__(self, api: "API") -> None:
+        self.api = api
+        self._columns: dict[tuple, set[str] | None] = {}
+        self._tables: dict[tuple, pd.DataFrame] = {}
+
+    def register(self, scan: _Scan, columns: Iterable[str] | None) -> None:
+        """Add columns that a scan needs to load."""
+        key = _scan_key(scan)
+        if key in self._columns:
+            columns = utils.union_columns(self._columns[key], columns)
+        self._columns[key] = None if columns is None else set(columns)
+
+    def load(self, scan: _Scan, columns: list[str] | None) -> pd.DataFrame:
+        """Load a scan with every registered column, or reuse it."""
+        key = _scan_key(scan)
+        if key not in self._tables:
+            table_name, years, load_kwargs, filters = scan
+            if load_kwargs.get("backend") == "arrow":
+                # Operations run on DataFrames, converted when collected
+                load_kwargs = {**load_kwargs, "backend": "pyarrow"}
+            load_columns = self._columns.get(key, columns)
+            self._tables[key] = self.api.load_table(
+                table_name,
+                list(years),
+                **load_kwargs,
+                columns=None if load_columns is None else sorted(load_columns),
+                filters=list(filters) or None,
+            )
+        table = self._tables[key]
+        if (columns is None) or (list(table.columns) == columns):
+            return table
+        return table.loc[:, columns]
+
+
+def _scan_key(scan: _Scan) -> tuple:
+    table_name, years, load_kwargs, filters = scan
+    return (table_name, years, repr(sorted(load_kwargs.items())), filters)
+
+
+def _output_columns(table: LazyTable | pd.DataFrame, keys: set[str]) -> set | None:
+    # Columns that joining a table adds, None if unknown before loading
+    if isinstance(table, pd.DataFrame):
+        return set(table.columns) - keys
+    columns: set[str] | None = None
+    for name, argument in table.operations:
+        if name == "select":
+            columns = set(argument)
+        else:
+            columns = utils.union_columns(columns, table._added_columns(name, argument))
+    return None if columns is None else columns - keys
+
+
+def _condition_columns(condition: str) -> set[str] | None:
+    # Columns a query condition uses, None if it cannot be analyzed
+    parsed = utils.parse_expression(condition)
+    if parsed is None:
+        return None
+    tree, names = parsed
+    functions = {
+        node.func.id
+        for node in ast.walk(tree)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+    }
+    return {
+        names.get(node.id, node.id)
+        for node in ast.walk(tree)
+        if isinstance(node, ast.Name)
+        and (node.id not in _LITERAL_NAMES)
+        and (node.id not in functions)
+    }
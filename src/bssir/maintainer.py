@@ -6,6 +6,7 @@ import requests
 from botocore.exceptions import ClientError
 
 from .metadata_reader import Defaults, Metadata
+from .utils.layout_utils import get_mirror_file_name, list_cleaned_files
 from .utils.s3 import get_bucket
 
 
@@ -106,7 +107,9 @@ class Maintainer:
     ) -> None:
         """Uploads cleaned data files.
 
-        This function can be filtered by year and table name.
+        This function can be filtered by year and table name. Files
+        are uploaded under their flat names, `<year>_<table>.parquet`,
+        in both local layouts.
 
         Parameters
         ----------
@@ -119,18 +122,16 @@ class Maintainer:
 
         """
         logging.info("Starting upload of cleaned files...")
-        file_paths = self._get_cleaned_file_paths(years, table_names)
-        self._upload_files(
-            files_to_upload=file_paths,
-            local_base_path=self.lib_defaults.dir.cleaned,
-            online_base_url=self.online_dir.cleaned,
-        )
+        for file_path, file_name in self._get_cleaned_files(years, table_names):
+            self._upload_if_changed(
+                file_path, f"{self.online_dir.cleaned}/{file_name}"
+            )
         logging.info("Finished uploading cleaned files.")
 
-    def _get_cleaned_file_paths(
+    def _get_cleaned_files(
         self, years: Optional[list[int]], table_names: Optional[list[str]]
-    ) -> Iterable[Path]:
-        """Creates a generator for paths to cleaned files.
+    ) -> Iterable[tuple[Path, str]]:
+        """Creates a generator for cleaned files and their mirror names.
 
         Parameters
         ----------
@@ -142,18 +143,18 @@ class Maintainer:
 
         Yields
         ------
-        Path
-            The path to a cleaned file that matches the filter criteria.
+        tuple[Path, str]
+            The path to a cleaned file that matches the filter criteria,
+            and its file name on the mirror.
 
         """
-        for file_path in self.lib_defaults.dir.cleaned.iterdir():
-            year_str, table_name = file_path.stem.split("_", 1)
-            
-            if years and int(year_str) not in years:
+        cleaned_files = list_cleaned_files(self.lib_defaults.dir.cleaned)
+        for table_name, year, file_path in cleaned_files:
+            if years and year not in years:
                 continue
             if table_names and table_name not in table_names:
                 continue
-            yield file_path
+            yield file_path, get_mirror_file_name(table_name, year)
 
     def upload_external_files(self) -> None:
         """Uploads all external files."""
@@ -190,12 +191,24 @@ class Maintainer:
                 continue
 
             file_key = f"{online_base_url}/{file_path.relative_to(local_base_path).as_posix()}"
+            self._upload_if_changed(file_path, file_key)
 
-            if self._is_up_to_date(file_path, file_key):
-                logging.debug(f"File is up-to-date, skipping: {file_path.name}")
-                continue
+    def _upload_if_changed(self, file_path: Path, file_key: str) -> None:
+        """Uploads a file unless the online version is up-to-date.
+
+        Parameters
+        ----------
+        file_path : Path
+            Path to the local file.
+        file_key : str
+            The destination key (path) within the S3 bucket.
+
+        """
+        if self._is_up_to_date(file_path, file_key):
+            logging.debug(f"File is up-to-date, skipping: {file_path.name}")
+            return
 
-            self._upload_file(file_path, file_key)
+        self._upload_file(file_path, file_key)
 
     def _is_up_to_date(self, file_path: Path, file_key: str) -> bool:
         """Checks if a local file is the same size as the online version.
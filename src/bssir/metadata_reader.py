@@ -15,6 +15,10 @@ BASE_PACKAGE_DIRECTORY = Path(__file__).parents[0]
 ROOT_DIRECTORY = Path().absolute()
 
 _Years = int | Iterable[int] | str | Literal["all", "last"]
+# Settings store years as given in YAML files. `Iterable[int]` is left out
+# because pydantic validates it lazily, which turns strings such as "last"
+# into iterators that cannot be copied or pickled.
+_YearsSetting = int | list[int] | str
 
 
 def read_yaml(
@@ -200,7 +204,7 @@ class OnlineDirectory(BaseModel):
 
 
 class Setup(BaseModel):
-    years: _Years
+    years: _YearsSetting
     table_names: Any
     replace: bool
     method: Literal["create_from_raw", "download_cleaned"]
@@ -208,7 +212,7 @@ class Setup(BaseModel):
 
 
 class SetupRawData(BaseModel):
-    years: _Years
+    years: _YearsSetting
     replace: bool
     download_source: Literal["original", "mirror", "arvan", "amazon"]
 
@@ -220,6 +224,13 @@ class LoadTableSettings(BaseModel):
     redownload: bool
     save_created: bool
     recreate: bool
+    columns: Optional[list[str]] = None
+    filters: Optional[str | list[str]] = None
+    executor: Literal["serial", "thread", "process"] = "thread"
+    max_workers: Optional[int] = None
+    cache_validation: Literal["metadata", "content"] = "content"
+    write_behind: bool = True
+    backend: Literal["numpy", "pyarrow", "arrow"] = "numpy"
 
 
 class LoadExternalTableSettings(BaseModel):
@@ -231,6 +242,16 @@ class LoadExternalTableSettings(BaseModel):
     recreate: bool
 
 
+class CacheSettings(BaseModel):
+    max_size: Optional[int | str] = None
+    eviction: Literal["lru", "cost"] = "lru"
+
+
+class ExecutorServiceSettings(BaseModel):
+    io_workers: int = 8
+    cpu_workers: Optional[int] = None
+
+
 class DefaultFunctions(BaseModel):
     setup: Setup
     setup_raw_data: SetupRawData
@@ -267,10 +288,13 @@ class Defaults(BaseModel):
     in_root: bool
 
     folder_names: DefaultFolderName
+    cleaned_layout: Literal["flat", "partitioned"] = "flat"
     dir: DefaultDirectorie = Field(None, validate_default=False) # type: ignore
 
     columns: DefaultColumns
     functions: DefaultFunctions
+    cache: CacheSettings = Field(CacheSettings())
+    executor_service: ExecutorServiceSettings = Field(ExecutorServiceSettings())
 
     base_package_metadata: dict
     package_metadata: dict
@@ -1,5 +1,4 @@
 """HBSIR library utility functions"""
-from concurrent.futures import ThreadPoolExecutor
 from typing import Literal, Iterable
 from pathlib import Path
 
@@ -14,6 +13,55 @@ from .metadata_utils import (
     exteract_code_metadata,
 )
 from .argham import Argham
+from .pushdown_utils import (
+    extract_identifiers,
+    required_columns,
+    output_columns,
+    union_columns,
+    parse_filter,
+    pushdown_filters,
+    parse_expression,
+    replace_bitwise_operators,
+)
+from .cache_utils import file_fingerprint, package_versions, create_cache_key
+from .executor_utils import ExecutorService, get_executor_service
+from .io_utils import (
+    FileLock,
+    write_parquet,
+    write_parquet_behind,
+    get_pending_table,
+    flush,
+    get_version_dir,
+    remove_stale_versions,
+)
+from .pipeline_utils import (
+    PipelineStep,
+    compile_steps,
+    compile_pandas_function,
+    load_function,
+)
+from .concat_utils import concat_tables
+from .join_utils import pack_keys, sort_by_household, join_on_keys
+from .index_utils import ROW_GROUP_SIZE, HouseholdIndex, filter_ids, read_households
+from .remote_utils import (
+    BLOCK_SIZE,
+    BLOCK_CACHE_FOLDER,
+    RemoteFile,
+    read_remote_table,
+)
+from .layout_utils import (
+    get_cleaned_path,
+    get_mirror_file_name,
+    list_cleaned_files,
+    migrate_cleaned_files,
+)
+from .categorical_utils import CategoricalDefinition, compile_categories
+from .expression_utils import (
+    Expression,
+    compile_expression,
+    collect_expressions,
+    benchmark_expressions,
+)
 
 
 __all__ = [
@@ -74,17 +122,17 @@ class Utils:
         source: Literal["mirror"] | str = "mirror",
     ) -> None:
         table_years = self.create_table_year_pairs("all", years)
-        futures = []
-        with ThreadPoolExecutor(6) as executer:
-            for table_name, year in table_years:
-                futures.append(
-                    executer.submit(
-                        self._download_cleaned_table,
-                        year=year,
-                        table_name=table_name,
-                        source=source,
-                    )
-                )
+        service = get_executor_service(**self._defautls.executor_service.model_dump())
+        futures = [
+            service.submit(
+                "io",
+                self._download_cleaned_table,
+                year=year,
+                table_name=table_name,
+                source=source,
+            )
+            for table_name, year in table_years
+        ]
         list(future.result() for future in futures)
 
     def _download_cleaned_table(
@@ -93,8 +141,8 @@ class Utils:
         table_name: str,
         source: Literal["mirror"] | str = "mirror",
     ) -> None:
-        file_name = f"{year}_{table_name}.parquet"
-        path = self._defautls.dir.cleaned.joinpath(file_name)
+        file_name = get_mirror_file_name(table_name, year)
+        path = get_cleaned_path(table_name, year, self._defautls)
         url = (
             f"{self._defautls.get_mirror(source).bucket_address}/"
             f"{self._defautls.get_online_dir(source).cleaned}/"
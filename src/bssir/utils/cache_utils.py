@@ -0,0 +1,151 @@
+"""
+Cache key utilities.
+
+Builds keys that identify the content a cached table was built from,
+so that a cached table is reused only while its inputs are unchanged.
+
+Functions
+---------
+file_fingerprint - Fingerprint of a file, from its parquet metadata or content.
+
+package_versions - Versions of the installed packages that build tables.
+
+create_cache_key - Hash of the inputs of a cached table.
+
+"""
+import hashlib
+import importlib.metadata
+import json
+import struct
+import threading
+from pathlib import Path
+from typing import Any, Literal
+
+_CHUNK_SIZE = 1 << 20
+_PARQUET_MAGIC = b"PAR1"
+
+_fingerprints: dict[tuple, str] = {}
+_fingerprints_lock = threading.Lock()
+
+
+def file_fingerprint(
+    path: Path, method: Literal["metadata", "content"] = "content"
+) -> str | None:
+    """Fingerprint a file.
+
+    With the "content" method, files are identified by a hash of their
+    whole content. With the "metadata" method, parquet files are
+    identified by their footer, which holds the schema, row counts,
+    byte offsets and column statistics of every row group, and only the
+    footer is read. Most edits change the footer, but not all of them:
+    values moved around inside a row group leave the statistics and
+    sizes as they were, so "metadata" fingerprints are only safe for
+    files that are replaced as a whole. Other files are hashed in full
+    with either method.
+
+    Fingerprints are remembered for the life of the process, so files
+    whose size and modification time did not change are not read again.
+
+    Parameters
+    ----------
+    path : Path
+        Path of the file
+    method : {"metadata", "content"}, optional
+        What the fingerprint is computed from
+
+    Returns
+    -------
+    fingerprint : str or None
+        Hex digest identifying the file, None if the file is missing
+
+    """
+    if method not in ("metadata", "content"):
+        raise ValueError(f"Fingerprint method {method} is not valid")
+    path = Path(path)
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    memo_key = (str(path.resolve()), method, stat.st_size, stat.st_mtime_ns)
+    with _fingerprints_lock:
+        if memo_key in _fingerprints:
+            return _fingerprints[memo_key]
+    fingerprint = None
+    if method == "metadata":
+        footer = _read_parquet_footer(path)
+        if footer is not None:
+            digest = hashlib.sha256(footer)
+            digest.update(str(stat.st_size).encode())
+            fingerprint = f"footer:{digest.hexdigest()}"
+    if fingerprint is None:
+        fingerprint = f"content:{_hash_content(path)}"
+    with _fingerprints_lock:
+        _fingerprints[memo_key] = fingerprint
+    return fingerprint
+
+
+def _read_parquet_footer(path: Path) -> bytes | None:
+    with open(path, mode="rb") as file:
+        file.seek(0, 2)
+        file_size = file.tell()
+        if file_size < 12:
+            return None
+        file.seek(file_size - 8)
+        tail = file.read(8)
+        if tail[4:] != _PARQUET_MAGIC:
+            return None
+        footer_size = struct.unpack("<I", tail[:4])[0]
+        if footer_size > file_size - 12:
+            return None
+        file.seek(file_size - 8 - footer_size)
+        return file.read(footer_size)
+
+
+def _hash_content(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, mode="rb") as file:
+        for chunk in iter(lambda: file.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def package_versions(*package_names: str) -> dict[str, str | None]:
+    """Find the installed versions of packages.
+
+    Parameters
+    ----------
+    *package_names : str
+        Distribution names of the packages
+
+    Returns
+    -------
+    versions : dict
+        Version of each package, None if it is not installed
+
+    """
+    versions: dict[str, str | None] = {}
+    for package_name in package_names:
+        try:
+            versions[package_name] = importlib.metadata.version(package_name)
+        except importlib.metadata.PackageNotFoundError:
+            versions[package_name] = None
+    return versions
+
+
+def create_cache_key(inputs: Any) -> str:
+    """Hash the inputs of a cached table.
+
+    Parameters
+    ----------
+    inputs : Any
+        JSON serializable description of everything the table is built
+        from. Dictionary keys may come in any order.
+
+    Returns
+    -------
+    key : str
+        Hex digest of the inputs
+
+    """
+    text = json.dumps(inputs, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(text.encode()).hexdigest()
@@ -0,0 +1,222 @@
+"""
+Vectorized construction of categorical columns.
+
+The `categories` of a categorical `create_column` step map each
+category to a condition: `None` for every row, a value or list of
+values of the column itself, or a dictionary of values or lists of
+values that other columns must match. Rows matching several categories
+get the last one, and rows matching none are missing.
+
+Definitions are compiled once into a list of tests. Each distinct test
+is computed once per table, and the category codes of all rows are
+selected in a single pass. When every category only lists values of
+one column, codes are looked up directly from the values, in one pass
+whatever the number of categories.
+
+Classes
+-------
+CategoricalDefinition - A compiled categorical `create_column` step.
+
+Functions
+---------
+compile_categories - Compile the categories of a column, once per definition.
+
+"""
+import threading
+from typing import Any, Mapping
+
+import numpy as np
+import pandas as pd
+
+# A test is a column and a value it must equal, or a tuple of values it
+# must be one of
+_Test = tuple[str, Any]
+
+_compiled: dict[str, "CategoricalDefinition"] = {}
+_compiled_lock = threading.Lock()
+
+
+class CategoricalDefinition:
+    """A compiled categorical `create_column` step.
+
+    Use `compile_categories` to create one.
+
+    Parameters
+    ----------
+    column_name : str
+        Name of the created column
+    categories : dict
+        Condition of each category, as written in the schema
+
+    Attributes
+    ----------
+    dtype : CategoricalDtype
+        Type of the created column
+    columns : set of str
+        Columns the conditions refer to
+
+    """
+
+    def __init__(self, column_name: str, categories: dict) -> None:
+        self.dtype = pd.CategoricalDtype(list(categories.keys()))
+        # Conditions of every category, as tests that must all pass;
+        # None stands for every row
+        self._conditions: list[tuple[_Test, ...] | None] = []
+        for condition in categories.values():
+            if condition is None:
+                self._conditions.append(None)
+            elif isinstance(condition, dict):
+                self._conditions.append(
+                    tuple(
+                        _create_test(column, value)
+                        for column, value in condition.items()
+                    )
+                )
+            else:
+                self._conditions.append((_create_test(column_name, condition),))
+        self.columns = {
+            test[0]
+            for condition in self._conditions
+            if condition is not None
+            for test in condition
+        }
+        self._lookup = self._create_lookup()
+
+    def _create_lookup(self) -> tuple[str, pd.Index, np.ndarray] | None:
+        # Codes can be looked up from values when each category lists
+        # values of the same column
+        if len(self.columns) != 1:
+            return None
+        if any(
+            (condition is None) or (len(condition) != 1)
+            for condition in self._conditions
+        ):
+            return None
+        codes_of_values: dict[Any, int] = {}
+        for code, condition in enumerate(self._conditions):
+            assert condition is not None
+            _, value = condition[0]
+            for item in value if isinstance(value, tuple) else (value,):
+                if isinstance(item, bool):
+                    return None
+                # Later categories win, as if assigned one after another
+                codes_of_values.pop(item, None)
+                codes_of_values[item] = code
+        return (
+            next(iter(self.columns)),
+            pd.Index(list(codes_of_values.keys())),
+            np.array(list(codes_of_values.values()), dtype="int64"),
+        )
+
+    def evaluate(self, columns: Mapping[str, pd.Series], index: pd.Index) -> pd.Series:
+        """Create the categorical column.
+
+        Parameters
+        ----------
+        columns : mapping
+            Columns of the table, at least the referenced ones
+        index : Index
+            Index of the table
+
+        Returns
+        -------
+        Series
+            Categorical column, missing where no category matches
+
+        """
+        if self._lookup is not None:
+            codes = self._lookup_codes(columns)
+        else:
+            codes = self._select_codes(columns, len(index))
+        categorical = pd.Categorical.from_codes(codes, dtype=self.dtype)
+        return pd.Series(categorical, index=index)
+
+    def _lookup_codes(self, columns: Mapping[str, pd.Series]) -> np.ndarray:
+        assert self._lookup is not None
+        column_name, values, value_codes = self._lookup
+        if len(values) == 0:
+            return np.full(len(columns[column_name]), -1, dtype="int64")
+        positions = values.get_indexer(columns[column_name])
+        codes = value_codes[positions]
+        codes[positions == -1] = -1
+        return codes
+
+    def _select_codes(
+        self, columns: Mapping[str, pd.Series], n_rows: int
+    ) -> np.ndarray:
+        masks: dict[_Test, np.ndarray] = {}
+        conditions = []
+        for condition in self._conditions:
+            if condition is None:
+                conditions.append(np.ones(n_rows, dtype=bool))
+                continue
+            mask = None
+            for test in condition:
+                if test not in masks:
+                    masks[test] = _evaluate_test(test, columns)
+                mask = masks[test] if mask is None else mask & masks[test]
+            conditions.append(mask)
+        if len(conditions) == 0:
+            return np.full(n_rows, -1, dtype="int64")
+        # np.select takes the first match, and the last category should win
+        codes = np.select(
+            conditions[::-1],
+            np.arange(len(conditions), dtype="int64")[::-1],
+            default=-1,
+        )
+        return codes
+
+
+def _create_test(column: str, value: Any) -> _Test:
+    if isinstance(value, list):
+        return column, tuple(value)
+    if isinstance(value, (bool, str)):
+        return column, value
+    raise KeyError(f"Condition {value!r} on {column} is not valid")
+
+
+def _evaluate_test(test: _Test, columns: Mapping[str, pd.Series]) -> np.ndarray:
+    column_name, value = test
+    column = columns[column_name]
+    if isinstance(value, tuple):
+        result = column.isin(list(value))
+    else:
+        result = column == value
+    # Missing values match no category
+    return result.to_numpy(dtype=bool, na_value=False)
+
+
+def compile_categories(column_name: str, categories: dict) -> CategoricalDefinition:
+    """Compile the categories of a categorical column.
+
+    Results are cached by the definition, including the order of its
+    categories.
+
+    Parameters
+    ----------
+    column_name : str
+        Name of the created column
+    categories : dict
+        Condition of each category, as written in the schema
+
+    Returns
+    -------
+    CategoricalDefinition
+        Compiled definition
+
+    Examples
+    --------
+    >>> table = pd.DataFrame({"Code": [1, 2, 3, 4]})
+    >>> definition = compile_categories(
+    ...     "Kind", {"low": {"Code": [1, 2]}, "high": {"Code": [3]}}
+    ... )
+    >>> definition.evaluate(table, table.index).tolist()
+    ['low', 'low', 'high', nan]
+    """
+    key = repr((column_name, categories))
+    with _compiled_lock:
+        if key in _compiled:
+            return _compiled[key]
+    definition = CategoricalDefinition(column_name, categories)
+    with _compiled_lock:
+        return _compiled.setdefault(key, definition)
@@ -0,0 +1,94 @@
+"""
+Concatenation of tables that keeps categorical columns categorical.
+
+`pd.concat` only keeps a column categorical when it has exactly the
+same categories in every table; otherwise the column silently becomes
+an object column, which takes many times the memory. Tables of
+different years usually have different categories, since each year
+only uses some of them.
+
+Functions
+---------
+concat_tables - Concatenate tables, uniting the categories of their columns.
+
+"""
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+
+def concat_tables(tables: Iterable[pd.DataFrame], **kwargs) -> pd.DataFrame:
+    """Concatenate tables, uniting the categories of their columns.
+
+    Columns that are categorical in every table they appear in are
+    given the union of their categories, in order of appearance, and
+    stay categorical after concatenation. Tables that lack such a
+    column get it as missing values. Ordered categorical columns are
+    only united when their categories are equal.
+
+    Parameters
+    ----------
+    tables : iterable of DataFrame
+        Tables to concatenate along rows
+    **kwargs
+        Passed to `pd.concat`
+
+    Returns
+    -------
+    DataFrame
+        Concatenated table
+
+    Examples
+    --------
+    >>> first = pd.DataFrame({"Kind": pd.Categorical(["a"])})
+    >>> second = pd.DataFrame({"Kind": pd.Categorical(["b"])})
+    >>> table = concat_tables([first, second], ignore_index=True)
+    >>> table["Kind"].cat.categories.tolist()
+    ['a', 'b']
+    """
+    tables = list(tables)
+    dtypes = _unite_categories(tables)
+    if dtypes:
+        tables = [_recode(table, dtypes) for table in tables]
+    return pd.concat(tables, **kwargs)
+
+
+def _unite_categories(tables: list[pd.DataFrame]) -> dict[str, pd.CategoricalDtype]:
+    column_dtypes: dict[str, list] = {}
+    for table in tables:
+        for column, dtype in table.dtypes.items():
+            column_dtypes.setdefault(column, []).append(dtype)
+    united = {}
+    for column, dtypes in column_dtypes.items():
+        if not all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+            continue
+        if all(dtype == dtypes[0] for dtype in dtypes) and (len(dtypes) == len(tables)):
+            continue
+        if any(dtype.ordered for dtype in dtypes):
+            if all(dtype == dtypes[0] for dtype in dtypes):
+                united[column] = dtypes[0]
+            continue
+        categories = pd.Index(dtypes[0].categories)
+        for dtype in dtypes[1:]:
+            new_categories = dtype.categories.difference(categories, sort=False)
+            if len(new_categories) > 0:
+                categories = categories.append(new_categories)
+        united[column] = pd.CategoricalDtype(categories)
+    return united
+
+
+def _recode(
+    table: pd.DataFrame, dtypes: dict[str, pd.CategoricalDtype]
+) -> pd.DataFrame:
+    updates = {}
+    for column, dtype in dtypes.items():
+        if column not in table.columns:
+            codes = np.full(len(table), -1, dtype="int8")
+            updates[column] = pd.Categorical.from_codes(codes, dtype=dtype)
+        elif table[column].dtype != dtype:
+            updates[column] = table[column].cat.set_categories(dtype.categories)
+    if not updates:
+        return table
+    # New columns go last, as pd.concat would place them
+    return table.assign(**updates)
@@ -1,4 +1,5 @@
 import logging
+import os
 from pathlib import Path
 import platform
 from zipfile import ZipFile
@@ -7,6 +8,7 @@ import requests
 from tqdm.auto import tqdm
 
 from ..metadata_reader import defaults
+from .io_utils import FileLock
 
 
 def download(url: str, path: Path) -> None:
@@ -16,6 +18,10 @@ def download(url: str, path: Path) -> None:
     bar. It checks if the file already exists and has the same size as the
     remote file, in which case the download is skipped.
 
+    A lock on the file is held while downloading, so when several
+    processes ask for the same file, one downloads it and the others
+    find it complete and skip the download.
+
     Parameters
     ----------
     url : str
@@ -30,6 +36,11 @@ def download(url: str, path: Path) -> None:
     IOError
         If the server does not provide the file size in the headers.
     """
+    with FileLock(path):
+        _download(url, path)
+
+
+def _download(url: str, path: Path) -> None:
     logging.info(f"Downloading {url} to {path}.")
     part_path = path.with_suffix(path.suffix + ".part")
 
@@ -68,8 +79,7 @@ def download(url: str, path: Path) -> None:
                 file.write(chunk)
                 progress_bar.update(len(chunk))
 
-        path.unlink(missing_ok=True)
-        part_path.rename(path)
+        os.replace(part_path, path)
 
     except (requests.exceptions.RequestException, IOError) as e:
         logging.error(f"Download failed for {url}. Error: {e}")
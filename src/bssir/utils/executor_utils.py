@@ -0,0 +1,169 @@
+"""
+Shared worker pools.
+
+All loading functions run their parallel work on the pools of one
+executor service, instead of creating thread pools of their own, so the
+number of threads stays bounded however deeply loads are nested.
+
+Classes
+-------
+ExecutorService - An I/O pool and a CPU pool shared by a session.
+
+Functions
+---------
+get_executor_service - Shared executor service for the given pool sizes.
+
+"""
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, Literal, TypeVar
+
+_T = TypeVar("_T")
+_PoolKind = Literal["io", "cpu"]
+
+_worker_state = threading.local()
+
+
+class ExecutorService:
+    """An I/O pool and a CPU pool shared by a session.
+
+    The I/O pool is meant for reading, writing and downloading files,
+    and the CPU pool for building tables. Work submitted from a worker
+    of the pool it is submitted to runs inline, in the worker itself.
+    A worker therefore never waits for tasks queued behind it in its
+    own pool, which would deadlock once every worker is waiting.
+
+    Parameters
+    ----------
+    io_workers : int
+        Number of threads of the I/O pool
+    cpu_workers : int, optional
+        Number of threads of the CPU pool, the number of CPUs if not
+        specified
+
+    """
+
+    def __init__(self, io_workers: int, cpu_workers: int | None = None) -> None:
+        if cpu_workers is None:
+            cpu_workers = os.cpu_count() or 1
+        self._pools = {
+            kind: ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix=f"bssir-{kind}",
+                initializer=_mark_worker,
+                initargs=(id(self), kind),
+            )
+            for kind, workers in [("io", io_workers), ("cpu", cpu_workers)]
+        }
+
+    def in_pool(self, kind: _PoolKind) -> bool:
+        """Check if the current thread is a worker of a pool.
+
+        Parameters
+        ----------
+        kind : {"io", "cpu"}
+            Pool to check
+
+        Returns
+        -------
+        in_pool : bool
+            True if called from a worker of the pool
+
+        """
+        return getattr(_worker_state, "pool", None) == (id(self), kind)
+
+    def submit(
+        self, kind: _PoolKind, function: Callable[..., _T], *args, **kwargs
+    ) -> Future:
+        """Run a function on a pool.
+
+        Parameters
+        ----------
+        kind : {"io", "cpu"}
+            Pool to run the function on
+        function : callable
+            Function to run
+        *args, **kwargs
+            Arguments of the function
+
+        Returns
+        -------
+        future : Future
+            Result of the function, already set if it ran inline
+
+        """
+        if not self.in_pool(kind):
+            return self._pools[kind].submit(function, *args, **kwargs)
+        future: Future = Future()
+        try:
+            future.set_result(function(*args, **kwargs))
+        except BaseException as error:  # pylint: disable=broad-except
+            future.set_exception(error)
+        return future
+
+    def map(
+        self, kind: _PoolKind, function: Callable[..., _T], *iterables: Iterable
+    ) -> list[_T]:
+        """Apply a function to every item on a pool.
+
+        Parameters
+        ----------
+        kind : {"io", "cpu"}
+            Pool to run the function on
+        function : callable
+            Function to apply
+        *iterables : iterable
+            Arguments of the function
+
+        Returns
+        -------
+        results : list
+            Results in the order of the items
+
+        """
+        if self.in_pool(kind):
+            return list(map(function, *iterables))
+        return list(self._pools[kind].map(function, *iterables))
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the pools once their queued work is done."""
+        for pool in self._pools.values():
+            pool.shutdown(wait=wait)
+
+
+def _mark_worker(service_id: int, kind: str) -> None:
+    _worker_state.pool = (service_id, kind)
+
+
+_services: dict[tuple, ExecutorService] = {}
+_services_lock = threading.Lock()
+
+
+def get_executor_service(
+    io_workers: int = 8, cpu_workers: int | None = None
+) -> ExecutorService:
+    """Get the shared executor service for the given pool sizes.
+
+    The service is created on first use and shared by every later call
+    with the same sizes.
+
+    Parameters
+    ----------
+    io_workers : int, optional
+        Number of threads of the I/O pool
+    cpu_workers : int, optional
+        Number of threads of the CPU pool, the number of CPUs if not
+        specified
+
+    Returns
+    -------
+    service : ExecutorService
+        Shared executor service
+
+    """
+    key = (os.getpid(), io_workers, cpu_workers)
+    with _services_lock:
+        if key not in _services:
+            _services[key] = ExecutorService(io_workers, cpu_workers)
+        return _services[key]
@@ -0,0 +1,296 @@
+"""
+Household index of cleaned parquet files.
+
+Cleaned files are written sorted by year and household ID, in row
+groups of `ROW_GROUP_SIZE` rows, so the ID statistics of each row group
+cover a narrow range of households. The household index keeps these
+ranges in a small sidecar file next to the parquet file,
+`.<name>.ids.json`, so that finding the row groups of a set of
+households does not need to open the parquet file at all, and reading
+them only reads those row groups.
+
+The sidecar is built from the parquet footer the first time it is
+needed and rebuilt whenever the size or modification time of the
+parquet file changes. Files that are not sorted, such as older
+downloaded files, still work, only fewer row groups are skipped.
+
+Classes
+-------
+HouseholdIndex - ID ranges of the row groups of a parquet file.
+
+Functions
+---------
+filter_ids - Household IDs selected by parquet filters, if any.
+
+read_households - Read the rows of some households from a parquet file.
+
+"""
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+ROW_GROUP_SIZE = 16_384
+ID_COLUMN = "ID"
+INDEX_SUFFIX = ".ids.json"
+
+_indexes: dict[tuple, "HouseholdIndex"] = {}
+_indexes_lock = threading.Lock()
+
+
+class HouseholdIndex:
+    """ID ranges of the row groups of a parquet file.
+
+    Parameters
+    ----------
+    minimums : array-like
+        Smallest ID of each row group
+    maximums : array-like
+        Largest ID of each row group
+
+    Row groups without statistics get the full int64 range, so they are
+    always read.
+
+    """
+
+    def __init__(self, minimums: Iterable[int], maximums: Iterable[int]) -> None:
+        self.minimums = np.asarray(minimums, dtype="int64")
+        self.maximums = np.asarray(maximums, dtype="int64")
+
+    def __len__(self) -> int:
+        return len(self.minimums)
+
+    def find_row_groups(self, ids: Iterable[int]) -> list[int]:
+        """Find the row groups that may hold some of the IDs.
+
+        Parameters
+        ----------
+        ids : iterable of int
+            Household IDs
+
+        Returns
+        -------
+        list of int
+            Row group numbers, in file order
+
+        Examples
+        --------
+        >>> HouseholdIndex([1, 10, 20], [9, 19, 29]).find_row_groups([12, 25, 40])
+        [1, 2]
+        """
+        ids = np.unique(np.asarray(list(ids), dtype="int64"))
+        first = np.searchsorted(ids, self.minimums, side="left")
+        last = np.searchsorted(ids, self.maximums, side="right")
+        return np.flatnonzero(last > first).tolist()
+
+    @classmethod
+    def from_parquet(
+        cls, path: Path, column: str = ID_COLUMN
+    ) -> "HouseholdIndex | None":
+        """Build the index from the statistics in a parquet footer.
+
+        Parameters
+        ----------
+        path : Path
+            Path of the parquet file
+        column : str, optional
+            Household ID column
+
+        Returns
+        -------
+        HouseholdIndex or None
+            Index of the file, None if it has no integer ID column
+
+        """
+        metadata = pq.read_metadata(path)
+        schema = metadata.schema.to_arrow_schema()
+        if (column not in schema.names) or not pa.types.is_integer(
+            schema.field(column).type
+        ):
+            return None
+        column_index = schema.get_field_index(column)
+        low, high = np.iinfo("int64").min, np.iinfo("int64").max
+        minimums, maximums = [], []
+        for row_group in range(metadata.num_row_groups):
+            statistics = metadata.row_group(row_group).column(column_index).statistics
+            if (statistics is None) or not statistics.has_min_max:
+                minimums.append(low)
+                maximums.append(high)
+            else:
+                minimums.append(statistics.min)
+                maximums.append(statistics.max)
+        return cls(minimums, maximums)
+
+    @classmethod
+    def load(cls, path: Path, column: str = ID_COLUMN) -> "HouseholdIndex | None":
+        """Load the index of a parquet file, building it if needed.
+
+        The index is read from the sidecar file when it matches the
+        parquet file, and otherwise built from the footer and saved.
+
+        Parameters
+        ----------
+        path : Path
+            Path of the parquet file
+        column : str, optional
+            Household ID column
+
+        Returns
+        -------
+        HouseholdIndex or None
+            Index of the file, None if it has no integer ID column
+
+        """
+        path = Path(path)
+        stat = path.stat()
+        source = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "column": column}
+        memo_key = (str(path.resolve()), *source.values())
+        with _indexes_lock:
+            if memo_key in _indexes:
+                return _indexes[memo_key]
+        index = _read_sidecar(path, source)
+        if index is None:
+            index = cls.from_parquet(path, column)
+            _write_sidecar(path, source, index)
+        with _indexes_lock:
+            _indexes[memo_key] = index
+        return index
+
+
+def _get_index_path(path: Path) -> Path:
+    path = Path(path)
+    return path.with_name(f".{path.name}{INDEX_SUFFIX}")
+
+
+def _read_sidecar(path: Path, source: dict) -> HouseholdIndex | None:
+    try:
+        with open(_get_index_path(path), encoding="utf-8") as file:
+            content = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if content.get("source") != source:
+        return None
+    row_groups = content["row_groups"]
+    return HouseholdIndex(
+        [low for low, _ in row_groups], [high for _, high in row_groups]
+    )
+
+
+def _write_sidecar(path: Path, source: dict, index: HouseholdIndex | None) -> None:
+    if index is None:
+        return
+    content = {
+        "source": source,
+        "row_groups": [
+            [int(low), int(high)] for low, high in zip(index.minimums, index.maximums)
+        ],
+    }
+    index_path = _get_index_path(path)
+    temp_path = index_path.with_name(f"{index_path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(temp_path, mode="w", encoding="utf-8") as file:
+            json.dump(content, file)
+        os.replace(temp_path, index_path)
+    except OSError:
+        # The index is only an optimization, e.g. on read-only directories
+        pass
+    finally:
+        temp_path.unlink(missing_ok=True)
+
+
+def filter_ids(
+    filters: Iterable[tuple[str, str, Any]], column: str = ID_COLUMN
+) -> np.ndarray | None:
+    """Household IDs selected by parquet filters, if any.
+
+    Parameters
+    ----------
+    filters : iterable of tuple
+        Filters in `(column, op, value)` form, combined with AND
+    column : str, optional
+        Household ID column
+
+    Returns
+    -------
+    ndarray or None
+        Sorted IDs that the filters allow, None if they do not restrict
+        the ID column to a list of integers
+
+    Examples
+    --------
+    >>> filter_ids([("Year", "==", 1400), ("ID", "in", (5, 3))]).tolist()
+    [3, 5]
+    """
+    ids = None
+    for filter_column, operator, value in filters:
+        if filter_column != column:
+            continue
+        if operator == "==":
+            values = [value]
+        elif operator == "in":
+            values = list(value)
+        else:
+            continue
+        if not all(isinstance(value, (int, np.integer)) for value in values):
+            continue
+        values = np.unique(np.asarray(values, dtype="int64"))
+        ids = values if ids is None else np.intersect1d(ids, values)
+    return ids
+
+
+def read_households(
+    path: Path,
+    ids: Iterable[int],
+    columns: list[str] | None = None,
+    column: str = ID_COLUMN,
+    types_mapper: Callable[[pa.DataType], Any] | None = None,
+) -> pd.DataFrame | None:
+    """Read the rows of some households from a parquet file.
+
+    Only the row groups that the household index finds are read.
+
+    Parameters
+    ----------
+    path : Path
+        Path of the parquet file
+    ids : iterable of int
+        Household IDs
+    columns : list of str, optional
+        Columns to read, all columns if not specified
+    column : str, optional
+        Household ID column
+    types_mapper : callable, optional
+        Passed to `pyarrow.Table.to_pandas`, e.g. to keep the columns
+        backed by Arrow
+
+    Returns
+    -------
+    DataFrame or None
+        Rows of the households, in file order, or None if the file has
+        no integer ID column
+
+    """
+    index = HouseholdIndex.load(path, column)
+    if index is None:
+        return None
+    ids = np.asarray(list(ids), dtype="int64")
+    parquet_file = pq.ParquetFile(path)
+    read_columns = None
+    if columns is not None:
+        read_columns = list(columns) if column in columns else [*columns, column]
+    table = parquet_file.read_row_groups(
+        index.find_row_groups(ids), columns=read_columns
+    )
+    mask = pc.is_in(pc.cast(table[column], pa.int64()), value_set=pa.array(ids))
+    table = table.filter(mask)
+    if (columns is not None) and (column not in columns):
+        table = table.drop_columns(column)
+    return table.to_pandas(types_mapper=types_mapper)
@@ -0,0 +1,369 @@
+"""
+File writing utilities.
+
+Classes
+-------
+FileLock - Advisory lock on a file, held across threads and processes.
+
+Functions
+---------
+write_parquet - Write a table to a parquet file atomically.
+
+write_parquet_behind - Write a table to a parquet file on a background thread.
+
+get_pending_table - Table waiting to be written to a path, if any.
+
+flush - Wait until all background writes are finished.
+
+get_version_dir - Directory of one version of a cached object.
+
+remove_stale_versions - Remove all but the last used version of cached objects.
+
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import pandas as pd
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+LOCK_SUFFIX = ".lock"
+TEMP_SUFFIX = ".tmp"
+
+_VERSION_DIR_PATTERN = re.compile(r"([0-9a-f]{16})-[0-9a-f]{16}")
+
+_thread_locks: dict[str, threading.Lock] = {}
+_thread_locks_lock = threading.Lock()
+
+
+class FileLock:
+    """Advisory lock on a file, held across threads and processes.
+
+    The lock is taken on a hidden `.<name>.lock` file next to the locked
+    file, with `fcntl.flock` on POSIX systems and `msvcrt.locking` on
+    Windows. Writers that take the lock before writing a file never
+    interleave, and a process that finds a file missing can take the
+    lock, check again and build the file only if no other process did
+    so in the meantime.
+
+    The lock may be released from another thread than the one that
+    acquired it, which lets background writers release it once the
+    file is written.
+
+    Parameters
+    ----------
+    path : Path
+        Path of the file to lock
+
+    """
+
+    def __init__(self, path: Path) -> None:
+        path = Path(path)
+        self.lock_path = path.with_name(f".{path.name}{LOCK_SUFFIX}")
+        with _thread_locks_lock:
+            key = str(self.lock_path.resolve())
+            self._thread_lock = _thread_locks.setdefault(key, threading.Lock())
+        self._file = None
+
+    def acquire(self) -> None:
+        """Wait until the lock is free and take it."""
+        self._thread_lock.acquire()
+        try:
+            self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.lock_path, mode="a+b")
+            _lock_file(self._file)
+        except BaseException:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._thread_lock.release()
+            raise
+
+    def release(self) -> None:
+        """Release the lock."""
+        if self._file is None:
+            return
+        try:
+            _unlock_file(self._file)
+        finally:
+            self._file.close()
+            self._file = None
+            self._thread_lock.release()
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.release()
+
+
+def _lock_file(file) -> None:
+    if os.name == "nt":
+        file.seek(0)
+        while True:
+            try:
+                msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                # LK_LOCK gives up after ten seconds
+                time.sleep(0.1)
+    else:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+
+
+def _unlock_file(file) -> None:
+    if os.name == "nt":
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+def write_parquet(table: pd.DataFrame, path: Path, **kwargs) -> None:
+    """Write a table to a parquet file atomically.
+
+    The table is written to a temporary file next to the target, which
+    then replaces the target in one step. Readers see either the old
+    file or the complete new one, never a partly written file.
+
+    Parameters
+    ----------
+    table : DataFrame
+        Table to write
+    path : Path
+        Path of the parquet file
+    **kwargs
+        Passed to `DataFrame.to_parquet`
+
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}{TEMP_SUFFIX}")
+    try:
+        table.to_parquet(temp_path, **kwargs)
+        os.replace(temp_path, path)
+    finally:
+        temp_path.unlink(missing_ok=True)
+
+
+class _BackgroundWriter:
+    """Writes parquet files one after another on a daemon thread."""
+
+    def __init__(self) -> None:
+        self._queue: queue.Queue = queue.Queue()
+        self._pending: dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._errors: list[Exception] = []
+        self._thread = threading.Thread(
+            target=self._run, name="bssir-writer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(
+        self, table: pd.DataFrame, path: Path, lock: FileLock | None, kwargs: dict
+    ) -> None:
+        item = (table, Path(path), lock, kwargs)
+        with self._lock:
+            self._pending[str(path)] = item
+        self._queue.put(item)
+
+    def get_pending(self, path: Path) -> pd.DataFrame | None:
+        with self._lock:
+            item = self._pending.get(str(path))
+        return None if item is None else item[0]
+
+    def flush(self) -> None:
+        self._queue.join()
+        with self._lock:
+            errors, self._errors = self._errors, []
+        if errors:
+            raise errors[0]
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            table, path, lock, kwargs = item
+            try:
+                write_parquet(table, path, **kwargs)
+            except Exception as error:  # pylint: disable=broad-except
+                logging.exception("Writing %s failed", path)
+                with self._lock:
+                    self._errors.append(error)
+            finally:
+                if lock is not None:
+                    lock.release()
+                with self._lock:
+                    if self._pending.get(str(path)) is item:
+                        del self._pending[str(path)]
+                self._queue.task_done()
+
+
+_writer: _BackgroundWriter | None = None
+_writer_pid: int | None = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer() -> _BackgroundWriter:
+    global _writer, _writer_pid  # pylint: disable=global-statement
+    with _writer_lock:
+        # A forked process does not inherit the writer thread
+        if (_writer is None) or (_writer_pid != os.getpid()):
+            _writer = _BackgroundWriter()
+            _writer_pid = os.getpid()
+        return _writer
+
+
+def write_parquet_behind(
+    table: pd.DataFrame, path: Path, lock: FileLock | None = None, **kwargs
+) -> None:
+    """Write a table to a parquet file on a background thread.
+
+    Returns immediately. Files are written atomically, one after another,
+    in the order they are submitted. Until a file is written, the table
+    is available from `get_pending_table`. Call `flush` to wait for the
+    writes to finish; pending writes are also flushed when the
+    interpreter exits.
+
+    Worker processes write synchronously, since they can exit without
+    running exit hooks.
+
+    A held lock on the file can be handed over, and is released once
+    the file is written, so other processes wait for the write.
+
+    Parameters
+    ----------
+    table : DataFrame
+        Table to write. It should not be modified afterwards.
+    path : Path
+        Path of the parquet file
+    lock : FileLock, optional
+        Acquired lock to release after writing
+    **kwargs
+        Passed to `DataFrame.to_parquet`
+
+    """
+    if multiprocessing.parent_process() is not None:
+        try:
+            write_parquet(table, path, **kwargs)
+        finally:
+            if lock is not None:
+                lock.release()
+        return
+    _get_writer().submit(table, path, lock, kwargs)
+
+
+def get_pending_table(path: Path) -> pd.DataFrame | None:
+    """Find a table waiting to be written to a path.
+
+    Parameters
+    ----------
+    path : Path
+        Path of the parquet file
+
+    Returns
+    -------
+    table : DataFrame or None
+        Table submitted for the path, None if no write is pending
+
+    """
+    if (_writer is None) or (_writer_pid != os.getpid()):
+        return None
+    return _writer.get_pending(path)
+
+
+def flush() -> None:
+    """Wait until all background writes are finished.
+
+    Raises
+    ------
+    Exception
+        The first error raised by a write since the last flush
+
+    """
+    if (_writer is None) or (_writer_pid != os.getpid()):
+        return
+    _writer.flush()
+
+
+def get_version_dir(folder: Path, slot_key: str, version_key: str) -> Path:
+    """Find the directory of one version of a cached object.
+
+    Objects cached outside the catalog, such as remote file blocks, are
+    stored in `<slot>-<version>` directories, where the slot identifies
+    the object and the version its inputs. The modification time of the
+    directory records its last use, so `remove_stale_versions` can keep
+    only the current version of each object.
+
+    Parameters
+    ----------
+    folder : Path
+        Folder of the cached objects of one kind
+    slot_key : str
+        Hexadecimal key of the object
+    version_key : str
+        Hexadecimal key of the version
+
+    Returns
+    -------
+    path : Path
+        Directory of the version, marked as used if it exists
+
+    """
+    path = Path(folder).joinpath(f"{slot_key[:16]}-{version_key[:16]}")
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return path
+
+
+def remove_stale_versions(folder: Path) -> list[Path]:
+    """Remove all but the last used version of cached objects.
+
+    Parameters
+    ----------
+    folder : Path
+        Folder of version directories created by `get_version_dir`
+
+    Returns
+    -------
+    removed : list of Path
+        Removed directories
+
+    """
+    slots: dict[str, list[tuple[float, Path]]] = {}
+    for path in Path(folder).iterdir():
+        match = _VERSION_DIR_PATTERN.fullmatch(path.name)
+        if (match is None) or not path.is_dir():
+            continue
+        slots.setdefault(match.group(1), []).append((path.stat().st_mtime, path))
+    removed = []
+    for versions in slots.values():
+        for _, path in sorted(versions)[:-1]:
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(path)
+    return removed
+
+
+def _flush_at_exit() -> None:
+    try:
+        flush()
+    except Exception:  # pylint: disable=broad-except
+        # Failed writes were already logged
+        pass
+
+
+atexit.register(_flush_at_exit)
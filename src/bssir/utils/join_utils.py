@@ -0,0 +1,199 @@
+"""
+Fast joins on household keys.
+
+Most joins in the package attach household-level data, such as weights
+or attributes, to a table on its year and household ID. Both keys are
+non-negative integers, so they are packed into one int64 key,
+`Year * 2**40 + ID`, and the join becomes a binary search of the keys
+of the left table in the sorted keys of the right table. Cleaned tables
+are written sorted by year and ID, so for them the sort is skipped.
+
+Joins that do not fit, because a key is missing, not an integer or out
+of range, or because the right table has duplicate keys, fall back to
+`DataFrame.join`.
+
+Functions
+---------
+pack_keys - Pack year and ID columns into one int64 key.
+sort_by_household - Sort a table by year and household ID.
+join_on_keys - Join the columns of a table with unique keys to another table.
+
+"""
+from typing import Iterable, Literal, Sequence
+
+import numpy as np
+import pandas as pd
+
+ID_BITS = 40
+
+_Join = Literal["left", "inner"]
+
+
+def pack_keys(columns: Sequence[pd.Series | pd.Index]) -> np.ndarray | None:
+    """Pack year and ID columns into one int64 key.
+
+    Parameters
+    ----------
+    columns : sequence of Series or Index
+        An ID column, or a year column and an ID column
+
+    Returns
+    -------
+    ndarray or None
+        `Year * 2**40 + ID`, or the ID alone, None if the columns are
+        not integers in range or have missing values
+
+    Examples
+    --------
+    >>> pack_keys([pd.Series([1400, 1401]), pd.Series([5, 6])]).tolist()
+    [1539316278886405, 1540415790514182]
+    """
+    if len(columns) not in (1, 2):
+        return None
+    arrays = []
+    for column in columns:
+        if not pd.api.types.is_integer_dtype(column.dtype) or column.hasnans:
+            return None
+        arrays.append(column.to_numpy(dtype="int64"))
+    *years, ids = arrays
+    if len(ids) == 0:
+        return ids
+    if (ids.min() < 0) or (ids.max() >= 2**ID_BITS):
+        return None
+    if not years:
+        return ids
+    year = years[0]
+    if (year.min() < 0) or (year.max() >= 2 ** (63 - ID_BITS)):
+        return None
+    return (year << ID_BITS) | ids
+
+
+def sort_by_household(
+    table: pd.DataFrame, columns: Iterable[str] = ("Year", "ID")
+) -> pd.DataFrame:
+    """Sort a table by year and household ID.
+
+    Rows of the same household keep their order. Tables without the
+    columns are returned as they are.
+
+    Parameters
+    ----------
+    table : DataFrame
+        Table to sort
+    columns : iterable of str, optional
+        Year and ID columns, in sort order
+
+    Returns
+    -------
+    DataFrame
+        Sorted table, with a new range index if it was sorted
+
+    """
+    columns = [column for column in columns if column in table.columns]
+    if not columns:
+        return table
+    keys = pack_keys([table[column] for column in columns])
+    if keys is None:
+        order = np.lexsort([table[column].to_numpy() for column in columns[::-1]])
+    elif (len(keys) < 2) or (np.diff(keys) >= 0).all():
+        return table
+    else:
+        order = np.argsort(keys, kind="stable")
+    return table.take(order).reset_index(drop=True)
+
+
+def join_on_keys(
+    left: pd.DataFrame,
+    right: pd.DataFrame,
+    on: Sequence[str] = ("Year", "ID"),
+    how: _Join = "left",
+) -> pd.DataFrame:
+    """Join the columns of a table with unique keys to another table.
+
+    Same as `left.join(right.set_index(on), on=on, how=how)`: rows of
+    `left` keep their order and index, and get the values of the row of
+    `right` with the same keys, or missing values if there is none.
+
+    Parameters
+    ----------
+    left : DataFrame
+        Table to add columns to. The keys can be columns or index levels.
+    right : DataFrame
+        Table with the columns to add. The keys can be columns or index
+        levels.
+    on : sequence of str, optional
+        Key columns, either an ID column or year and ID columns
+    how : {"left", "inner"}, optional
+        Keep rows of `left` without a match, or drop them
+
+    Returns
+    -------
+    DataFrame
+        Joined table
+
+    """
+    on = list(on)
+    right_keys = [_get_keys(right, column) for column in on]
+    value_columns = [column for column in right.columns if column not in on]
+    if set(value_columns) & set(left.columns):
+        raise ValueError(f"Columns overlap: {set(value_columns) & set(left.columns)}")
+    left_packed = pack_keys([_get_keys(left, column) for column in on])
+    right_packed = pack_keys(right_keys)
+    positions = None
+    if (left_packed is not None) and (right_packed is not None):
+        positions = _find_positions(left_packed, right_packed)
+    if positions is None:
+        right = right.reset_index(drop=True).assign(
+            **{column: keys.array for column, keys in zip(on, right_keys)}
+        )
+        return left.join(right.set_index(on), on=on, how=how)
+
+    matched = positions >= 0
+    if how == "inner" and not matched.all():
+        left = left.iloc[np.flatnonzero(matched)]
+        positions = positions[matched]
+        matched = matched[matched]
+    allow_fill = not matched.all()
+    values = {
+        column: _take(right[column], positions, allow_fill)
+        for column in value_columns
+    }
+    right_part = pd.DataFrame(values, index=left.index, columns=value_columns)
+    return pd.concat([left, right_part], axis="columns")
+
+
+def _get_keys(table: pd.DataFrame, column: str) -> pd.Series | pd.Index:
+    if column in table.columns:
+        return table[column]
+    return table.index.get_level_values(column)
+
+
+def _take(column: pd.Series, positions: np.ndarray, allow_fill: bool):
+    # Filling numpy arrays upcasts them, like DataFrame.join does
+    if isinstance(column.dtype, np.dtype):
+        return pd.api.extensions.take(
+            column.to_numpy(), positions, allow_fill=allow_fill
+        )
+    return column.array.take(positions, allow_fill=allow_fill)
+
+
+def _find_positions(left_keys: np.ndarray, right_keys: np.ndarray) -> np.ndarray | None:
+    # Row of the right table matching each left key, -1 if there is none,
+    # or None if right keys are not unique
+    if len(right_keys) == 0:
+        return np.full(len(left_keys), -1, dtype="int64")
+    if (np.diff(right_keys) > 0).all():
+        order = None
+        sorted_keys = right_keys
+    else:
+        order = np.argsort(right_keys, kind="stable")
+        sorted_keys = right_keys[order]
+        if not (np.diff(sorted_keys) > 0).all():
+            return None
+    positions = np.searchsorted(sorted_keys, left_keys)
+    positions[positions == len(sorted_keys)] = 0
+    matched = sorted_keys[positions] == left_keys
+    if order is not None:
+        positions = order[positions]
+    positions[~matched] = -1
+    return positions
@@ -0,0 +1,186 @@
+"""
+Layouts of the cleaned data directory.
+
+Cleaned tables are stored in one of two layouts:
+
+- "flat", one file per table and year, `<year>_<table>.parquet`,
+- "partitioned", a Hive-partitioned dataset per table,
+  `<table>/Year=<year>/part-0.parquet`, which is read with one
+  dataset scan for any number of years.
+
+Mirrors keep the flat names in both layouts, so that downloads work
+the same whatever layout the maintainer uses locally.
+
+Functions
+---------
+get_cleaned_path - Local path of a cleaned table for a year.
+
+get_mirror_file_name - File name of a cleaned table on the mirrors.
+
+list_cleaned_files - Cleaned files in a directory, in either layout.
+
+migrate_cleaned_files - Move cleaned files to another layout.
+
+"""
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Literal
+
+from ..metadata_reader import Defaults
+from .cache_utils import file_fingerprint
+from .index_utils import INDEX_SUFFIX
+from .io_utils import FileLock
+
+_Layout = Literal["flat", "partitioned"]
+
+PARTITION_COLUMN = "Year"
+PART_FILE_NAME = "part-0.parquet"
+
+_FLAT_PATTERN = re.compile(r"^(\d+)_(.+)\.parquet$")
+_PARTITION_PATTERN = re.compile(rf"^{PARTITION_COLUMN}=(\d+)$")
+
+
+def get_cleaned_path(
+    table_name: str,
+    year: int,
+    lib_defaults: Defaults,
+    layout: _Layout | None = None,
+) -> Path:
+    """Local path of a cleaned table for a year.
+
+    Parameters
+    ----------
+    table_name : str
+        Name of the table
+    year : int
+        Year of the table
+    lib_defaults : Defaults
+        Package defaults, with the cleaned directory and layout
+    layout : {"flat", "partitioned"}, optional
+        Layout to use instead of the configured one
+
+    Returns
+    -------
+    Path
+        Path of the parquet file
+
+    """
+    layout = lib_defaults.cleaned_layout if layout is None else layout
+    return lib_defaults.dir.cleaned.joinpath(_relative_path(table_name, year, layout))
+
+
+def get_mirror_file_name(table_name: str, year: int) -> str:
+    """File name of a cleaned table on the mirrors.
+
+    Examples
+    --------
+    >>> get_mirror_file_name("Food", 1400)
+    '1400_Food.parquet'
+    """
+    return _relative_path(table_name, year, "flat")
+
+
+def _relative_path(table_name: str, year: int, layout: _Layout) -> str:
+    if layout == "flat":
+        return f"{year}_{table_name}.parquet"
+    if layout == "partitioned":
+        return f"{table_name}/{PARTITION_COLUMN}={year}/{PART_FILE_NAME}"
+    raise ValueError(f"Layout {layout} is not valid")
+
+
+def list_cleaned_files(cleaned_dir: Path) -> list[tuple[str, int, Path]]:
+    """Cleaned files in a directory, in either layout.
+
+    Lock, index and temporary files kept next to the tables are left
+    out.
+
+    Parameters
+    ----------
+    cleaned_dir : Path
+        Cleaned data directory
+
+    Returns
+    -------
+    list of tuple
+        Table name, year and path of every cleaned file
+
+    """
+    cleaned_dir = Path(cleaned_dir)
+    if not cleaned_dir.exists():
+        return []
+    files = []
+    for path in sorted(cleaned_dir.iterdir()):
+        if path.name.startswith("."):
+            continue
+        match = _FLAT_PATTERN.match(path.name)
+        if path.is_file() and (match is not None):
+            files.append((match.group(2), int(match.group(1)), path))
+        elif path.is_dir():
+            for partition in sorted(path.iterdir()):
+                match = _PARTITION_PATTERN.match(partition.name)
+                file_path = partition.joinpath(PART_FILE_NAME)
+                if (match is not None) and file_path.is_file():
+                    files.append((path.name, int(match.group(1)), file_path))
+    return files
+
+
+def migrate_cleaned_files(
+    lib_defaults: Defaults, layout: _Layout | None = None
+) -> list[Path]:
+    """Move cleaned files to another layout.
+
+    Files stored in the other layout are moved, without being read or
+    rewritten, to their path in the target layout. When a file already
+    exists in the target layout, the old one is removed if both have
+    the same content; otherwise both are kept and the conflict is
+    logged as a warning.
+
+    Parameters
+    ----------
+    lib_defaults : Defaults
+        Package defaults, with the cleaned directory and layout
+    layout : {"flat", "partitioned"}, optional
+        Target layout, the configured one if not specified
+
+    Returns
+    -------
+    list of Path
+        New paths of the moved files
+
+    """
+    layout = lib_defaults.cleaned_layout if layout is None else layout
+    moved = []
+    for table_name, year, path in list_cleaned_files(lib_defaults.dir.cleaned):
+        target = get_cleaned_path(table_name, year, lib_defaults, layout)
+        if path == target:
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with FileLock(path), FileLock(target):
+            if not target.exists():
+                os.replace(path, target)
+                moved.append(target)
+            elif file_fingerprint(path) == file_fingerprint(target):
+                path.unlink()
+            else:
+                logging.warning(
+                    "Kept %s, since %s already exists with other content",
+                    path,
+                    target,
+                )
+                continue
+        # The household index of the old path is rebuilt for the new one
+        path.with_name(f".{path.name}{INDEX_SUFFIX}").unlink(missing_ok=True)
+        _remove_empty_directories(path.parent, lib_defaults.dir.cleaned)
+    return moved
+
+
+def _remove_empty_directories(directory: Path, cleaned_dir: Path) -> None:
+    # Directories with lock files are kept, other processes may use them
+    while directory != cleaned_dir:
+        try:
+            directory.rmdir()
+        except OSError:
+            return
+        directory = directory.parent
@@ -0,0 +1,390 @@
+"""
+Compilation of schema instructions into pipeline plans.
+
+The `instructions` of a schema table are validated and turned into a
+list of steps once, and the result is shared by every pipeline that
+runs the same instructions, for every year of a load.
+
+While compiling, runs of steps that can be applied together are fused:
+consecutive `create_column` steps become one `create_columns` step that
+adds all columns in a single assignment, and consecutive `apply_filter`
+conditions become one `apply_filters` step that selects rows with a
+single combined mask. A condition joins the mask of the conditions
+before it only if each row is tested on its own values, so conditions
+such as `Cost > Cost.mean()` still see only the rows left by earlier
+filters.
+
+The code of `apply_pandas_function` and `apply_function` steps is also
+compiled once into Python callables. Pandas functions are parsed
+rather than evaluated, and may only chain public attributes, calls
+with literal arguments and subscripts with literal keys.
+
+Classes
+-------
+PipelineStep - A validated step of a compiled pipeline.
+
+Functions
+---------
+compile_steps - Validate and fuse the instructions of a schema table.
+compile_pandas_function - Compile the code of an `apply_pandas_function` step.
+load_function - Import the function of an `apply_function` step.
+
+"""
+import ast
+import functools
+import importlib
+import threading
+from typing import Any, Callable
+
+import pandas as pd
+
+STEPS_WITHOUT_INPUT = frozenset({"add_year", "filter_year", "add_table_name"})
+STEPS_WITH_INPUT = frozenset(
+    {
+        "add_classification",
+        "add_attribute",
+        "apply_order",
+        "rename",
+        "create_column",
+        "apply_filter",
+        "apply_pandas_function",
+        "apply_function",
+        "join",
+        "dropna",
+        "fillna",
+    }
+)
+
+_CONDITION_VALUE_TYPES = (bool, str, list)
+
+# Methods that test each value on its own
+_ROW_WISE_METHODS = frozenset({"isin", "between", "isna", "notna", "isnull", "notnull"})
+_ROW_WISE_NODES = (
+    ast.Expression,
+    ast.Compare,
+    ast.BoolOp,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.Name,
+    ast.Constant,
+    ast.List,
+    ast.Tuple,
+    ast.Load,
+    ast.operator,
+    ast.cmpop,
+    ast.boolop,
+    ast.unaryop,
+)
+
+_compiled: dict[str, list["PipelineStep"]] = {}
+_compiled_lock = threading.Lock()
+
+
+class PipelineStep:
+    """A validated step of a compiled pipeline.
+
+    Parameters
+    ----------
+    name : str
+        Name of the step. Besides the names used in schemas, fused steps
+        are named `create_columns` and `apply_filters`.
+    method_input : Any
+        Input of the step. For fused steps, the list of inputs of the
+        original steps.
+    index : int
+        Position of the (first) original step in the instructions
+
+    """
+
+    __slots__ = ("name", "method_input", "index")
+
+    def __init__(self, name: str, method_input: Any, index: int) -> None:
+        self.name = name
+        self.method_input = method_input
+        self.index = index
+
+    def __repr__(self) -> str:
+        return f"PipelineStep({self.name!r}, {self.method_input!r}, {self.index})"
+
+
+def compile_steps(steps: list) -> list[PipelineStep]:
+    """Validate and fuse the instructions of a schema table.
+
+    Results are cached by the content of the instructions, so each
+    version of a schema table is compiled only once.
+
+    Parameters
+    ----------
+    steps : list
+        Instructions as written in the schema
+
+    Returns
+    -------
+    list of PipelineStep
+        Steps to run, in order
+
+    Raises
+    ------
+    ValueError
+        If a step is not valid
+
+    Examples
+    --------
+    >>> steps = compile_steps(
+    ...     ["add_year", {"apply_filter": "Code > 1"}, {"apply_filter": "Code < 4"}]
+    ... )
+    >>> [(step.name, step.method_input) for step in steps]
+    [('add_year', None), ('apply_filters', ['Code > 1', 'Code < 4'])]
+    """
+    # The order of keys matters, e.g. for the categories of a column
+    key = repr(steps)
+    with _compiled_lock:
+        if key in _compiled:
+            return _compiled[key]
+    compiled = _fuse_steps(_validate_steps(steps))
+    with _compiled_lock:
+        _compiled.setdefault(key, compiled)
+    return compiled
+
+
+def _validate_steps(steps: list) -> list[PipelineStep]:
+    validated = []
+    for index, step in enumerate(steps):
+        if step is None:
+            continue
+        if isinstance(step, str):
+            name, method_input = step, None
+        elif isinstance(step, dict) and len(step) == 1:
+            name, method_input = list(step.items())[0]
+        else:
+            raise ValueError(f"Step {index} is not valid: {step!r}")
+        if name in STEPS_WITHOUT_INPUT:
+            if method_input is not None:
+                raise ValueError(f"Step {index} ({name}) does not take an input")
+        elif name in STEPS_WITH_INPUT:
+            if method_input is None:
+                # Steps without input do nothing
+                continue
+            _validate_input(name, method_input, index)
+        else:
+            raise ValueError(f"Step {index} ({name}) is not a valid step")
+        validated.append(PipelineStep(name, method_input, index))
+    return validated
+
+
+def _validate_input(name: str, method_input: Any, index: int) -> None:
+    valid = True
+    if name == "create_column":
+        valid = _is_valid_create_column(method_input)
+    elif name == "apply_filter":
+        valid = isinstance(method_input, str) or (
+            isinstance(method_input, list)
+            and all(isinstance(condition, str) for condition in method_input)
+        )
+    elif name == "rename":
+        valid = isinstance(method_input, dict)
+    elif name == "apply_order":
+        valid = isinstance(method_input, list)
+    elif name == "join":
+        valid = isinstance(method_input, str) or (
+            isinstance(method_input, dict)
+            and {"table_name", "columns"} <= method_input.keys()
+        )
+    elif name == "apply_pandas_function":
+        valid = isinstance(method_input, str)
+        if valid:
+            compile_pandas_function(method_input)
+    elif name == "apply_function":
+        valid = isinstance(method_input, str) and ("." in method_input)
+    if not valid:
+        raise ValueError(
+            f"Input of step {index} ({name}) is not valid: {method_input!r}"
+        )
+
+
+def _is_valid_create_column(method_input: Any) -> bool:
+    if not isinstance(method_input, dict) or "name" not in method_input:
+        return False
+    if method_input.get("type") == "numerical":
+        return isinstance(method_input.get("expression"), (int, float, str))
+    if method_input.get("type") == "categorical":
+        categories = method_input.get("categories")
+        if not isinstance(categories, dict):
+            return False
+        for condition in categories.values():
+            if isinstance(condition, dict):
+                if not all(
+                    isinstance(value, _CONDITION_VALUE_TYPES)
+                    for value in condition.values()
+                ):
+                    return False
+            elif not (condition is None or isinstance(condition, (str, list))):
+                return False
+        return True
+    return False
+
+
+def _fuse_steps(steps: list[PipelineStep]) -> list[PipelineStep]:
+    fused: list[PipelineStep] = []
+    for step in steps:
+        previous = fused[-1] if fused else None
+        if step.name == "create_column":
+            if (previous is not None) and (previous.name == "create_columns"):
+                previous.method_input.append(step.method_input)
+            else:
+                fused.append(
+                    PipelineStep("create_columns", [step.method_input], step.index)
+                )
+        elif step.name == "apply_filter":
+            conditions = (
+                [step.method_input]
+                if isinstance(step.method_input, str)
+                else list(step.method_input)
+            )
+            for condition in conditions:
+                previous = fused[-1] if fused else None
+                if (
+                    (previous is not None)
+                    and (previous.name == "apply_filters")
+                    and _is_row_wise(condition)
+                ):
+                    previous.method_input.append(condition)
+                else:
+                    fused.append(PipelineStep("apply_filters", [condition], step.index))
+        else:
+            fused.append(step)
+    return fused
+
+
+@functools.lru_cache(maxsize=1024)
+def _is_row_wise(condition: str) -> bool:
+    # Conditions that are not understood are taken to use other rows,
+    # e.g. aggregates such as `Cost > Cost.mean()`
+    try:
+        tree = ast.parse(condition.strip(), mode="eval")
+    except SyntaxError:
+        return False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            function = node.func
+            if not (
+                isinstance(function, ast.Attribute)
+                and isinstance(function.value, ast.Name)
+                and function.attr in _ROW_WISE_METHODS
+                and not node.keywords
+            ):
+                return False
+        elif not isinstance(node, _ROW_WISE_NODES + (ast.Attribute,)):
+            return False
+        elif isinstance(node, ast.Attribute) and node.attr not in _ROW_WISE_METHODS:
+            return False
+    return True
+
+
+@functools.lru_cache(maxsize=None)
+def compile_pandas_function(method_input: str) -> Callable[[pd.DataFrame], Any]:
+    """Compile the code of an `apply_pandas_function` step.
+
+    The code is appended to the table, as in `table.sort_values("ID")`,
+    and may chain public attributes, calls whose arguments are literals
+    and subscripts whose keys are literals or slices. It is parsed
+    once, and nothing in it is evaluated as Python code.
+
+    Parameters
+    ----------
+    method_input : str
+        Code of the step, such as `.sort_values("ID")`
+
+    Returns
+    -------
+    callable
+        Function applying the code to a table
+
+    Raises
+    ------
+    ValueError
+        If the code uses anything else
+
+    Examples
+    --------
+    >>> function = compile_pandas_function(".iloc[:2].sum(axis=1)")
+    >>> function(pd.DataFrame({"A": [1, 2, 3], "B": [1, 1, 1]})).tolist()
+    [2, 3]
+    """
+    source = "table" + method_input.replace("\n", "")
+    try:
+        tree = ast.parse(source.strip(), mode="eval")
+    except SyntaxError as error:
+        raise ValueError(f"Pandas function {method_input!r} is not valid") from error
+    operations = _compile_chain(tree.body, method_input)
+
+    def apply_chain(table: pd.DataFrame) -> Any:
+        result: Any = table
+        for operation in operations:
+            result = operation(result)
+        return result
+
+    return apply_chain
+
+
+def _compile_chain(node: ast.expr, method_input: str) -> list[Callable]:
+    if isinstance(node, ast.Name) and (node.id == "table"):
+        return []
+    if isinstance(node, ast.Attribute) and not node.attr.startswith("_"):
+        attribute = node.attr
+        return _compile_chain(node.value, method_input) + [
+            lambda value: getattr(value, attribute)
+        ]
+    if isinstance(node, ast.Call):
+        args = [_literal(arg, method_input) for arg in node.args]
+        kwargs = {
+            keyword.arg: _literal(keyword.value, method_input)
+            for keyword in node.keywords
+        }
+        if None in kwargs:
+            raise ValueError(f"Pandas function {method_input!r} is not valid")
+        return _compile_chain(node.func, method_input) + [
+            lambda function: function(*args, **kwargs)
+        ]
+    if isinstance(node, ast.Subscript):
+        key = _literal(node.slice, method_input)
+        return _compile_chain(node.value, method_input) + [lambda value: value[key]]
+    raise ValueError(f"Pandas function {method_input!r} is not valid")
+
+
+def _literal(node: ast.expr, method_input: str) -> Any:
+    if isinstance(node, ast.Slice):
+        return slice(
+            *[
+                None if part is None else _literal(part, method_input)
+                for part in (node.lower, node.upper, node.step)
+            ]
+        )
+    if isinstance(node, ast.Tuple):
+        return tuple(_literal(element, method_input) for element in node.elts)
+    try:
+        return ast.literal_eval(node)
+    except ValueError as error:
+        raise ValueError(
+            f"Pandas function {method_input!r} has a non-literal argument"
+        ) from error
+
+
+@functools.lru_cache(maxsize=None)
+def load_function(method_input: str) -> Callable[[pd.DataFrame], pd.DataFrame]:
+    """Import the function of an `apply_function` step.
+
+    Parameters
+    ----------
+    method_input : str
+        Full name of the function, such as `package.module.function`
+
+    Returns
+    -------
+    callable
+        The function
+
+    """
+    module_name, function_name = method_input.rsplit(".", 1)
+    module = importlib.import_module(module_name)
+    return getattr(module, function_name)
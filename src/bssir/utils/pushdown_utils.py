@@ -0,0 +1,573 @@
+"""
+Pushdown analysis for schema instructions.
+
+Provides helpers that walk the `instructions` of a schema table to find
+out which parts of the upstream data are actually needed to produce a
+requested result, so that readers can skip the rest.
+
+Functions
+---------
+extract_identifiers - Names referenced by a query or eval expression.
+required_columns - Columns needed before a list of instructions.
+output_columns - Columns available after a list of instructions.
+parse_filter - Translate a query expression into parquet filters.
+pushdown_filters - Parquet filters that can be applied before instructions.
+parse_expression - Parse a query or eval expression into a syntax tree.
+replace_bitwise_operators - Replace `&` and `|` by `and` and `or`.
+
+"""
+import ast
+import io
+import re
+import tokenize
+from typing import Any, Iterable
+
+
+_IDENTIFIER_PATTERN = re.compile(r"`([^`]+)`|([A-Za-z_][A-Za-z0-9_]*)")
+_BACKTICK_PATTERN = re.compile(r"`([^`]+)`")
+
+_Filter = tuple[str, str, Any]
+
+# Only operators that reject missing values, like DataFrame.query does, are
+# translated. `!=` and `not in` keep missing values in pandas but not in
+# parquet filters, so pushing them down would drop rows.
+_COMPARISON_OPERATORS = {
+    ast.Eq: "==",
+    ast.Lt: "<",
+    ast.LtE: "<=",
+    ast.Gt: ">",
+    ast.GtE: ">=",
+    ast.In: "in",
+}
+_FLIPPED_OPERATORS = {"==": "==", "<": ">", "<=": ">=", ">": "<", ">=": "<="}
+
+
+def extract_identifiers(expression: str) -> set[str]:
+    """Extract names referenced by a query or eval expression.
+
+    Both plain identifiers and backtick-quoted column names are
+    returned. The result is a superset of the referenced columns:
+    keywords and function names are included as well, which is
+    harmless when it is intersected with the columns of a table.
+
+    Parameters
+    ----------
+    expression : str
+        Expression as written in a `create_column` or `apply_filter` step.
+
+    Returns
+    -------
+    set of str
+        Referenced names.
+
+    Examples
+    --------
+    >>> sorted(extract_identifiers("`Food Share` * Gross_Expenditure / 12"))
+    ['Food Share', 'Gross_Expenditure']
+    """
+    identifiers = set()
+    for quoted, plain in _IDENTIFIER_PATTERN.findall(expression):
+        identifiers.add(quoted if quoted else plain)
+    return identifiers
+
+
+def union_columns(*column_sets: Iterable[str] | None) -> set[str] | None:
+    """Union several column sets, where None stands for all columns."""
+    result: set[str] = set()
+    for columns in column_sets:
+        if columns is None:
+            return None
+        result.update(columns)
+    return result
+
+
+def required_columns(
+    steps: list | None,
+    columns: Iterable[str] | None,
+) -> set[str] | None:
+    """Find the columns needed before a list of instructions.
+
+    Walks the instructions backwards, starting from the set of columns
+    needed after the last step, and works out which columns must be
+    available before the first one. Steps that can use arbitrary
+    columns (`apply_function` and `apply_pandas_function`) or are not
+    recognized make the whole table necessary.
+
+    Parameters
+    ----------
+    steps : list, optional
+        Schema `instructions` in the order they are applied.
+    columns : iterable of str, optional
+        Columns needed after the last step. None means all columns.
+
+    Returns
+    -------
+    set of str or None
+        Columns needed before the first step, or None if every column
+        is needed.
+
+    Examples
+    --------
+    >>> steps = [{"rename": {"Cost": "Expenditure"}}, "add_year"]
+    >>> sorted(required_columns(steps, ["Year", "Expenditure"]))
+    ['Cost']
+    """
+    needed = None if columns is None else set(columns)
+    for step in reversed(steps or []):
+        if needed is None:
+            return None
+        if step is None:
+            continue
+        needed = _required_before_step(step, needed)
+    return needed
+
+
+def output_columns(
+    steps: list | None,
+    columns: Iterable[str] | None,
+) -> set[str] | None:
+    """Find the columns available after a list of instructions.
+
+    The forward counterpart of `required_columns`: starting from the
+    columns of the input table, works out the columns of the result.
+    Steps that can add arbitrary columns (`join`, `apply_function`,
+    ...) or are not recognized make the result unknown.
+
+    Parameters
+    ----------
+    steps : list, optional
+        Schema `instructions` in the order they are applied.
+    columns : iterable of str, optional
+        Columns of the input table. None means unknown.
+
+    Returns
+    -------
+    set of str or None
+        Columns after the last step, or None if they are unknown.
+
+    Examples
+    --------
+    >>> steps = [{"rename": {"Cost": "Expenditure"}}, "add_year"]
+    >>> sorted(output_columns(steps, ["ID", "Cost"]))
+    ['Expenditure', 'ID', 'Year']
+    """
+    available = None if columns is None else set(columns)
+    for step in steps or []:
+        if available is None:
+            return None
+        if step is None:
+            continue
+        available = _available_after_step(step, available)
+    return available
+
+
+def _available_after_step(step: str | dict, available: set[str]) -> set[str] | None:
+    # pylint: disable=too-many-return-statements
+    method_name, method_input = _split_step(step)
+
+    if method_name == "add_year":
+        return available | {"Year"}
+    if method_name == "add_table_name":
+        return available | {"Table_Name"}
+    if method_name == "filter_year" or method_input is None:
+        return available
+    if method_name in ("apply_filter", "dropna", "fillna"):
+        return available
+    if method_name == "rename":
+        assert isinstance(method_input, dict)
+        return {method_input.get(column, column) for column in available}
+    if method_name == "apply_order":
+        assert isinstance(method_input, list)
+        return {
+            column if isinstance(column, str) else list(column.keys())[0]
+            for column in method_input
+        }
+    if method_name == "create_column":
+        assert isinstance(method_input, dict)
+        return available | {method_input["name"]}
+    return None
+
+
+def _split_step(step: str | dict) -> tuple[str, object]:
+    if isinstance(step, str):
+        return step, None
+    if isinstance(step, dict):
+        method_name, method_input = list(step.items())[0]
+        return method_name, method_input
+    raise TypeError
+
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+def _required_before_step(step: str | dict, needed: set[str]) -> set[str] | None:
+    # pylint: disable=too-many-return-statements
+    # pylint: disable=too-many-branches
+    method_name, method_input = _split_step(step)
+
+    if method_name == "add_year":
+        return needed - {"Year"}
+    if method_name == "add_table_name":
+        return needed - {"Table_Name"}
+    if method_name == "filter_year":
+        return needed | {"Year"}
+    if method_input is None:
+        return needed
+
+    if method_name == "rename":
+        assert isinstance(method_input, dict)
+        inverse = {new: old for old, new in method_input.items()}
+        return {inverse.get(column, column) for column in needed}
+    if method_name == "apply_order":
+        assert isinstance(method_input, list)
+        order = {
+            column if isinstance(column, str) else list(column.keys())[0]
+            for column in method_input
+        }
+        return needed & order
+    if method_name == "create_column":
+        assert isinstance(method_input, dict)
+        return (needed - {method_input["name"]}) | _create_column_inputs(method_input)
+    if method_name == "apply_filter":
+        identifiers: set[str] = set()
+        for condition in _as_list(method_input):
+            identifiers.update(extract_identifiers(condition))
+        return needed | identifiers
+    if method_name in ("dropna", "fillna"):
+        if isinstance(method_input, dict):
+            return needed | set(method_input.keys())
+        return needed | set(_as_list(method_input))
+    if method_name == "join":
+        if isinstance(method_input, str):
+            return needed | {"Year", "ID"}
+        assert isinstance(method_input, dict)
+        return needed | set(_as_list(method_input["columns"]))
+    if method_name == "add_attribute":
+        assert isinstance(method_input, dict)
+        return needed | {
+            method_input.get("year_col") or "Year",
+            method_input.get("id_col") or "ID",
+        }
+    if method_name == "add_classification":
+        assert isinstance(method_input, dict)
+        return needed | {method_input["target"], method_input.get("year_col") or "Year"}
+    return None
+
+
+def _create_column_inputs(method_input: dict) -> set[str]:
+    column_name = method_input["name"]
+    if method_input["type"] == "numerical":
+        expression = method_input["expression"]
+        if isinstance(expression, str):
+            return extract_identifiers(expression)
+        return set()
+    inputs = set()
+    for condition in method_input["categories"].values():
+        if isinstance(condition, (str, list)):
+            inputs.add(column_name)
+        elif isinstance(condition, dict):
+            inputs.update(condition.keys())
+    return inputs
+
+
+def parse_filter(condition: str) -> list[_Filter]:
+    """Translate a query expression into parquet filters.
+
+    Conjunctions of simple comparisons between a column and a literal,
+    `in` tests and `isin` calls are translated into `(column, op, value)`
+    tuples, as accepted by `pyarrow.parquet.read_table`. Parts of the
+    condition that cannot be translated are left out, so the result
+    keeps every row the condition keeps and the condition must still
+    be applied after reading.
+
+    Parameters
+    ----------
+    condition : str
+        Expression as accepted by `DataFrame.query`.
+
+    Returns
+    -------
+    list of tuple
+        Filters whose conjunction is implied by the condition.
+
+    Examples
+    --------
+    >>> parse_filter("Code.isin([1, 2]) & (Cost > 0) & (Kind != 'a')")
+    [('Code', 'in', (1, 2)), ('Cost', '>', 0)]
+    """
+    parsed = parse_expression(condition)
+    if parsed is None:
+        return []
+    tree, names = parsed
+    filters = []
+    for column, operator, value in _parse_conjunction(tree.body):
+        filters.append((names.get(column, column), operator, value))
+    return filters
+
+
+def parse_expression(expression: str) -> tuple[ast.Expression, dict[str, str]] | None:
+    """Parse a query or eval expression into a Python syntax tree.
+
+    Backtick-quoted column names are replaced by placeholder names, and
+    `&` and `|` by `and` and `or`, so that the tree has the structure
+    pandas evaluates.
+
+    Parameters
+    ----------
+    expression : str
+        Expression as accepted by `DataFrame.query` or `DataFrame.eval`.
+
+    Returns
+    -------
+    tuple or None
+        The tree and the column name of each placeholder, None if the
+        expression is not valid Python once rewritten.
+
+    Examples
+    --------
+    >>> tree, names = parse_expression("`Food Share` > 0.5 & Code == 1")
+    >>> type(tree.body).__name__, names
+    ('BoolOp', {'__bssir_column_0__': 'Food Share'})
+    """
+    names: dict[str, str] = {}
+
+    def replace_backticks(match: re.Match) -> str:
+        placeholder = f"__bssir_column_{len(names)}__"
+        names[placeholder] = match.group(1)
+        return placeholder
+
+    source = _BACKTICK_PATTERN.sub(replace_backticks, expression.replace("\n", " "))
+    try:
+        source = replace_bitwise_operators(source)
+        return ast.parse(source.strip(), mode="eval"), names
+    except (SyntaxError, tokenize.TokenError):
+        return None
+
+
+def replace_bitwise_operators(expression: str) -> str:
+    """Replace `&` and `|` by `and` and `or` outside of string literals.
+
+    `DataFrame.query` and `DataFrame.eval` give `&` and `|` the
+    precedence of `and` and `or`, lower than comparisons, unlike Python.
+    After the replacement, the expression parses with Python's `ast`
+    into the tree pandas evaluates.
+
+    Parameters
+    ----------
+    expression : str
+        Expression as accepted by `DataFrame.eval`, on one line and
+        without backtick-quoted names.
+
+    Returns
+    -------
+    str
+        Expression with boolean operators instead of bitwise ones.
+
+    Raises
+    ------
+    tokenize.TokenError
+        If the expression cannot be tokenized
+
+    Examples
+    --------
+    >>> replace_bitwise_operators("A > 1 & Name == 'A&B'")
+    "A > 1 and Name == 'A&B'"
+    """
+    line_offsets = [0]
+    for line in expression.splitlines(keepends=True):
+        line_offsets.append(line_offsets[-1] + len(line))
+    parts = []
+    end = 0
+    for token in tokenize.generate_tokens(io.StringIO(expression).readline):
+        if (token.type != tokenize.OP) or (token.string not in ("&", "|")):
+            continue
+        start = line_offsets[token.start[0] - 1] + token.start[1]
+        keyword = "and" if token.string == "&" else "or"
+        if not expression[start - 1 : start].isspace():
+            keyword = f" {keyword}"
+        if not expression[start + 1 : start + 2].isspace():
+            keyword = f"{keyword} "
+        parts.extend([expression[end:start], keyword])
+        end = start + 1
+    parts.append(expression[end:])
+    return "".join(parts)
+
+
+def _parse_conjunction(node: ast.expr) -> list[_Filter]:
+    if isinstance(node, ast.BoolOp) and isinstance(node.op, ast.And):
+        return [part for value in node.values for part in _parse_conjunction(value)]
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.BitAnd):
+        return _parse_conjunction(node.left) + _parse_conjunction(node.right)
+    if isinstance(node, ast.Compare):
+        return _parse_comparison(node)
+    if isinstance(node, ast.Call):
+        return _parse_isin(node)
+    return []
+
+
+def _parse_comparison(node: ast.Compare) -> list[_Filter]:
+    filters = []
+    operands = [node.left] + list(node.comparators)
+    for left, operator_node, right in zip(operands, node.ops, operands[1:]):
+        operator = _COMPARISON_OPERATORS.get(type(operator_node))
+        if operator is None:
+            continue
+        if isinstance(left, ast.Name):
+            value = _literal(right)
+            if value is not None:
+                filters.append((left.id, operator, value))
+        elif isinstance(right, ast.Name) and (operator != "in"):
+            value = _literal(left)
+            if value is not None:
+                filters.append((right.id, _FLIPPED_OPERATORS[operator], value))
+    return [
+        (column, operator, value)
+        for column, operator, value in filters
+        if (operator != "in") or isinstance(value, tuple)
+    ]
+
+
+def _parse_isin(node: ast.Call) -> list[_Filter]:
+    func = node.func
+    if not (
+        isinstance(func, ast.Attribute)
+        and isinstance(func.value, ast.Name)
+        and (func.attr == "isin")
+        and (len(node.args) == 1)
+        and (len(node.keywords) == 0)
+    ):
+        return []
+    value = _literal(node.args[0])
+    if not isinstance(value, tuple):
+        return []
+    return [(func.value.id, "in", value)]
+
+
+def _literal(node: ast.expr) -> Any:
+    try:
+        value = ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError):
+        return None
+    if isinstance(value, (list, tuple, set)):
+        if any(isinstance(element, (list, tuple, set, dict)) for element in value):
+            return None
+        return tuple(value)
+    if isinstance(value, (bool, int, float, str)):
+        return value
+    return None
+
+
+def pushdown_filters(
+    steps: list | None,
+    filters: Iterable[_Filter] = (),
+) -> list[_Filter]:
+    """Find parquet filters that can be applied before a list of instructions.
+
+    Collects the filters of `apply_filter` steps, and the given filters
+    that apply after the last step, and maps them to the columns of the
+    input table. A filter is dropped when its column is created or
+    modified on the way, and nothing after an `apply_function` or
+    `apply_pandas_function` step, or an unknown step, is pushed down.
+
+    Parameters
+    ----------
+    steps : list, optional
+        Schema `instructions` in the order they are applied.
+    filters : iterable of tuple, optional
+        Filters applied after the last step.
+
+    Returns
+    -------
+    list of tuple
+        Filters on the input table, in `(column, op, value)` form.
+
+    Examples
+    --------
+    >>> steps = [{"rename": {"Cost": "Expenditure"}}, {"apply_filter": "Code == 2"}]
+    >>> pushdown_filters(steps, [("Expenditure", ">", 0)])
+    [('Code', '==', 2), ('Cost', '>', 0)]
+    """
+    tracker = _ColumnTracker()
+    pushed: list[_Filter] = []
+    for step in steps or []:
+        if step is None:
+            continue
+        if tracker.blocked:
+            break
+        method_name, method_input = _split_step(step)
+        if method_name == "apply_filter":
+            for condition in _as_list(method_input):
+                pushed.extend(tracker.translate(parse_filter(condition)))
+        else:
+            tracker.apply(method_name, method_input)
+    pushed.extend(tracker.translate(filters))
+    return list(dict.fromkeys(pushed))
+
+
+class _ColumnTracker:
+    """Tracks which input column each column of a pipeline comes from."""
+
+    _ROW_WISE_STEPS = {
+        "filter_year",
+        "add_attribute",
+        "add_classification",
+        "dropna",
+        "join",
+    }
+
+    def __init__(self) -> None:
+        self.sources: dict[str, str] = {}
+        self.modified: set[str] = set()
+        self.blocked = False
+
+    def apply(self, method_name: str, method_input) -> None:
+        if method_name == "add_year":
+            self.modified.add("Year")
+        elif method_name == "add_table_name":
+            self.modified.add("Table_Name")
+        elif method_input is None or method_name in self._ROW_WISE_STEPS:
+            pass
+        elif method_name == "rename":
+            self._rename(method_input)
+        elif method_name == "create_column":
+            self.modified.add(method_input["name"])
+        elif method_name == "fillna":
+            if isinstance(method_input, dict):
+                self.modified.update(method_input.keys())
+            else:
+                self.modified.update(_as_list(method_input))
+        elif method_name == "apply_order":
+            for column in method_input:
+                if isinstance(column, dict):
+                    self.modified.update(column.keys())
+        else:
+            self.blocked = True
+
+    def _rename(self, mapping: dict) -> None:
+        sources = {new: self.source(old) for old, new in mapping.items()}
+        for old in mapping:
+            self.modified.add(old)
+        for new, source in sources.items():
+            if source is None:
+                self.modified.add(new)
+            else:
+                self.modified.discard(new)
+                self.sources[new] = source
+
+    def source(self, column: str) -> str | None:
+        if self.blocked or (column in self.modified):
+            return None
+        return self.sources.get(column, column)
+
+    def translate(self, filters: Iterable[_Filter]) -> list[_Filter]:
+        translated = []
+        for column, operator, value in filters:
+            source = self.source(column)
+            if source is not None:
+                translated.append((source, operator, value))
+        return translated
@@ -0,0 +1,252 @@
+"""
+Remote parquet files read with HTTP Range requests.
+
+Reading a parquet file from a URL with `pd.read_parquet` transfers the
+whole object, even when only a few columns or row groups are needed.
+`RemoteFile` is a seekable, read-only file over a URL that fetches only
+the byte ranges the parquet reader asks for: the footer, then the
+column chunks of the selected columns and row groups.
+
+Fetched bytes are kept on local disk in blocks of `BLOCK_SIZE` bytes,
+one directory per version of the remote object, so later reads of the
+same parts of the file do not go over the network again. The version
+is taken from the size and the `ETag` or `Last-Modified` header of the
+object, so a changed object gets a new set of blocks, and the blocks
+of earlier versions are removed by `CacheCatalog.sweep`. Objects with
+neither header are not cached, since a change could not be detected.
+
+Servers that ignore Range requests return the whole object, which is
+then cached as well.
+
+Classes
+-------
+RemoteFile - Read-only file over a URL, fetched in cached blocks.
+
+Functions
+---------
+read_remote_table - Read columns and row groups of a remote parquet file.
+
+"""
+import hashlib
+import io
+import os
+import uuid
+from pathlib import Path
+from typing import Any
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import requests
+
+from .io_utils import get_version_dir
+
+BLOCK_SIZE = 256 * 1024
+BLOCK_CACHE_FOLDER = "remote"
+
+_TIMEOUT = 60
+
+
+class RemoteFile(io.RawIOBase):
+    """Read-only file over a URL, fetched in cached blocks.
+
+    Parameters
+    ----------
+    url : str
+        URL of the file, on a server that answers HEAD requests with the
+        size of the file
+    cache_dir : Path
+        Directory of the block cache
+    block_size : int, optional
+        Size of the cached blocks, in bytes
+    session : requests.Session, optional
+        Session used for the requests
+
+    Attributes
+    ----------
+    size : int
+        Size of the remote file, in bytes
+    bytes_fetched : int
+        Bytes transferred over the network by this file so far
+
+    """
+
+    def __init__(
+        self,
+        url: str,
+        cache_dir: Path,
+        block_size: int = BLOCK_SIZE,
+        session: requests.Session | None = None,
+    ) -> None:
+        super().__init__()
+        self.url = url
+        self.block_size = block_size
+        self._own_session = session is None
+        self.session = requests.Session() if session is None else session
+        self.bytes_fetched = 0
+        self._position = 0
+        self.size, version = self._get_version()
+        self._block_dir: Path | None = None
+        if version:
+            self._block_dir = get_version_dir(
+                cache_dir,
+                hashlib.sha256(f"{url}\n{block_size}".encode()).hexdigest(),
+                hashlib.sha256(f"{self.size}\n{version}".encode()).hexdigest(),
+            )
+
+    def close(self) -> None:
+        if self._own_session and not self.closed:
+            self.session.close()
+        super().close()
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < 0:
+            raise OSError("Negative seek position")
+        self._position = position
+        return position
+
+    def readinto(self, buffer) -> int:
+        end = min(self._position + len(buffer), self.size)
+        if end <= self._position:
+            return 0
+        data = self._read_range(self._position, end)
+        buffer[: len(data)] = data
+        self._position = end
+        return len(data)
+
+    def readall(self) -> bytes:
+        if self._position >= self.size:
+            return b""
+        data = self._read_range(self._position, self.size)
+        self._position = self.size
+        return data
+
+    def _get_version(self) -> tuple[int, str]:
+        response = self.session.head(self.url, allow_redirects=True, timeout=_TIMEOUT)
+        response.raise_for_status()
+        size = response.headers.get("Content-Length")
+        if size is None:
+            raise IOError(f"Server did not provide content-length for URL: {self.url}")
+        version = response.headers.get("ETag") or response.headers.get(
+            "Last-Modified", ""
+        )
+        return int(size), version
+
+    def _read_range(self, start: int, end: int) -> bytes:
+        first, last = start // self.block_size, (end - 1) // self.block_size
+        blocks = {number: self._read_block(number) for number in range(first, last + 1)}
+        missing = [number for number, block in blocks.items() if block is None]
+        # Adjacent missing blocks are fetched with one request
+        while missing:
+            run_end = 0
+            while (run_end + 1 < len(missing)) and (
+                missing[run_end + 1] == missing[run_end] + 1
+            ):
+                run_end += 1
+            blocks.update(self._fetch_blocks(missing[0], missing[run_end]))
+            missing = [
+                number for number in missing[run_end + 1 :] if blocks[number] is None
+            ]
+        data = b"".join(blocks[number] for number in range(first, last + 1))
+        offset = first * self.block_size
+        return data[start - offset : end - offset]
+
+    def _fetch_blocks(self, first: int, last: int) -> dict[int, bytes]:
+        start = first * self.block_size
+        end = min((last + 1) * self.block_size, self.size)
+        response = self.session.get(
+            self.url, headers={"Range": f"bytes={start}-{end - 1}"}, timeout=_TIMEOUT
+        )
+        response.raise_for_status()
+        data = response.content
+        self.bytes_fetched += len(data)
+        if response.status_code != 206:
+            # The whole file was sent
+            first, last = 0, (self.size - 1) // self.block_size
+            start, end = 0, self.size
+        if len(data) != end - start:
+            raise IOError(
+                f"Server sent {len(data)} bytes instead of {end - start} "
+                f"for URL: {self.url}"
+            )
+        blocks = {}
+        for number in range(first, last + 1):
+            offset = number * self.block_size - start
+            blocks[number] = data[offset : offset + self.block_size]
+            self._write_block(number, blocks[number])
+        return blocks
+
+    def _get_block_path(self, number: int) -> Path:
+        assert self._block_dir is not None
+        return self._block_dir.joinpath(f"{number}.block")
+
+    def _read_block(self, number: int) -> bytes | None:
+        if self._block_dir is None:
+            return None
+        try:
+            return self._get_block_path(number).read_bytes()
+        except OSError:
+            return None
+
+    def _write_block(self, number: int, data: bytes) -> None:
+        if self._block_dir is None:
+            return
+        path = self._get_block_path(number)
+        temp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            self._block_dir.mkdir(parents=True, exist_ok=True)
+            temp_path.write_bytes(data)
+            os.replace(temp_path, path)
+        except OSError:
+            # The cache is only an optimization, e.g. on read-only directories
+            pass
+        finally:
+            temp_path.unlink(missing_ok=True)
+
+
+def read_remote_table(
+    url: str,
+    cache_dir: Path,
+    columns: list[str] | None = None,
+    filters: list[tuple[str, str, Any]] | None = None,
+) -> pa.Table:
+    """Read columns and row groups of a remote parquet file.
+
+    Only the footer and the column chunks of the selected columns, in
+    the row groups that the filters do not rule out, are fetched.
+
+    Parameters
+    ----------
+    url : str
+        URL of the parquet file
+    cache_dir : Path
+        Directory of the block cache
+    columns : list of str, optional
+        Columns to read, all columns if not specified
+    filters : list of tuple, optional
+        Filters in `(column, op, value)` form, combined with AND
+
+    Returns
+    -------
+    pyarrow.Table
+        Rows of the file that pass the filters
+
+    """
+    with RemoteFile(url, cache_dir) as file:
+        return pq.read_table(file, columns=columns, filters=filters or None)
@@ -0,0 +1,55 @@
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from bssir.data_engine import convert_backend, read_parquet
+
+
+@pytest.fixture
+def table():
+    return pd.DataFrame(
+        {
+            "ID": [1, 2, 3],
+            "Cost": [1.5, None, 3.0],
+            "Kind": pd.Categorical(["a", "b", "a"]),
+            "Size": pd.array([1, None, 2], dtype="Int64"),
+        }
+    )
+
+
+class TestReadParquet:
+    def test_arrow_backed_columns(self, table, tmp_path):
+        path = tmp_path / "table.parquet"
+        table.to_parquet(path)
+        result = read_parquet(path, filters=[("ID", ">", 1)], backend="pyarrow")
+        assert result["ID"].dtype == pd.ArrowDtype(pa.int64())
+        assert result["Size"].dtype == pd.ArrowDtype(pa.int64())
+        assert isinstance(result["Kind"].dtype, pd.CategoricalDtype)
+        assert result["ID"].tolist() == [2, 3]
+
+    def test_numpy_backed_columns(self, table, tmp_path):
+        path = tmp_path / "table.parquet"
+        table.to_parquet(path)
+        result = read_parquet(path)
+        pd.testing.assert_frame_equal(result, table)
+
+
+class TestConvertBackend:
+    def test_pyarrow(self, table):
+        result = convert_backend(table, "pyarrow")
+        assert result["Cost"].dtype == pd.ArrowDtype(pa.float64())
+        assert result["Cost"].isna().tolist() == [False, True, False]
+        assert isinstance(result["Kind"].dtype, pd.CategoricalDtype)
+
+    def test_arrow(self, table):
+        result = convert_backend(table, "arrow")
+        assert isinstance(result, pa.Table)
+        assert result.column("Size").to_pylist() == [1, None, 2]
+        assert pa.types.is_dictionary(result.schema.field("Kind").type)
+
+    def test_numpy_is_unchanged(self, table):
+        assert convert_backend(table) is table
+
+    def test_invalid(self, table):
+        with pytest.raises(ValueError):
+            convert_backend(table, "polars")
@@ -0,0 +1,34 @@
+import pandas as pd
+
+from bssir.data_engine import BuildContext
+
+
+class TestBuildContext:
+    def test_builds_once(self):
+        context = BuildContext()
+        table = pd.DataFrame({"ID": [1, 2]})
+        for _ in range(3):
+            result = context.get_table(("normalized", "A", 1400), lambda: table)
+        assert result is table
+        assert context.build_counts[("normalized", "A", 1400)] == 1
+
+    def test_columns(self):
+        context = BuildContext()
+        key = ("normalized", "A", 1400)
+        context.get_table(key, pd.DataFrame, columns=["ID", "Cost"])
+        context.get_table(key, pd.DataFrame, columns=["ID"])
+        assert context.build_counts[key] == 1
+        context.get_table(key, pd.DataFrame, columns=["ID", "Code"])
+        context.get_table(key, pd.DataFrame)
+        context.get_table(key, pd.DataFrame, columns=["Code"])
+        assert context.build_counts[key] == 3
+
+    def test_filters(self):
+        context = BuildContext()
+        key = ("cleaned", "A", 1400)
+        context.get_table(key, pd.DataFrame, filters=[("Code", "==", 1)])
+        context.get_table(key, pd.DataFrame, filters=[("Code", "==", 1), ("ID", ">", 0)])
+        assert context.build_counts[key] == 1
+        context.get_table(key, pd.DataFrame)
+        context.get_table(key, pd.DataFrame, filters=[("Code", "==", 1)])
+        assert context.build_counts[key] == 2
@@ -0,0 +1,121 @@
+import os
+
+from bssir.cache_catalog import CacheCatalog, parse_size
+from bssir.utils.io_utils import get_version_dir
+
+
+class TestCacheCatalog:
+    def test_record_and_lookup(self, tmp_path):
+        catalog = CacheCatalog(tmp_path)
+        assert catalog.lookup("Food", 1400) is None
+        catalog.record(
+            "Food",
+            1400,
+            cache_key="abc",
+            file_name="Food_1400.parquet",
+            size=10,
+            dependencies=["Food", "Weight"],
+        )
+        entry = catalog.lookup("Food", 1400)
+        assert entry["cache_key"] == "abc"
+        assert entry["dependencies"] == ["Food", "Weight"]
+        assert entry["hits"] == 0
+
+    def test_touch_and_stats(self, tmp_path):
+        catalog = CacheCatalog(tmp_path)
+        for year in [1399, 1400]:
+            catalog.record(
+                "Food", year, cache_key="abc", file_name="f.parquet", size=10
+            )
+        catalog.touch("Food", 1400)
+        catalog.touch("Food", 1400)
+        assert catalog.lookup("Food", 1400)["hits"] == 2
+        assert catalog.stats() == {"entries": 2, "size": 20, "hits": 2}
+        assert catalog.entries()["year"].tolist() == [1400, 1399]
+
+    def test_prune(self, tmp_path):
+        catalog = CacheCatalog(tmp_path)
+        tmp_path.joinpath("kept.parquet").write_bytes(b"")
+        catalog.record("A", 1400, cache_key="a", file_name="kept.parquet", size=0)
+        catalog.record("B", 1400, cache_key="b", file_name="lost.parquet", size=0)
+        assert catalog.prune() == [("B", 1400)]
+        assert catalog.lookup("A", 1400) is not None
+
+
+class TestEviction:
+    def _fill(self, catalog, tmp_path):
+        for table_name, size, build_seconds in [
+            ("A", 100, 10.0),
+            ("B", 100, 1.0),
+            ("C", 100, 5.0),
+        ]:
+            file_name = f"{table_name}_1400.parquet"
+            tmp_path.joinpath(file_name).write_bytes(b"")
+            catalog.record(
+                table_name,
+                1400,
+                cache_key=table_name,
+                file_name=file_name,
+                size=size,
+                build_seconds=build_seconds,
+            )
+
+    def test_lru(self, tmp_path):
+        catalog = CacheCatalog(tmp_path)
+        self._fill(catalog, tmp_path)
+        catalog.touch("A", 1400)
+        assert catalog.evict(150, "lru") == [("B", 1400), ("C", 1400)]
+        assert not tmp_path.joinpath("B_1400.parquet").exists()
+        assert catalog.evict("1KB") == []
+
+    def test_cost(self, tmp_path):
+        catalog = CacheCatalog(tmp_path)
+        self._fill(catalog, tmp_path)
+        assert catalog.evict(200, "cost") == [("B", 1400)]
+        assert catalog.report().index.tolist() == ["A", "C"]
+
+    def test_sweep(self, tmp_path):
+        catalog = CacheCatalog(tmp_path)
+        self._fill(catalog, tmp_path)
+        tmp_path.joinpath("Old_1400_metadata.yaml").write_text("")
+        tmp_path.joinpath("C_1400.parquet").unlink()
+        removed = catalog.sweep()
+        assert [path.name for path in removed] == ["Old_1400_metadata.yaml"]
+        assert catalog.lookup("C", 1400) is None
+
+    def _add_versions(self, tmp_path):
+        folder = tmp_path / "remote"
+        paths = []
+        for slot, version, last_use in [
+            ("a" * 16, "1" * 16, 100),
+            ("a" * 16, "2" * 16, 200),
+            ("b" * 16, "1" * 16, 50),
+        ]:
+            path = get_version_dir(folder, slot, version)
+            path.mkdir(parents=True)
+            path.joinpath("0.block").write_bytes(b"0")
+            os.utime(path, (last_use, last_use))
+            paths.append(path)
+        return paths
+
+    def test_sweep_versions(self, tmp_path):
+        catalog = CacheCatalog(tmp_path)
+        old, current, other = self._add_versions(tmp_path)
+        assert catalog.sweep() == [old]
+        assert not old.exists()
+        assert current.joinpath("0.block").exists()
+        assert other.exists()
+
+    def test_evict_versions(self, tmp_path):
+        catalog = CacheCatalog(tmp_path)
+        self._fill(catalog, tmp_path)
+        old, current, _ = self._add_versions(tmp_path)
+        assert catalog.evict(300) == []
+        assert not old.exists()
+        assert current.exists()
+
+
+def test_parse_size():
+    assert parse_size(10) == 10
+    assert parse_size("2KB") == 2048
+    assert parse_size("1.5 gb") == 1.5 * 2**30
@@ -0,0 +1,49 @@
+import os
+
+import pandas as pd
+
+from bssir.utils.cache_utils import create_cache_key, file_fingerprint
+
+
+class TestFileFingerprint:
+    def test_missing_file(self, tmp_path):
+        assert file_fingerprint(tmp_path / "missing.parquet") is None
+
+    def test_same_size_edit(self, tmp_path):
+        path = tmp_path / "table.parquet"
+        pd.DataFrame({"Value": [1, 2, 3]}).to_parquet(path)
+        os.utime(path, ns=(1, 1))
+        size = path.stat().st_size
+        before = file_fingerprint(path, method="metadata")
+        assert before.startswith("footer:")
+        pd.DataFrame({"Value": [1, 2, 4]}).to_parquet(path)
+        os.utime(path, ns=(2, 2))
+        assert path.stat().st_size == size
+        assert file_fingerprint(path, method="metadata") != before
+
+    def test_swapped_values(self, tmp_path):
+        path = tmp_path / "table.parquet"
+        pd.DataFrame({"ID": [1, 2, 3], "Value": [10, 20, 30]}).to_parquet(path)
+        os.utime(path, ns=(1, 1))
+        before = file_fingerprint(path)
+        assert before.startswith("content:")
+        pd.DataFrame({"ID": [1, 2, 3], "Value": [30, 20, 10]}).to_parquet(path)
+        os.utime(path, ns=(2, 2))
+        assert file_fingerprint(path) != before
+
+    def test_content(self, tmp_path):
+        path = tmp_path / "table.txt"
+        path.write_text("abc")
+        fingerprint = file_fingerprint(path)
+        assert fingerprint.startswith("content:")
+        assert file_fingerprint(path, method="metadata") == fingerprint
+
+
+class TestCreateCacheKey:
+    def test_key_order(self):
+        assert create_cache_key({"a": 1, "b": [1, 2]}) == create_cache_key(
+            {"b": [1, 2], "a": 1}
+        )
+
+    def test_changed_input(self):
+        assert create_cache_key({"a": 1}) != create_cache_key({"a": 2})
@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+
+from bssir.utils.categorical_utils import compile_categories
+
+
+@pytest.fixture
+def table():
+    return pd.DataFrame(
+        {
+            "Code": [1, 2, 3, 4, 5],
+            "Tag": ["x", "y", "z", "x", None],
+            "Size": pd.array([1, None, 2, 2, 1], dtype="Int64"),
+        }
+    )
+
+
+def _evaluate(table, column_name, categories):
+    return compile_categories(column_name, categories).evaluate(table, table.index)
+
+
+class TestCompileCategories:
+    def test_values_of_column(self, table):
+        result = _evaluate(table, "Tag", {"X": "x", "YZ": ["y", "z"]})
+        assert result.tolist()[:4] == ["X", "YZ", "YZ", "X"]
+        assert result.isna().tolist() == [False, False, False, False, True]
+        assert list(result.dtype.categories) == ["X", "YZ"]
+
+    def test_last_category_wins(self, table):
+        result = _evaluate(table, "Code", {"low": [1, 2, 3], "mid": [3, 4]})
+        assert result.tolist()[:4] == ["low", "low", "mid", "mid"]
+
+    def test_conditions_on_other_columns(self, table):
+        result = _evaluate(
+            table,
+            "Kind",
+            {
+                "other": None,
+                "a": {"Code": [1, 2, 3], "Tag": "x"},
+                "b": {"Size": [2]},
+            },
+        )
+        assert result.tolist() == ["a", "other", "b", "b", "other"]
+
+    def test_no_categories(self, table):
+        result = _evaluate(table, "Kind", {})
+        assert result.isna().all()
+        assert len(result) == len(table)
+
+    def test_cached(self):
+        categories = {"a": {"Code": [1]}, "b": None}
+        assert compile_categories("Kind", categories) is compile_categories(
+            "Kind", dict(categories)
+        )
+        reordered = {"b": None, "a": {"Code": [1]}}
+        assert compile_categories("Kind", reordered) is not compile_categories(
+            "Kind", categories
+        )
@@ -0,0 +1,44 @@
+import pandas as pd
+
+from bssir.utils.concat_utils import concat_tables
+
+
+def _table(year, kinds, **columns):
+    return pd.DataFrame(
+        {"Year": [year] * len(kinds), "Kind": pd.Categorical(kinds), **columns}
+    )
+
+
+class TestConcatTables:
+    def test_categories_are_united(self):
+        table = concat_tables(
+            [_table(1400, ["a", "b"]), _table(1401, ["c", "a"])], ignore_index=True
+        )
+        assert isinstance(table["Kind"].dtype, pd.CategoricalDtype)
+        assert table["Kind"].cat.categories.tolist() == ["a", "b", "c"]
+        assert table["Kind"].tolist() == ["a", "b", "c", "a"]
+
+    def test_dtypes_survive(self):
+        tables = [
+            _table(1400, ["a"], Value=pd.array([1], dtype="Int64")),
+            _table(1401, ["b"], Value=pd.array([None], dtype="Int64")),
+        ]
+        table = concat_tables(tables, ignore_index=True)
+        assert table.dtypes.astype(str).to_dict() == {
+            "Year": "int64",
+            "Kind": "category",
+            "Value": "Int64",
+        }
+
+    def test_missing_column(self):
+        first = _table(1400, ["a"])
+        second = first.drop(columns="Kind").assign(Year=1401)
+        table = concat_tables([first, second], ignore_index=True)
+        assert isinstance(table["Kind"].dtype, pd.CategoricalDtype)
+        assert table["Kind"].isna().tolist() == [False, True]
+
+    def test_mixed_columns_are_left_to_pandas(self):
+        first = _table(1400, ["a"])
+        second = first.assign(Kind=["b"])
+        table = concat_tables([first, second], ignore_index=True)
+        assert table["Kind"].tolist() == ["a", "b"]
@@ -0,0 +1,170 @@
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pytest
+import yaml
+
+from bssir import decoder
+from bssir.cache_catalog import CacheCatalog
+from bssir.decoder import (
+    COMPILED_FOLDER,
+    Decoder,
+    DecoderSettings,
+    _read_compiled,
+    _to_integer_codes,
+    _write_compiled,
+    compile_code_ranges,
+    match_codes,
+)
+from bssir.metadata_reader import BASE_PACKAGE_DIRECTORY, config
+from bssir.utils import Argham
+
+
+def _matches(codes, code_ranges):
+    intervals = compile_code_ranges(code_ranges)
+    positions, items = match_codes(np.asarray(codes, dtype="int64"), intervals)
+    return sorted(zip(positions.tolist(), items.tolist()))
+
+
+def _expected(codes, code_ranges):
+    return sorted(
+        (position, item)
+        for position, code in enumerate(codes)
+        for item, code_range in enumerate(code_ranges)
+        if code in code_range
+    )
+
+
+class TestCompileCodeRanges:
+    def test_sorted_intervals(self):
+        intervals = compile_code_ranges(
+            [Argham({"start": 20, "end": 30}), Argham([5, {"start": 10, "end": 12}])]
+        )
+        assert intervals.tolist() == [
+            [5, 6, 1, 1],
+            [10, 12, 1, 1],
+            [20, 30, 1, 0],
+        ]
+
+    def test_empty(self):
+        assert compile_code_ranges([Argham()]).shape == (0, 4)
+
+
+class TestMatchCodes:
+    def test_overlapping_levels(self):
+        code_ranges = [
+            Argham({"start": 100, "end": 200}),
+            Argham({"start": 110, "end": 120}),
+            Argham([150, 151]),
+        ]
+        codes = [99, 100, 115, 150, 199, 200, 115]
+        assert _matches(codes, code_ranges) == _expected(codes, code_ranges)
+
+    def test_steps(self):
+        code_ranges = [Argham({"start": 3, "end": 20, "step": 4})]
+        codes = list(range(25))
+        assert _matches(codes, code_ranges) == _expected(codes, code_ranges)
+
+    def test_random_ranges(self):
+        rng = np.random.default_rng(0)
+        code_ranges = []
+        for start in rng.integers(0, 1000, 50):
+            end = start + rng.integers(1, 100)
+            code_ranges.append(Argham([{"start": int(start), "end": int(end)}, 7]))
+        codes = rng.integers(0, 1100, 300).tolist()
+        assert _matches(codes, code_ranges) == _expected(codes, code_ranges)
+
+
+class TestIntegerCodes:
+    def test_numeric(self):
+        codes = pd.Series([11, None, 12.5, 13], dtype="Float64")
+        values, positions = _to_integer_codes(codes)
+        assert values.tolist() == [11, 13]
+        assert positions.tolist() == [0, 3]
+
+    def test_object(self):
+        values, positions = _to_integer_codes(pd.Series([11, "12", None, 13.0]))
+        assert values.tolist() == [11, 13]
+        assert positions.tolist() == [0, 3]
+
+
+class TestCompiledStorage:
+    def test_round_trip(self, tmp_path):
+        items = pd.DataFrame(
+            {"level": [1, 2], "item_key": ["food", "bread"], "weight": [1.5, None]}
+        )
+        intervals = compile_code_ranges(
+            [Argham({"start": 100, "end": 200}), Argham([110, 111])]
+        )
+        path = tmp_path / "compiled" / "key"
+        assert _read_compiled(path) is None
+        _write_compiled(path, items, intervals)
+        read_items, read_intervals = _read_compiled(path)
+        pd.testing.assert_frame_equal(read_items, items)
+        assert isinstance(read_intervals, np.memmap)
+        np.testing.assert_array_equal(read_intervals, intervals)
+
+    def test_mixed_types_are_not_saved(self, tmp_path):
+        items = pd.DataFrame({"level": [1, 2], "item_key": ["food", 3]})
+        path = tmp_path / "key"
+        _write_compiled(path, items, compile_code_ranges([Argham(1), Argham(2)]))
+        assert _read_compiled(path) is None
+        assert list(tmp_path.iterdir()) == []
+
+
+def _write_commodities(path, end):
+    items = {
+        "food": {"level": 1, "code": {"start": 11000, "end": end}},
+        "bread": {"level": 2, "code": [11100, 11101]},
+    }
+    path.write_text(yaml.safe_dump({"original": {"items": items}}))
+
+
+@pytest.fixture
+def settings(tmp_path, monkeypatch):
+    defaults, metadata = config.set_package_config(BASE_PACKAGE_DIRECTORY)
+    defaults.dir.cached = tmp_path / "cached"
+    metadata_path = tmp_path / "commodities.yaml"
+    monkeypatch.setitem(defaults.local_metadata, "commodities", metadata_path)
+    _write_commodities(metadata_path, 12000)
+    metadata.reload_file("commodities")
+    monkeypatch.setattr(decoder, "_compiled", OrderedDict())
+    return DecoderSettings(
+        lib_defaults=defaults,
+        lib_metadata=metadata,
+        target="Commodity_Code",
+        levels=[1, 2],
+    )
+
+
+class TestCompiledClassification:
+    def _decode(self, settings, year):
+        table = pd.DataFrame({"Commodity_Code": [11100, 11500], "Year": year})
+        return Decoder(table, settings).create_mapping_table()
+
+    def test_memo_size(self, settings, monkeypatch):
+        monkeypatch.setattr(decoder, "_COMPILED_MEMO_SIZE", 2)
+        keys = {}
+        for year in [1398, 1399, 1400]:
+            self._decode(settings, year)
+            keys[year] = next(reversed(decoder._compiled))
+        assert list(decoder._compiled) == [keys[1399], keys[1400]]
+        self._decode(settings, 1399)
+        assert list(decoder._compiled) == [keys[1400], keys[1399]]
+
+    def test_sweep_old_versions(self, settings, tmp_path):
+        mapping = self._decode(settings, 1400)
+        assert len(mapping) == 2
+        folder = tmp_path / "cached" / COMPILED_FOLDER
+        (old,) = folder.iterdir()
+        os.utime(old, (0, 0))
+        _write_commodities(tmp_path / "commodities.yaml", 11200)
+        settings.lib_metadata.reload_file("commodities")
+        settings.versioned_info = settings.lib_metadata.commodities["original"]
+        mapping = self._decode(settings, 1400)
+        assert mapping.index.get_level_values("Commodity_Code").tolist() == [11100]
+        assert len(list(folder.iterdir())) == 2
+        assert CacheCatalog(tmp_path / "cached").sweep() == [old]
+        assert len(list(folder.iterdir())) == 1
@@ -0,0 +1,38 @@
+import threading
+
+from bssir.utils.executor_utils import ExecutorService, get_executor_service
+
+
+class TestExecutorService:
+    def test_map_order(self):
+        service = ExecutorService(io_workers=2, cpu_workers=2)
+        assert service.map("io", lambda x: x * 2, range(5)) == [0, 2, 4, 6, 8]
+        service.shutdown()
+
+    def test_nested_work_runs_inline(self):
+        service = ExecutorService(io_workers=1, cpu_workers=1)
+
+        def outer(x):
+            caller = threading.current_thread()
+            inner = service.map("cpu", lambda _: threading.current_thread(), [x])
+            io_result = service.submit("io", lambda: x + 1).result()
+            return inner[0] is caller, io_result
+
+        # A single worker would wait for itself if nested work were queued
+        assert service.map("cpu", outer, [1, 2]) == [(True, 2), (True, 3)]
+        service.shutdown()
+
+    def test_inline_errors(self):
+        service = ExecutorService(io_workers=1, cpu_workers=1)
+
+        def fail():
+            raise ValueError
+
+        def outer():
+            return service.submit("cpu", fail).exception()
+
+        assert isinstance(service.submit("cpu", outer).result(), ValueError)
+        service.shutdown()
+
+    def test_shared_service(self):
+        assert get_executor_service(3, 2) is get_executor_service(3, 2)
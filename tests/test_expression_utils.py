@@ -0,0 +1,84 @@
+import pandas as pd
+import pytest
+
+from bssir.utils.expression_utils import collect_expressions, compile_expression
+
+
+@pytest.fixture
+def table():
+    return pd.DataFrame(
+        {
+            "Size": pd.array([1, None, 4], dtype="Int64"),
+            "Expenditure": [10.0, 20.0, 0.0],
+            "Code": [4, 5, 6],
+            "Food Share": [0.1, 0.2, 0.3],
+        }
+    )
+
+
+class TestCompileExpression:
+    @pytest.mark.parametrize(
+        "expression",
+        [
+            "Expenditure / Size",
+            "Code // Expenditure",
+            "Code % 4 + 1",
+            "-Size * 2",
+            "`Food Share` * Expenditure",
+            "sqrt(Code) + abs(-Expenditure)",
+            "(Code > 4) & (Expenditure > 0)",
+            "Size > 1",
+        ],
+    )
+    def test_same_as_eval(self, table, expression):
+        result = compile_expression(expression).evaluate(table, table.index)
+        expected = table.astype({"Size": "float64"}).eval(expression, engine="python")
+        pd.testing.assert_series_equal(result, expected, check_names=False)
+
+    @pytest.mark.parametrize(
+        "expression",
+        [
+            "A > 1 & B < 2",
+            "A > 1 | B < 2",
+            "A > 2 | B < 2 & A > 0",
+            "A & B",
+            "(A > 1) == (B < 2) | A == 0",
+        ],
+    )
+    def test_bitwise_precedence(self, expression):
+        table = pd.DataFrame({"A": [0, 2, 3], "B": [1, 1, 5]})
+        result = compile_expression(expression).evaluate(table, table.index)
+        pd.testing.assert_series_equal(
+            result, table.eval(expression), check_names=False
+        )
+
+    def test_nullable(self, table):
+        result = compile_expression("Size * Code").evaluate(table, table.index)
+        assert result.dtype == "float64"
+        assert result.isna().tolist() == [False, True, False]
+        table["Size"] = table["Size"].fillna(2)
+        result = compile_expression("Size * Code").evaluate(table, table.index)
+        assert result.dtype == "int64"
+
+    def test_constant(self, table):
+        result = compile_expression("2 * 3").evaluate(table, table.index)
+        assert result.tolist() == [6, 6, 6]
+
+    @pytest.mark.parametrize(
+        "expression", ["Code.sum()", "where(Code)", "Code if Size else 1", "'a'"]
+    )
+    def test_not_supported(self, expression):
+        assert compile_expression(expression) is None
+
+
+def test_collect_expressions():
+    schema = {
+        "A": {
+            "instructions": [
+                {"create_column": {"type": "numerical", "expression": "x * 2"}},
+                {"create_column": {"type": "numerical", "expression": 1}},
+            ]
+        },
+        "B": {"1400": {"instructions": [{"type": "numerical", "expression": "x * 2"}]}},
+    }
+    assert collect_expressions(schema) == ["x * 2"]
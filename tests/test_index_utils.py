@@ -0,0 +1,71 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from bssir.utils.index_utils import (
+    HouseholdIndex,
+    filter_ids,
+    read_households,
+)
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / "1400_Food.parquet"
+    table = pd.DataFrame(
+        {"ID": np.repeat(np.arange(100), 2), "Cost": np.arange(200) * 1.5}
+    )
+    table.to_parquet(path, row_group_size=20)
+    return path
+
+
+def _index_path(path):
+    return path.with_name(f".{path.name}.ids.json")
+
+
+class TestHouseholdIndex:
+    def test_from_parquet(self, path):
+        index = HouseholdIndex.from_parquet(path)
+        assert len(index) == 10
+        assert index.find_row_groups([0, 35, 36, 1000]) == [0, 3]
+
+    def test_sidecar(self, path):
+        index = HouseholdIndex.load(path)
+        sidecar = json.loads(_index_path(path).read_text())
+        assert sidecar["row_groups"][1] == [10, 19]
+        assert HouseholdIndex.load(path) is index
+
+    def test_rebuilt_when_file_changes(self, path):
+        HouseholdIndex.load(path)
+        pd.DataFrame({"ID": [500, 600]}).to_parquet(path)
+        os.utime(path, ns=(0, 0))
+        assert HouseholdIndex.load(path).find_row_groups([500]) == [0]
+
+    def test_without_id_column(self, tmp_path):
+        path = tmp_path / "table.parquet"
+        pd.DataFrame({"Code": [1]}).to_parquet(path)
+        assert HouseholdIndex.load(path) is None
+        assert read_households(path, [1]) is None
+
+
+def test_read_households(path):
+    table = read_households(path, [3, 71], columns=["Cost"])
+    assert table.columns.tolist() == ["Cost"]
+    assert table["Cost"].tolist() == [9.0, 10.5, 213.0, 214.5]
+
+
+def test_read_households_types_mapper(path):
+    table = read_households(path, [3], types_mapper=pd.ArrowDtype)
+    assert table["ID"].dtype == pd.ArrowDtype(pa.int64())
+    assert table["Cost"].tolist() == [9.0, 10.5]
+
+
+def test_filter_ids():
+    assert filter_ids([("Cost", ">", 1)]) is None
+    assert filter_ids([("ID", "in", ("a",))]) is None
+    ids = filter_ids([("ID", "in", (1, 2, 3)), ("ID", "==", 2)])
+    assert ids.tolist() == [2]
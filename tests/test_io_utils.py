@@ -0,0 +1,60 @@
+import threading
+
+import pandas as pd
+
+from bssir.utils.io_utils import (
+    FileLock,
+    flush,
+    get_pending_table,
+    write_parquet,
+    write_parquet_behind,
+)
+
+
+class TestWriteParquet:
+    def test_atomic_write(self, tmp_path):
+        path = tmp_path / "table.parquet"
+        write_parquet(pd.DataFrame({"ID": [1, 2]}), path)
+        write_parquet(pd.DataFrame({"ID": [3]}), path)
+        assert pd.read_parquet(path)["ID"].tolist() == [3]
+        assert [file.name for file in tmp_path.iterdir()] == ["table.parquet"]
+
+    def test_write_behind(self, tmp_path):
+        paths = [tmp_path / f"table_{i}.parquet" for i in range(3)]
+        for i, path in enumerate(paths):
+            write_parquet_behind(pd.DataFrame({"ID": [i]}), path)
+        flush()
+        assert [pd.read_parquet(path)["ID"].tolist() for path in paths] == [
+            [0],
+            [1],
+            [2],
+        ]
+        assert get_pending_table(paths[0]) is None
+
+
+class TestFileLock:
+    def test_exclusive(self, tmp_path):
+        path = tmp_path / "table.parquet"
+        events = []
+        lock = FileLock(path)
+        lock.acquire()
+
+        def wait_for_lock():
+            with FileLock(path):
+                events.append("second")
+
+        thread = threading.Thread(target=wait_for_lock)
+        thread.start()
+        thread.join(timeout=0.2)
+        events.append("first")
+        lock.release()
+        thread.join()
+        assert events == ["first", "second"]
+
+    def test_release_after_write(self, tmp_path):
+        path = tmp_path / "table.parquet"
+        lock = FileLock(path)
+        lock.acquire()
+        write_parquet_behind(pd.DataFrame({"ID": [1]}), path, lock=lock)
+        with FileLock(path):
+            assert pd.read_parquet(path)["ID"].tolist() == [1]
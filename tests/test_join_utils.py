@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bssir.utils.join_utils import join_on_keys, pack_keys, sort_by_household
+
+
+@pytest.fixture
+def weights():
+    return pd.DataFrame(
+        {
+            "Year": pd.array([1400, 1400, 1401, 1401], dtype="int16"),
+            "ID": [3, 7, 3, 5],
+            "Weight": [1.5, 2.5, 3.5, 4.5],
+            "Kind": pd.Categorical(["a", "b", "a", "b"]),
+            "Size": pd.array([1, 2, None, 4], dtype="Int64"),
+        }
+    )
+
+
+@pytest.fixture
+def table():
+    return pd.DataFrame(
+        {
+            "Year": [1401, 1400, 1400, 1402, 1401],
+            "ID": [5, 3, 9, 3, 3],
+            "Value": [1, 2, 3, 4, 5],
+        },
+        index=[10, 20, 30, 40, 50],
+    )
+
+
+def _expected(table, weights, how):
+    return table.join(weights.set_index(["Year", "ID"]), on=["Year", "ID"], how=how)
+
+
+class TestJoinOnKeys:
+    @pytest.mark.parametrize("how", ["left", "inner"])
+    def test_same_as_join(self, table, weights, how):
+        result = join_on_keys(table, weights, how=how)
+        pd.testing.assert_frame_equal(result, _expected(table, weights, how))
+
+    @pytest.mark.parametrize("how", ["left", "inner"])
+    def test_unsorted_keys(self, table, weights, how):
+        shuffled = weights.iloc[[2, 0, 3, 1]]
+        result = join_on_keys(table, shuffled, how=how)
+        pd.testing.assert_frame_equal(result, _expected(table, weights, how))
+
+    def test_keys_in_index(self, table, weights):
+        result = join_on_keys(table, weights.set_index(["Year", "ID"]))
+        pd.testing.assert_frame_equal(result, _expected(table, weights, "left"))
+
+    def test_duplicate_keys(self, table, weights):
+        duplicated = pd.concat([weights, weights.iloc[[0]]])
+        result = join_on_keys(table, duplicated)
+        pd.testing.assert_frame_equal(result, _expected(table, duplicated, "left"))
+        assert len(result) == len(table) + 1
+
+    def test_overlapping_columns(self, table, weights):
+        with pytest.raises(ValueError):
+            join_on_keys(table, weights.assign(Value=1))
+
+
+class TestPackKeys:
+    def test_packed_keys_are_ordered(self):
+        years = pd.Series([1400, 1400, 1401])
+        ids = pd.Series([2**40 - 1, 5, 0])
+        keys = pack_keys([years, ids])
+        assert keys[1] < keys[0] < keys[2]
+
+    @pytest.mark.parametrize(
+        "ids",
+        [
+            pd.Series([1.0, 2.0]),
+            pd.Series([1, None], dtype="Int64"),
+            pd.Series([-1, 2]),
+            pd.Series([2**40, 2]),
+        ],
+    )
+    def test_unpackable(self, ids):
+        assert pack_keys([pd.Series([1400, 1400]), ids]) is None
+
+
+def test_sort_by_household(table):
+    result = sort_by_household(table)
+    assert result[["Year", "ID"]].values.tolist() == [
+        [1400, 3],
+        [1400, 9],
+        [1401, 3],
+        [1401, 5],
+        [1402, 3],
+    ]
+    assert sort_by_household(result) is result
+    assert np.array_equal(result.index, np.arange(5))
@@ -0,0 +1,154 @@
+import shutil
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bssir.data_engine import read_partitioned_table
+from bssir.utils.concat_utils import concat_tables
+from bssir.utils.layout_utils import (
+    get_cleaned_path,
+    get_mirror_file_name,
+    list_cleaned_files,
+    migrate_cleaned_files,
+)
+
+
+def _defaults(cleaned_dir, layout="flat"):
+    return SimpleNamespace(
+        dir=SimpleNamespace(cleaned=cleaned_dir), cleaned_layout=layout
+    )
+
+
+def _table(year):
+    return pd.DataFrame(
+        {
+            "ID": np.arange(10) + year * 1000,
+            "Cost": np.arange(10) * 1.5,
+            "Kind": pd.Categorical(["a", "b"] * 5 if year % 2 else ["c"] * 10),
+        }
+    )
+
+
+@pytest.fixture
+def flat_defaults(tmp_path):
+    defaults = _defaults(tmp_path)
+    for year in [1399, 1400]:
+        _table(year).to_parquet(get_cleaned_path("Food", year, defaults))
+    get_cleaned_path("Food", 1400, defaults).with_name(
+        ".1400_Food.parquet.lock"
+    ).touch()
+    return defaults
+
+
+class TestPaths:
+    def test_cleaned_path(self, tmp_path):
+        defaults = _defaults(tmp_path)
+        assert (
+            get_cleaned_path("Food", 1400, defaults) == tmp_path / "1400_Food.parquet"
+        )
+        partitioned = get_cleaned_path("Food", 1400, defaults, "partitioned")
+        assert partitioned == tmp_path / "Food" / "Year=1400" / "part-0.parquet"
+
+    def test_configured_layout(self, tmp_path):
+        defaults = _defaults(tmp_path, "partitioned")
+        assert get_cleaned_path("Food", 1400, defaults).parent.name == "Year=1400"
+        with pytest.raises(ValueError):
+            get_cleaned_path("Food", 1400, defaults, "nested")
+
+    def test_mirror_name(self):
+        assert get_mirror_file_name("Food", 1400) == "1400_Food.parquet"
+
+
+class TestMigration:
+    def test_list_flat(self, flat_defaults, tmp_path):
+        files = list_cleaned_files(tmp_path)
+        assert [(table, year) for table, year, _ in files] == [
+            ("Food", 1399),
+            ("Food", 1400),
+        ]
+
+    def test_round_trip(self, flat_defaults, tmp_path):
+        moved = migrate_cleaned_files(flat_defaults, "partitioned")
+        assert moved == [
+            get_cleaned_path("Food", year, flat_defaults, "partitioned")
+            for year in [1399, 1400]
+        ]
+        assert not (tmp_path / "1400_Food.parquet").exists()
+        files = list_cleaned_files(tmp_path)
+        assert [(table, year) for table, year, _ in files] == [
+            ("Food", 1399),
+            ("Food", 1400),
+        ]
+
+        migrate_cleaned_files(flat_defaults)
+        assert list(tmp_path.glob("Food/*/*.parquet")) == []
+        assert (tmp_path / ".1400_Food.parquet.lock").exists()
+        pd.testing.assert_frame_equal(
+            pd.read_parquet(tmp_path / "1400_Food.parquet"), _table(1400)
+        )
+
+    def test_keep_lock_files(self, flat_defaults, tmp_path):
+        target = get_cleaned_path("Food", 1398, flat_defaults, "partitioned")
+        target.parent.mkdir(parents=True)
+        _table(1398).to_parquet(target)
+        migrate_cleaned_files(flat_defaults, "flat")
+        assert (tmp_path / "1398_Food.parquet").exists()
+        # The lock file taken while moving keeps its directory
+        assert [path.name for path in target.parent.iterdir()] == [
+            ".part-0.parquet.lock"
+        ]
+
+    def test_identical_target(self, flat_defaults, tmp_path):
+        target = get_cleaned_path("Food", 1400, flat_defaults, "partitioned")
+        target.parent.mkdir(parents=True)
+        shutil.copy(tmp_path / "1400_Food.parquet", target)
+        assert migrate_cleaned_files(flat_defaults, "partitioned") == [
+            get_cleaned_path("Food", 1399, flat_defaults, "partitioned")
+        ]
+        assert not (tmp_path / "1400_Food.parquet").exists()
+
+    def test_conflicting_target(self, flat_defaults, tmp_path, caplog):
+        target = get_cleaned_path("Food", 1400, flat_defaults, "partitioned")
+        target.parent.mkdir(parents=True)
+        _table(1).to_parquet(target)
+        migrate_cleaned_files(flat_defaults, "partitioned")
+        assert "1400_Food.parquet" in caplog.text
+        pd.testing.assert_frame_equal(
+            pd.read_parquet(tmp_path / "1400_Food.parquet"), _table(1400)
+        )
+        pd.testing.assert_frame_equal(pd.read_parquet(target), _table(1))
+
+
+class TestReadPartitionedTable:
+    @pytest.fixture
+    def defaults(self, flat_defaults):
+        migrate_cleaned_files(flat_defaults, "partitioned")
+        return flat_defaults
+
+    def test_read(self, defaults):
+        table = read_partitioned_table("Food", [1399, 1400], defaults)
+        expected = concat_tables([_table(1399), _table(1400)], ignore_index=True)
+        pd.testing.assert_frame_equal(table, expected)
+
+    def test_columns_and_filters(self, defaults):
+        table = read_partitioned_table(
+            "Food",
+            [1400, 1399],
+            defaults,
+            columns=["Cost", "ID"],
+            filters=[("Cost", ">", 10), ("Year", "==", 1400)],
+        )
+        assert list(table.columns) == ["ID", "Cost"]
+        assert table["ID"].tolist() == [
+            1400007,
+            1400008,
+            1400009,
+            1399007,
+            1399008,
+            1399009,
+        ]
+
+    def test_missing_year(self, defaults):
+        assert read_partitioned_table("Food", [1399, 1401], defaults) is None
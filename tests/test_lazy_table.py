@@ -0,0 +1,114 @@
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from bssir.lazy_table import LazyTable
+
+
+class FakeAPI:
+    defaults = SimpleNamespace(
+        columns=SimpleNamespace(year="Year", id="ID", weight="Weight"),
+        functions=SimpleNamespace(load_table=SimpleNamespace(backend="numpy")),
+    )
+
+    def __init__(self):
+        self.tables = {
+            "Food": pd.DataFrame(
+                {
+                    "Year": [1400, 1400, 1401, 1401],
+                    "ID": [1, 2, 1, 3],
+                    "Cost": [0.5, 2.0, 3.0, 4.0],
+                    "Code": [11, 12, 11, 13],
+                    "Name": ["A&B", "A", "B|C", "A&B"],
+                }
+            ),
+            "Weight": pd.DataFrame(
+                {
+                    "Year": [1400, 1400, 1401, 1401],
+                    "ID": [1, 2, 1, 3],
+                    "Weight": [0.1, 0.9, 0.8, 0.2],
+                }
+            ),
+        }
+        self.calls = []
+        self.settings = []
+
+    def load_table(self, table_name, years, columns=None, filters=None, **kwargs):
+        self.calls.append((table_name, columns, filters))
+        self.settings.append((table_name, kwargs))
+        table = self.tables[table_name]
+        table = table.loc[table["Year"].isin(years)]
+        for condition in filters or []:
+            table = table.query(condition)
+        if columns is not None:
+            table = table.loc[:, columns]
+        return table.reset_index(drop=True)
+
+
+@pytest.fixture
+def api():
+    return FakeAPI()
+
+
+def _scan(api, table_name="Food", years=(1400, 1401)):
+    return LazyTable(api, table_name, years)
+
+
+class TestLazyTable:
+    def test_pushdown_and_pruning(self, api):
+        query = (
+            _scan(api)
+            .filter("Cost > 1")
+            .add_weight()
+            .filter("Weight > 0.5")
+            .select(["ID", "Cost", "Weight"])
+        )
+        table = query.collect()
+        assert api.calls == [
+            ("Food", ["Cost", "ID", "Year"], ["Cost > 1"]),
+            ("Weight", ["ID", "Weight", "Year"], None),
+        ]
+        assert table.values.tolist() == [[2, 2.0, 0.9], [1, 3.0, 0.8]]
+
+    def test_filter_on_added_column_is_not_pushed(self, api):
+        query = _scan(api).add_weight().filter("(Weight > 0.5) & (Code > 11)")
+        assert "filters" not in query.explain()
+        assert query.collect()["ID"].tolist() == [2]
+
+    def test_shared_scans(self, api):
+        weights = _scan(api).select(["Year", "ID", "Code"]).add_weight()
+        query = _scan(api).select(["Year", "ID", "Cost"]).join(weights)
+        table = query.collect()
+        assert api.calls == [
+            ("Food", ["Code", "Cost", "ID", "Year"], None),
+            ("Weight", ["ID", "Weight", "Year"], None),
+        ]
+        assert table.columns.tolist() == ["Year", "ID", "Cost", "Code", "Weight"]
+        assert table["Weight"].tolist() == [0.1, 0.9, 0.8, 0.2]
+
+    def test_unknown_join_columns(self, api):
+        query = _scan(api).join(_scan(api, "Weight")).select(["ID", "Weight"])
+        table = query.collect()
+        assert api.calls[0] == ("Food", None, None)
+        assert table["Weight"].tolist() == [0.1, 0.9, 0.8, 0.2]
+
+    def test_operators_in_strings(self, api):
+        query = _scan(api).filter('Name == "A&B" | Name == "B|C"')
+        assert query.collect()["ID"].tolist() == [1, 1, 3]
+        assert api.calls[0][2] == ['Name == "A&B" | Name == "B|C"']
+
+    def test_weight_settings(self, api):
+        query = LazyTable(
+            api, "Food", [1400], {"form": "normalized", "on_missing": "create"}
+        )
+        query.add_weight().collect()
+        assert api.settings == [
+            ("Food", {"form": "normalized", "on_missing": "create"}),
+            ("Weight", {"on_missing": "create"}),
+        ]
+
+    def test_chains_are_independent(self, api):
+        base = _scan(api).filter("Cost > 1")
+        base.select(["ID"])
+        assert base.operations == (("filter", "Cost > 1"),)
@@ -0,0 +1,191 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from bssir.api import API
+from bssir import utils
+from bssir.data_engine import BuildPlan, TableHandler
+from bssir.metadata_reader import BASE_PACKAGE_DIRECTORY, config
+
+YEARS = [1398, 1399, 1400]
+
+SCHEMA = {
+    "Food": {"cache_result": False},
+    "Weight": {"cache_result": False, "instructions": ["add_year"]},
+    "Expenditures": {
+        "table_list": ["Food"],
+        "instructions": [
+            "add_year",
+            {"rename": {"Cost": "Expenditure"}},
+            {
+                "create_column": {
+                    "name": "Kind",
+                    "type": "categorical",
+                    "categories": {"low": {"Code": [1, 2]}, "high": {"Code": [3, 4]}},
+                }
+            },
+            {"apply_filter": "Code > 1"},
+            "add_table_name",
+        ],
+    },
+    "Weighted": {
+        "table_list": ["Expenditures"],
+        "instructions": [{"join": "Weight"}],
+    },
+    "Combined": {"table_list": ["Weighted", "Expenditures"]},
+}
+
+
+@pytest.fixture
+def api(tmp_path):
+    defaults, metadata = config.set_package_config(BASE_PACKAGE_DIRECTORY)
+    for key in ["cleaned", "cached", "external"]:
+        setattr(defaults.dir, key, tmp_path / key)
+    defaults.dir.cleaned.mkdir()
+    metadata.tables = {
+        "table_availability": {"Food": {"start": 1390}, "Weight": {"start": 1390}},
+        "default_settings": {},
+    }
+    metadata.schema = SCHEMA
+    rng = np.random.default_rng(0)
+    for year in YEARS:
+        ids = np.arange(5) + year * 100
+        pd.DataFrame(
+            {
+                "ID": np.repeat(ids, 2),
+                "Code": rng.integers(1, 5, 10),
+                "Cost": rng.random(10) * 100,
+            }
+        ).to_parquet(defaults.dir.cleaned / f"{year}_Food.parquet")
+        pd.DataFrame({"ID": ids, "Weight": rng.random(5)}).to_parquet(
+            defaults.dir.cleaned / f"{year}_Weight.parquet"
+        )
+    return API(defaults, metadata)
+
+
+class TestExecutors:
+    @pytest.mark.parametrize("table_name", ["Expenditures", "Weighted", "Combined"])
+    def test_same_result(self, api, table_name):
+        expected = api.load_table(
+            table_name, YEARS, executor="serial", save_created=False
+        )
+        assert expected["Year"].unique().tolist() == YEARS
+        for executor in ["thread", "process"]:
+            table = api.load_table(
+                table_name, YEARS, executor=executor, save_created=False
+            )
+            pd.testing.assert_frame_equal(table, expected)
+
+
+def _plan(api, table_name, years=YEARS, **kwargs):
+    settings = api.defaults.functions.load_table.model_copy(update=kwargs)
+    return BuildPlan(
+        table_name,
+        years,
+        lib_defaults=api.defaults,
+        lib_metadata=api.metadata,
+        settings=settings,
+    )
+
+
+class TestBuildPlan:
+    def test_shared_tables_appear_once(self, api):
+        plan = _plan(api, "Combined")
+        assert sorted(plan.nodes) == sorted(
+            (table_name, year)
+            for table_name in ["Combined", "Weighted", "Expenditures", "Food", "Weight"]
+            for year in YEARS
+        )
+        node = plan.nodes[("Expenditures", 1400)]
+        assert node.dependents == {("Weighted", 1400), ("Combined", 1400)}
+
+    def test_topological_order(self, api):
+        plan = _plan(api, "Combined")
+        built = set()
+        for stage in plan.stages():
+            for node in stage:
+                assert node.dependencies <= built
+            built.update(node.key for node in stage)
+        assert [len(stage) for stage in plan.stages()] == [6, 3, 3, 3]
+
+    def test_run(self, api):
+        plan = _plan(api, "Combined", [1399, 1400], save_created=False)
+        plan.run(max_workers=2)
+        tables = plan.load()
+        assert plan.context.build_counts[("normalized", "Expenditures", 1400)] == 1
+        expected = api.load_table(
+            "Combined", [1399, 1400], executor="serial", save_created=False
+        )
+        pd.testing.assert_frame_equal(
+            utils.concat_tables(tables, ignore_index=True), expected
+        )
+
+    def test_explain(self, api):
+        text = api.explain_table("Weighted", 1400, columns=["ID", "Weight"])
+        assert text.splitlines() == [
+            "Build plan for Weighted (1400): 4 tables in 3 stages",
+            "Stage 1",
+            "  Food 1400",
+            "    columns: Code, ID, Weight",
+            "    filters: Code > 1",
+            "  Weight 1400",
+            "    columns: ID, Weight, Year",
+            "Stage 2",
+            "  Expenditures 1400",
+            "    from: Food 1400",
+            "    columns: ID, Weight, Year",
+            "Stage 3",
+            "  Weighted 1400",
+            "    from: Expenditures 1400, Weight 1400",
+            "    columns: ID, Weight",
+        ]
+
+
+class TestBackend:
+    @pytest.mark.parametrize("filters", [[("ID", "==", 140001)], [("Code", ">", 0)]])
+    def test_filtered_read(self, api, filters):
+        settings = api.defaults.functions.load_table.model_copy(
+            update={"backend": "pyarrow"}
+        )
+        handler = TableHandler(
+            ["Food"],
+            1400,
+            lib_defaults=api.defaults,
+            lib_metadata=api.metadata,
+            settings=settings,
+            filters={"Food": filters},
+        )
+        assert handler["Food"]["Cost"].dtype == pd.ArrowDtype(pa.float64())
+
+
+
+
+class TestLookupHouseholds:
+    def test_numpy_id(self, api):
+        food = api.load_table("Food", 1400, form="cleaned")
+        household_id = food["ID"].iloc[0]
+        assert isinstance(household_id, np.integer)
+        tables = api.lookup_households(household_id, "Food", 1400)
+        expected = food.loc[food["ID"] == household_id]
+        assert tables["Food"]["ID"].tolist() == expected["ID"].tolist()
+        assert tables["Food"]["Cost"].tolist() == expected["Cost"].tolist()
+
+
+class TestWriteBehind:
+    def test_saved_table_is_isolated(self, api, tmp_path):
+        settings = api.defaults.functions.load_table
+        assert settings.write_behind
+        handler = TableHandler(
+            [],
+            1400,
+            lib_defaults=api.defaults,
+            lib_metadata=api.metadata,
+            settings=settings,
+        )
+        table = pd.DataFrame({"ID": [1, 2], "Cost": [1.5, 2.5]})
+        handler._save_table(table, "Food", True, None)
+        table.loc[0, "Cost"] = 0
+        utils.flush()
+        saved = pd.read_parquet(handler.get_local_path("Food"))
+        assert saved["Cost"].tolist() == [1.5, 2.5]
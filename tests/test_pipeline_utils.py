@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bssir.data_engine import Pipeline
+from bssir.utils.pipeline_utils import (
+    compile_pandas_function,
+    compile_steps,
+    load_function,
+)
+
+
+def _numerical(name, expression):
+    return {
+        "create_column": {"name": name, "type": "numerical", "expression": expression}
+    }
+
+
+class TestCompileSteps:
+    def test_fusion(self):
+        steps = compile_steps(
+            [
+                "add_year",
+                _numerical("A", "B * 2"),
+                _numerical("C", "A + 1"),
+                {"apply_filter": "A > 1"},
+                {"apply_filter": ["C < 4", "B > 0"]},
+                {"rename": {"A": "D"}},
+                {"apply_filter": "D > 2"},
+            ]
+        )
+        assert [(step.name, step.index) for step in steps] == [
+            ("add_year", 0),
+            ("create_columns", 1),
+            ("apply_filters", 3),
+            ("rename", 5),
+            ("apply_filters", 6),
+        ]
+        assert [column["name"] for column in steps[1].method_input] == ["A", "C"]
+        assert steps[2].method_input == ["A > 1", "C < 4", "B > 0"]
+
+    def test_aggregate_conditions_are_not_fused(self):
+        steps = compile_steps(
+            [
+                {"apply_filter": "Code > 1"},
+                {"apply_filter": ["Cost > Cost.mean()", "Code.isin([2, 3])"]},
+                {"apply_filter": "Cost < Cost.quantile(0.9)"},
+            ]
+        )
+        assert [step.method_input for step in steps] == [
+            ["Code > 1"],
+            ["Cost > Cost.mean()", "Code.isin([2, 3])"],
+            ["Cost < Cost.quantile(0.9)"],
+        ]
+
+    def test_filters_keep_sequential_results(self):
+        table = pd.DataFrame({"Code": [1, 2, 3, 4, 2, 3], "Cost": [9, 1, 5, 7, 3, 8]})
+        conditions = ["Code > 1", "Cost > Cost.mean()", "Code < 4"]
+        result = Pipeline(
+            table,
+            steps=[{"apply_filter": condition} for condition in conditions],
+            pipeline_params={"table_name": "Food", "year": 1400},
+            settings=None,
+        ).run()
+        expected = table
+        for condition in conditions:
+            expected = expected.query(condition)
+        pd.testing.assert_frame_equal(result, expected)
+
+    def test_empty_steps_are_dropped(self):
+        steps = compile_steps([None, "create_column", {"apply_filter": None}])
+        assert steps == []
+
+    def test_cached(self):
+        steps = [_numerical("A", 1), {"apply_filter": "A > 0"}]
+        assert compile_steps(steps) is compile_steps(list(steps))
+
+    @pytest.mark.parametrize(
+        "step",
+        [
+            "unknown_step",
+            {"add_year": 1400},
+            {"apply_filter": 1},
+            {"create_column": {"name": "A", "type": "numerical"}},
+            {
+                "create_column": {
+                    "name": "A",
+                    "type": "categorical",
+                    "categories": {"x": {"B": 1}},
+                }
+            },
+            {"join": {"table_name": "W"}},
+            {"apply_pandas_function": ".pipe(print)"},
+        ],
+    )
+    def test_invalid_step(self, step):
+        with pytest.raises(ValueError):
+            compile_steps(["add_year", step])
+
+
+class TestPipeline:
+    def test_input_is_not_copied_or_changed(self):
+        table = pd.DataFrame(
+            {"ID": [1, 2, 3], "Code": [11, 12, 13], "Cost": [1.0, None, 3.0]}
+        )
+        expected = table.copy()
+        result = Pipeline(
+            table,
+            steps=[
+                "add_year",
+                _numerical("Cost", "Cost * 2"),
+                _numerical("Total", "Cost + 1"),
+                {"fillna": "Cost"},
+                {"rename": {"Code": "Kind"}},
+            ],
+            pipeline_params={"table_name": "Food", "year": 1400},
+            settings=None,
+        ).run()
+        pd.testing.assert_frame_equal(table, expected)
+        assert result["Cost"].tolist() == [2.0, 0.0, 6.0]
+        assert list(result.columns) == ["ID", "Kind", "Cost", "Year", "Total"]
+        assert np.shares_memory(result["ID"].to_numpy(), table["ID"].to_numpy())
+
+
+class TestCompilePandasFunction:
+    def test_chain(self):
+        table = pd.DataFrame({"Year": [1, 1, 2], "Value": [1, 2, 3]})
+        function = compile_pandas_function(
+            ".groupby('Year', as_index=False)['Value'].sum()\n.iloc[::-1]"
+        )
+        assert function(table)["Value"].tolist() == [3, 3]
+        assert compile_pandas_function(".head(-1)") is compile_pandas_function(
+            ".head(-1)"
+        )
+
+    @pytest.mark.parametrize(
+        "method_input", [".__class__", ".pipe(print)", ".apply(lambda x: x)", "; 1"]
+    )
+    def test_rejected(self, method_input):
+        with pytest.raises(ValueError):
+            compile_pandas_function(method_input)
+
+
+def test_load_function():
+    assert load_function("pandas.concat") is pd.concat
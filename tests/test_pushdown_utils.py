@@ -0,0 +1,133 @@
+from bssir.utils.pushdown_utils import (
+    extract_identifiers,
+    required_columns,
+    output_columns,
+    parse_filter,
+    pushdown_filters,
+)
+
+
+class TestExtractIdentifiers:
+    def test_plain(self):
+        assert extract_identifiers("Cost * 2 + Tax") == {"Cost", "Tax"}
+
+    def test_backticks(self):
+        assert extract_identifiers("`Food Share` > 0.5") == {"Food Share"}
+
+
+class TestRequiredColumns:
+    def test_all_columns(self):
+        assert required_columns(["add_year"], None) is None
+
+    def test_rename(self):
+        steps = [{"rename": {"Cost": "Expenditure"}}]
+        assert required_columns(steps, ["Expenditure", "ID"]) == {"Cost", "ID"}
+
+    def test_created_columns(self):
+        steps = [
+            "add_year",
+            {
+                "create_column": {
+                    "name": "Net",
+                    "type": "numerical",
+                    "expression": "Gross - Tax",
+                }
+            },
+            {
+                "create_column": {
+                    "name": "Kind",
+                    "type": "categorical",
+                    "categories": {"a": {"Code": [1, 2]}, "b": None},
+                }
+            },
+        ]
+        assert required_columns(steps, ["Year", "Net", "Kind"]) == {
+            "Gross",
+            "Tax",
+            "Code",
+        }
+
+    def test_apply_order(self):
+        steps = [{"apply_order": ["ID", {"Cost": "float64"}, "Other"]}]
+        assert required_columns(steps, ["Cost", "Missing"]) == {"Cost"}
+
+    def test_join_and_filter(self):
+        steps = [{"apply_filter": "Code > 1"}, {"join": "Weight"}]
+        assert required_columns(steps, ["Weight"]) == {"Weight", "Year", "ID", "Code"}
+
+    def test_opaque_steps(self):
+        steps = [{"apply_function": "module.function"}, "add_year"]
+        assert required_columns(steps, ["Year"]) is None
+
+
+class TestOutputColumns:
+    def test_steps(self):
+        steps = [
+            {"rename": {"Cost": "Expenditure"}},
+            {"apply_filter": "Code > 1"},
+            {
+                "create_column": {
+                    "name": "Net",
+                    "type": "numerical",
+                    "expression": "Expenditure - Tax",
+                }
+            },
+            "add_table_name",
+        ]
+        assert output_columns(steps, ["ID", "Code", "Cost", "Tax"]) == {
+            "ID",
+            "Code",
+            "Expenditure",
+            "Tax",
+            "Net",
+            "Table_Name",
+        }
+
+    def test_apply_order(self):
+        steps = [{"apply_order": ["ID", {"Cost": "float64"}]}]
+        assert output_columns(steps, ["ID", "Code"]) == {"ID", "Cost"}
+
+    def test_unknown_columns(self):
+        assert output_columns(["add_year"], None) is None
+        assert output_columns([{"join": "Weight"}], ["ID", "Year"]) is None
+
+
+class TestParseFilter:
+    def test_comparisons(self):
+        assert parse_filter("Cost > 10 & 1380 <= Year") == [
+            ("Cost", ">", 10),
+            ("Year", ">=", 1380),
+        ]
+
+    def test_membership(self):
+        assert parse_filter("Code.isin([1, 2]) and Kind in ['a']") == [
+            ("Code", "in", (1, 2)),
+            ("Kind", "in", ("a",)),
+        ]
+
+    def test_untranslatable_parts(self):
+        assert parse_filter("(Cost > Tax) & (Code != 2) & (ID == 5)") == [
+            ("ID", "==", 5)
+        ]
+        assert parse_filter("(Cost > 1) | (Code == 2)") == []
+
+
+class TestPushdownFilters:
+    def test_rename(self):
+        steps = [{"rename": {"Cost": "Expenditure"}}, {"apply_filter": "Code == 2"}]
+        assert pushdown_filters(steps, [("Expenditure", ">", 0)]) == [
+            ("Code", "==", 2),
+            ("Cost", ">", 0),
+        ]
+
+    def test_modified_columns(self):
+        steps = [
+            "add_year",
+            {"fillna": "Cost"},
+            {"apply_filter": ["Year == 1400", "Cost > 0", "ID > 0"]},
+        ]
+        assert pushdown_filters(steps) == [("ID", ">", 0)]
+
+    def test_opaque_steps(self):
+        steps = [{"apply_pandas_function": ".head()"}, {"apply_filter": "ID > 0"}]
+        assert pushdown_filters(steps, [("ID", "<", 9)]) == []
@@ -0,0 +1,135 @@
+import functools
+import http.server
+import io
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bssir.utils.remote_utils import RemoteFile, read_remote_table
+
+
+class RangeHandler(http.server.SimpleHTTPRequestHandler):
+    """Serves files with Range support.
+
+    Range is ignored under `/full/`, no version header is sent under
+    `/unversioned/`, and ranges are cut short under `/short/`.
+    """
+
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def send_head(self):
+        mode, _, path = self.path.removeprefix("/").rpartition("/")
+        with open(self.translate_path(path), "rb") as file:
+            data = file.read()
+        match = re.match(r"bytes=(\d+)-(\d+)", self.headers.get("Range", ""))
+        body = data
+        if (self.command == "GET") and (match is not None) and (mode != "full"):
+            start, end = int(match.group(1)), int(match.group(2))
+            body = data[start : end + 1]
+            if mode == "short":
+                body = body[:-1]
+            self.send_response(206)
+        else:
+            self.send_response(200)
+        if self.command == "GET":
+            self.requests.append(len(body))
+        self.send_header("Content-Length", str(len(body)))
+        if mode != "unversioned":
+            self.send_header("ETag", '"1"')
+        self.end_headers()
+        return io.BytesIO(body if self.command == "GET" else b"")
+
+
+@pytest.fixture
+def url(tmp_path):
+    served = tmp_path / "served"
+    served.mkdir()
+    rng = np.random.default_rng(0)
+    table = pd.DataFrame(
+        {
+            "ID": np.arange(100_000),
+            **{f"Value_{i}": rng.random(100_000) for i in range(8)},
+        }
+    )
+    table.to_parquet(served / "table.parquet", row_group_size=10_000)
+    handler = functools.partial(RangeHandler, directory=str(served))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    RangeHandler.requests.clear()
+    yield f"http://127.0.0.1:{server.server_port}/table.parquet"
+    server.shutdown()
+    server.server_close()
+
+
+class TestRemoteFile:
+    def test_read(self, url, tmp_path):
+        with RemoteFile(url, tmp_path / "cache", block_size=1000) as file:
+            file.seek(-10, 2)
+            tail = file.read()
+            file.seek(990)
+            middle = file.read(20)
+            assert file.tell() == 1010
+        content = (tmp_path / "served" / "table.parquet").read_bytes()
+        assert tail == content[-10:]
+        assert middle == content[990:1010]
+
+    def test_blocks_are_cached(self, url, tmp_path):
+        with RemoteFile(url, tmp_path / "cache", block_size=1000) as file:
+            file.read(2500)
+            assert file.bytes_fetched == 3000
+            assert RangeHandler.requests == [3000]
+        with RemoteFile(url, tmp_path / "cache", block_size=1000) as file:
+            file.seek(1500)
+            file.read(2000)
+            assert file.bytes_fetched == 1000
+
+    def test_server_without_ranges(self, url, tmp_path):
+        url = url.replace("/table", "/full/table")
+        with RemoteFile(url, tmp_path / "cache") as file:
+            file.seek(100)
+            assert len(file.read(10)) == 10
+            file.seek(0)
+            assert file.read() == (tmp_path / "served" / "table.parquet").read_bytes()
+        assert len(RangeHandler.requests) == 1
+
+    def test_unversioned_file_is_not_cached(self, url, tmp_path):
+        url = url.replace("/table", "/unversioned/table")
+        for _ in range(2):
+            with RemoteFile(url, tmp_path / "cache", block_size=1000) as file:
+                file.read(1000)
+        assert RangeHandler.requests == [1000, 1000]
+        assert not (tmp_path / "cache").exists()
+
+    def test_short_response(self, url, tmp_path):
+        url = url.replace("/table", "/short/table")
+        with RemoteFile(url, tmp_path / "cache", block_size=1000) as file:
+            with pytest.raises(IOError):
+                file.read(1000)
+        assert not (tmp_path / "cache").exists()
+
+
+class TestReadRemoteTable:
+    def test_narrow_read(self, url, tmp_path):
+        table = read_remote_table(
+            url,
+            tmp_path / "cache",
+            columns=["ID", "Value_3"],
+            filters=[("ID", "<", 20_000)],
+        ).to_pandas()
+        expected = pd.read_parquet(tmp_path / "served" / "table.parquet")
+        expected = expected.loc[expected["ID"] < 20_000, ["ID", "Value_3"]]
+        pd.testing.assert_frame_equal(table, expected)
+        size = (tmp_path / "served" / "table.parquet").stat().st_size
+        assert sum(RangeHandler.requests) < size / 4
+
+    def test_full_read(self, url, tmp_path):
+        table = read_remote_table(url, tmp_path / "cache").to_pandas()
+        expected = pd.read_parquet(tmp_path / "served" / "table.parquet")
+        pd.testing.assert_frame_equal(table, expected)
@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+import pandas as pd
+
+from bssir.data_engine import YEAR_DTYPE, Pipeline, table_name_dtype
+
+METADATA = SimpleNamespace(
+    tables={"table_availability": {"Food": {}, "Weight": {}}},
+    schema={"Expenditures": {}},
+)
+
+
+def _run(table, steps, table_name, year):
+    return Pipeline(
+        table,
+        steps=steps,
+        pipeline_params={
+            "table_name": table_name,
+            "year": year,
+            "lib_metadata": METADATA,
+        },
+        settings=None,
+    ).run()
+
+
+class TestCommonColumns:
+    def test_shared_table_name_type(self):
+        tables = [
+            _run(
+                pd.DataFrame({"ID": [1, 2]}), ["add_year", "add_table_name"], name, year
+            )
+            for name, year in [("Food", 1400), ("Expenditures", 1401)]
+        ]
+        assert tables[0]["Year"].dtype == YEAR_DTYPE
+        assert tables[0]["Table_Name"].dtype == table_name_dtype(METADATA)
+        table = pd.concat(tables, ignore_index=True)
+        assert table["Year"].dtype == YEAR_DTYPE
+        assert (table["Year"] * 100 + 12).tolist() == [140012] * 2 + [140112] * 2
+        assert isinstance(table["Table_Name"].dtype, pd.CategoricalDtype)
+        assert table["Table_Name"].tolist() == ["Food"] * 2 + ["Expenditures"] * 2
+
+    def test_unknown_table_name(self):
+        table = _run(pd.DataFrame({"ID": [1]}), ["add_table_name"], "Other", 1400)
+        assert table["Table_Name"].tolist() == ["Other"]
+        assert "Food" in table["Table_Name"].dtype.categories